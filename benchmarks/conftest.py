@@ -0,0 +1,122 @@
+import asyncio
+import copy
+import math
+import os
+import random
+from functools import lru_cache
+
+import numpy as np
+import pytest
+from loguru import logger
+
+from pygomas.config import Config, TEAM_ALLIED, TEAM_AXIS
+from pygomas.manager import DinObject, Manager, MicroAgent
+from pygomas.map import TerrainMap
+from pygomas.packs.pack import PACK_AMMOPACK, PACK_MEDICPACK
+
+pytest.importorskip("pytest_benchmark")
+
+# Benchmarks must not measure the logging sinks
+logger.remove()
+
+MAPS = sorted(
+    name
+    for name in os.listdir(Config().data_path)
+    if os.path.isfile(os.path.join(Config().data_path, name, name + ".txt"))
+)
+CROWDS = (10, 100, 500)
+PACKS_PER_AGENT = 0.2
+
+
+@lru_cache(maxsize=None)
+def load_terrain(map_name):
+    terrain_map = TerrainMap()
+    terrain_map.load_map(map_name, Config())
+    return terrain_map
+
+
+@lru_cache(maxsize=None)
+def create_crowd(map_name, size, seed=0):
+    """
+    Creates a manager with size agents (half of each team) and some packs
+    spread over the walkable cells of the map. Always the same for the
+    same arguments.
+    """
+    rng = random.Random("{}:{}:{}".format(seed, map_name, size))
+    # Seeded, so missed shots are the same in every run
+    manager = Manager(players=size, map_name=map_name, seed=seed)
+    manager.map = load_terrain(map_name)
+    walkable = np.argwhere(manager.map.terrain[:, :, 1] != 0).tolist()
+
+    for i in range(size):
+        agent = MicroAgent(manager.world, "agent{}@localhost".format(i))
+        agent.team = TEAM_ALLIED if i % 2 else TEAM_AXIS
+        # Hurt, so packs are not ignored
+        agent.health = 50
+        agent.ammo = 50
+        agent.is_updated = True
+        x, z = rng.choice(walkable)
+        angle = rng.uniform(-math.pi, math.pi)
+        agent.locate.position.x = x
+        agent.locate.position.z = z
+        agent.locate.heading.x = math.cos(angle)
+        agent.locate.heading.z = math.sin(angle)
+        manager.agents[agent.jid] = agent
+
+    for i in range(max(1, int(size * PACKS_PER_AGENT))):
+        pack = DinObject()
+        pack.jid = "pack{}@localhost".format(i)
+        pack.type = PACK_MEDICPACK if i % 2 else PACK_AMMOPACK
+        pack.position.x, pack.position.z = rng.choice(walkable)
+        manager.din_objects[pack.jid] = pack
+
+    return manager
+
+
+def snapshot_crowd(manager):
+    """
+    Returns a function that restores the health, ammo, packs, statistics
+    and shot streams of a crowd to their current values, so benchmarks
+    that change them do not leak into the next round or benchmark.
+    """
+    world = manager.world
+    health, ammo, alive = world.health.copy(), world.ammo.copy(), world.alive.copy()
+    packs = dict(manager.din_objects)
+    game_statistic = copy.deepcopy(manager.game_statistic)
+
+    def restore():
+        world.health[:] = health
+        world.ammo[:] = ammo
+        world.alive[:] = alive
+        manager.din_objects.clear()
+        manager.din_objects.update(packs)
+        manager.game_statistic = copy.deepcopy(game_statistic)
+        manager.shot_randoms.clear()
+
+    return restore
+
+
+@pytest.fixture(params=MAPS)
+def map_name(request):
+    return request.param
+
+
+@pytest.fixture
+def terrain_map(map_name):
+    return load_terrain(map_name)
+
+
+@pytest.fixture(params=CROWDS, ids=["{}agents".format(size) for size in CROWDS])
+def crowd(request, map_name):
+    # Cached, so it is restored for the next benchmarks
+    manager = create_crowd(map_name, request.param)
+    restore = snapshot_crowd(manager)
+    yield manager
+    restore()
+
+
+@pytest.fixture
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
@@ -0,0 +1,72 @@
+import random
+from unittest import mock
+
+from pygomas.utils.sight import intersect_with_walls
+from pygomas.utils.vector import Vector3D
+
+from conftest import snapshot_crowd
+
+# A field of view walks the map towards every agent, so only some of them look
+VIEWERS = 10
+
+
+def test_get_objects_in_field_of_view(benchmark, crowd):
+    names = list(crowd.agents)[:VIEWERS]
+
+    def look_all():
+        for name in names:
+            crowd.get_objects_in_field_of_view(name)
+
+    benchmark(look_all)
+
+
+def test_intersect_with_walls(benchmark, crowd):
+    rays = [(a.locate.position, a.locate.heading) for a in crowd.agents.values()]
+
+    def intersect_all():
+        for origin, heading in rays:
+            intersect_with_walls(crowd.map, origin, heading, 50)
+
+    benchmark(intersect_all)
+
+
+def test_shoot(benchmark, crowd):
+    rng = random.Random(0)
+    agents = list(crowd.agents.values())
+    shots = [
+        (shooter.jid, Vector3D.from_xyz(*rng.choice(agents).locate.position.to_tuple()))
+        for shooter in agents
+    ]
+
+    def shoot_all():
+        for shooter, victim_position in shots:
+            crowd.shoot(shooter, victim_position)
+
+    # Every round starts the shot streams again, so all of them miss the same shots
+    benchmark.pedantic(shoot_all, setup=crowd.shot_randoms.clear, rounds=20)
+
+
+def test_shoot_batch(benchmark, crowd):
+    rng = random.Random(0)
+    agents = list(crowd.agents.values())
+    shots = [
+        (shooter.jid, Vector3D.from_xyz(*rng.choice(agents).locate.position.to_tuple()))
+        for shooter in agents
+    ]
+
+    benchmark.pedantic(crowd.shoot_batch, args=(shots,), setup=crowd.shot_randoms.clear, rounds=20)
+
+
+def test_check_objects_at_step(benchmark, crowd, event_loop):
+    names = list(crowd.agents)
+    behaviour = mock.Mock()
+    behaviour.send = mock.AsyncMock()
+
+    async def step_all():
+        for name in names:
+            await crowd.check_objects_at_step(name, behaviour)
+
+    # Taken packs are removed and counted, so every round starts from the same crowd
+    benchmark.pedantic(
+        lambda: event_loop.run_until_complete(step_all()), setup=snapshot_crowd(crowd), rounds=20
+    )
@@ -0,0 +1,27 @@
+import pytest
+
+from pygomas.algorithms.a_star import AAlgorithm
+from pygomas.algorithms.jps import JPSAlgorithm
+from pygomas.config import Config
+from pygomas.map import TerrainMap
+
+
+def get_route(terrain_map):
+    """From the center of the allied base to the objective."""
+    base = terrain_map.allied_base
+    start = ((base.init.x + base.end.x) / 2, (base.init.z + base.end.z) / 2)
+    goal = (terrain_map.get_target_x(), terrain_map.get_target_z())
+    return start, goal
+
+
+def test_load_map(benchmark, map_name):
+    config = Config()
+    benchmark(lambda: TerrainMap().load_map(map_name, config))
+
+
+@pytest.mark.parametrize("algorithm", [JPSAlgorithm, AAlgorithm], ids=["jps", "astar"])
+def test_get_path(benchmark, terrain_map, algorithm):
+    path_finder = algorithm(terrain_map.cost_terrain[:, :, 1])
+    start, goal = get_route(terrain_map)
+
+    benchmark(path_finder.get_path, start, goal)
@@ -21,10 +21,16 @@ class AbstractAgent(object, metaclass=ABCMeta):
 
     async def start(self, auto_register=True):
         await Agent.start(self, auto_register=auto_register)
-        if self.services:
-            for service in self.services:
-                logger.info("{} registering service {}".format(self.name, service))
-                self.register_service(service)
+        services = self.get_services_to_register()
+        if services:
+            logger.info("{} registering services {}".format(self.name, services))
+            self.register_services(services)
+
+    def get_services_to_register(self):
+        """
+        :return: the names of the services registered (in a single message) when the agent starts
+        """
+        return list(self.services)
 
     async def die(self):
         await self.deregister_agent()
@@ -46,6 +52,24 @@ class AbstractAgent(object, metaclass=ABCMeta):
 
         self.add_behaviour(RegisterBehaviour())
 
+    def register_services(self, service_names):
+        """
+        Registers several services with a single message to the service agent.
+
+        :param service_names: list of service names
+        """
+
+        class RegisterServicesBehaviour(OneShotBehaviour):
+            async def run(self):
+                msg = Message(to=self.agent.service_jid)
+                msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.REGISTER_SERVICE))
+                msg.body = json.dumps(
+                    [{Belief.NAME: name, Belief.TEAM: self.agent.team} for name in service_names]
+                )
+                await self.send(msg)
+
+        self.add_behaviour(RegisterServicesBehaviour())
+
     def deregister_service(self, service_name):
         class DeregisterBehaviour(OneShotBehaviour):
             async def run(self):
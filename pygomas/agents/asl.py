@@ -0,0 +1,120 @@
+import collections
+import os
+
+import agentspeak
+import agentspeak.lexer
+import agentspeak.parser
+import agentspeak.runtime
+from agentspeak.runtime import BuildTermVisitor, Intention
+from loguru import logger
+
+LOGGER = agentspeak.get_logger(__name__)
+
+# (path, mtime) -> parsed program, shared by all the troops of the process
+_programs = {}
+# (path, mtime, kind) -> compiled program
+_compiled = {}
+
+
+def parse_asl(path):
+    """
+    Parses an AgentSpeak file once per process (and again if it is modified).
+
+    :param path: path of the ASL file
+    :return: the AST of the program
+    :raises FileNotFoundError: if the file does not exist
+    """
+    key = (path, os.stat(path).st_mtime_ns)
+    if key not in _programs:
+        log = agentspeak.Log(LOGGER, 3)
+        with open(path) as source:
+            tokens = agentspeak.lexer.TokenStream(source, log)
+            ast_agent = agentspeak.parser.parse(source.name, tokens, log)
+        log.throw()
+        _programs[key] = ast_agent
+        logger.debug("Parsed ASL {}".format(path))
+    return _programs[key]
+
+
+def compile_asl(path, actions, kind=None):
+    """
+    Compiles an AgentSpeak file once per process for every kind of agent
+    (e.g. the troop class) using it.
+
+    :param path: path of the ASL file
+    :param actions: actions of the first agent of this kind. All the agents
+                    of the same kind must provide the same actions.
+    :param kind: any hashable identifying the set of actions
+    :return: the CompiledProgram
+    :raises FileNotFoundError: if the file does not exist
+    """
+    ast_agent = parse_asl(path)
+    key = (path, os.stat(path).st_mtime_ns, kind)
+    if key not in _compiled:
+        _compiled[key] = CompiledProgram(path, ast_agent, actions)
+        logger.debug("Compiled ASL {} for {}".format(path, kind))
+    return _compiled[key]
+
+
+class DispatchActions:
+    """
+    Actions used to compile a program shared by several agents.
+    Each action is looked up at run time in the actions of the agent
+    running it, since actions are bound to their own troop.
+    """
+
+    def __init__(self, actions):
+        self.actions = actions
+
+    def lookup(self, functor, arity):
+        # Raises KeyError (as agentspeak.Actions) if the action does not exist
+        self.actions.lookup(functor, arity)
+
+        def dispatch(agent, term, intention):
+            return agent.actions.lookup(functor, arity)(agent, term, intention)
+
+        return dispatch
+
+
+class CompiledProgram:
+    """
+    Rules and plans of an ASL file compiled once and shared (read-only)
+    by the agents instantiated from it.
+    """
+
+    def __init__(self, path, ast_agent, actions):
+        self.path = path
+        self.ast_agent = ast_agent
+        _, self.prototype = agentspeak.runtime.Environment().build_agent_from_ast(
+            None, ast_agent, DispatchActions(actions), name=path
+        )
+
+    def instantiate(self, env, actions):
+        """
+        Creates a runtime agent with its own belief base and intentions.
+
+        :param env: the agentspeak Environment of the agent
+        :param actions: the actions of the agent
+        :return: the agentspeak.runtime.Agent
+        """
+        agent = agentspeak.runtime.Agent(
+            env,
+            env._make_name(self.path),
+            rules=collections.defaultdict(list, {k: list(v) for k, v in self.prototype.rules.items()}),
+            plans=collections.defaultdict(list, {k: list(v) for k, v in self.prototype.plans.items()}),
+        )
+        agent.actions = actions
+
+        for ast_belief in self.ast_agent.beliefs:
+            belief = ast_belief.accept(BuildTermVisitor({}))
+            agent.call(
+                agentspeak.Trigger.addition, agentspeak.GoalType.belief, belief, Intention(), delayed=True
+            )
+        for ast_goal in self.ast_agent.goals:
+            term = ast_goal.atom.accept(BuildTermVisitor({}))
+            agent.call(
+                agentspeak.Trigger.addition, agentspeak.GoalType.achievement, term, Intention(), delayed=True
+            )
+
+        env.agents[agent.name] = agent
+        return agent
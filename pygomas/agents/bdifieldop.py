@@ -1,5 +1,3 @@
-import random
-
 from loguru import logger
 from spade.behaviour import OneShotBehaviour
 
@@ -53,22 +51,22 @@ class BDIFieldOp(BDITroop):
             name = "ammopack_{}_{}@{}".format(
                 self.jid.localpart, BDIFieldOp.packs_delivered, self.jid.domain
             )
-            x = self.movement.position.x + random.random() * BDIFieldOp.ammo_pack_offset
-            z = self.movement.position.z + random.random() * BDIFieldOp.ammo_pack_offset
+            x = self.movement.position.x + self.random.random() * BDIFieldOp.ammo_pack_offset
+            z = self.movement.position.z + self.random.random() * BDIFieldOp.ammo_pack_offset
 
             while not self.check_static_position(x, z):
                 x = (
                     self.movement.position.x
-                    + random.random() * BDIFieldOp.ammo_pack_offset
+                    + self.random.random() * BDIFieldOp.ammo_pack_offset
                 )
                 z = (
                     self.movement.position.z
-                    + random.random() * BDIFieldOp.ammo_pack_offset
+                    + self.random.random() * BDIFieldOp.ammo_pack_offset
                 )
 
             try:
                 pack = AmmoPack(
-                    name=name, passwd="secret", x=x, z=z, manager_jid=self.manager
+                    name=name, passwd="secret", x=x, z=z, manager_jid=self.manager, clock=self.clock
                 )
                 await pack.start()
             except Exception as e:
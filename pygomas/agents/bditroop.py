@@ -1,5 +1,5 @@
 import json
-import random
+import math
 from collections import deque
 
 import agentspeak as asp
@@ -11,6 +11,7 @@ from spade.template import Template
 from spade_bdi.bdi import BDIAgent
 
 from pygomas.algorithms.jps import JPSAlgorithm
+from pygomas.clock import Clock
 from pygomas.config import (
     Config,
     MIN_POWER,
@@ -33,16 +34,33 @@ from pygomas.map import TerrainMap
 from pygomas.ontology import Action, Belief, Performative, Service
 from pygomas.packs.pack import PACK_MEDICPACK, PACK_AMMOPACK, PACK_OBJPACK, PACK_NONE
 from pygomas.utils.mobile import Mobile
+from pygomas.utils.rng import create_rng
 from pygomas.utils.sight import Sight
 from pygomas.utils.threshold import Threshold
 from pygomas.utils.vector import Vector3D
 from .agent import AbstractAgent, LONG_RECEIVE_WAIT
+from .asl import compile_asl
 
 DEFAULT_RADIUS = 20
 ESCAPE_RADIUS = 50
 
 INTERVAL_TO_MOVE = 0.05
 
+# Max seconds without sending DATA to the manager in pipelined mode
+DATA_HEARTBEAT = 1.0
+
+# Minimum displacement required to publish a new position belief
+DEFAULT_POSITION_EPSILON = 0.5
+
+KINEMATIC_BELIEFS = (Belief.POSITION, Belief.VELOCITY, Belief.HEADING)
+
+# Services a troop can subscribe to, with their belief and counter attribute
+SUBSCRIBED_SERVICES = {
+    Service.MEDIC: (Belief.MY_MEDICS, "medics_count"),
+    Service.AMMO: (Belief.MY_FIELDOPS, "fieldops_count"),
+    Service.BACKUP: (Belief.MY_BACKUPS, "soldiers_count"),
+}
+
 ARG_TEAM = 0
 
 CLASS_NONE = 0
@@ -67,12 +85,29 @@ class BDITroop(AbstractAgent, BDIAgent):
         manager_jid="cmanager@localhost",
         service_jid="cservice@localhost",
         velocity_value=3,
+        position_epsilon=DEFAULT_POSITION_EPSILON,
+        pipelined=False,
+        subscribe_services=False,
+        seed=None,
+        speed=1.0,
+        profiler=None,
         *args,
         **kwargs,
     ):
+        # Random stream of this troop. See create_rng.
+        self.random = create_rng(seed, jid)
+        # Game time. Behaviour periods and .wait are measured in game seconds.
+        self.clock = Clock(speed)
+
         AbstractAgent.__init__(self, jid, team=team, service_jid=service_jid)
         BDIAgent.__init__(self, jid=jid, password=passwd, asl=asl, **kwargs)
+        self.bdi_env.time = self.clock.time
         self.pause_bdi()
+        if profiler is not None:
+            # Compiled programs look up the actions of each troop at run time,
+            # so the instrumented ones are used from now on
+            profiler.instrument_actions(self.bdi_actions, type(self).__name__)
+            profiler.instrument_agent(self)
 
         self.service_types = []
 
@@ -122,6 +157,21 @@ class BDITroop(AbstractAgent, BDIAgent):
         # Destination Queue
         self.destinations = deque()
 
+        # Per-tick buffer of kinematic beliefs (position, velocity, heading)
+        self.position_epsilon = position_epsilon
+        self.pending_beliefs = {}
+        # Last value written to the BDI engine of every kinematic belief
+        self.flushed_beliefs = {}
+
+        # Send DATA only on changes and let the manager push FOV updates
+        self.pipelined = pipelined
+        # Behaviour sending DATA to the manager (see add_data_behaviours)
+        self.data_behaviour = None
+
+        # Keep the providers of SUBSCRIBED_SERVICES updated by the service agent
+        self.subscribe_services = subscribe_services
+        self.service_members = {}
+
     def add_custom_actions(self, actions):
         @actions.add_function(".create_control_points", (tuple, float, int))
         def _create_control_points(center, radius, n):
@@ -142,7 +192,7 @@ class BDITroop(AbstractAgent, BDIAgent):
                     if self.map.can_walk(i, j):
                         possible_positions.append((i, 0, j))
 
-            control_points = random.sample(possible_positions, n)
+            control_points = self.random.sample(possible_positions, n)
 
             logger.info(
                 "[{}] Control points: {}".format(self.jid.localpart, control_points)
@@ -155,7 +205,7 @@ class BDITroop(AbstractAgent, BDIAgent):
             Randomly shuffle a tuple
             """
             a_list = [i for i in a_tuple]
-            random.shuffle(a_list)
+            self.random.shuffle(a_list)
             return tuple(a_list)
 
         @actions.add_function(".random_shift", (tuple))
@@ -164,7 +214,7 @@ class BDITroop(AbstractAgent, BDIAgent):
             Randomly shift a tuple
             """
             rotated = deque(a_tuple)
-            rotated.rotate(random.randint(-10, 10))
+            rotated.rotate(self.random.randint(-10, 10))
             return tuple(rotated)
 
         @actions.add(".goto", 1)
@@ -186,26 +236,9 @@ class BDITroop(AbstractAgent, BDIAgent):
                     self.bdi.set_belief(
                         Belief.DESTINATION, tuple((args[0][0], args[0][1], args[0][2]))
                     )
-                    self.bdi.set_belief(
-                        Belief.VELOCITY,
-                        tuple(
-                            (
-                                self.movement.velocity.x,
-                                self.movement.velocity.y,
-                                self.movement.velocity.z,
-                            )
-                        ),
-                    )
-                    self.bdi.set_belief(
-                        Belief.HEADING,
-                        tuple(
-                            (
-                                self.movement.heading.x,
-                                self.movement.heading.y,
-                                self.movement.heading.z,
-                            )
-                        ),
-                    )
+                    self.buffer_belief(Belief.VELOCITY, self.movement.velocity)
+                    self.buffer_belief(Belief.HEADING, self.movement.heading)
+                    self.flush_beliefs()
                 else:
                     self.destinations = deque()
                     self.movement.destination.x = self.movement.position.x
@@ -294,6 +327,11 @@ class BDITroop(AbstractAgent, BDIAgent):
             args = asp.grounded(term.args, intention.scope)
             service = str(args[0])
 
+            if self.subscribe_services and service in SUBSCRIBED_SERVICES:
+                self.set_service_belief(service, belief=service)
+                yield
+                return
+
             class GetServiceBehaviour(OneShotBehaviour):
                 async def run(self):
                     msg = Message()
@@ -329,6 +367,11 @@ class BDITroop(AbstractAgent, BDIAgent):
             Medic service.
             """
 
+            if self.subscribe_services:
+                self.set_service_belief(Service.MEDIC)
+                yield
+                return
+
             class GetMedicBehaviour(OneShotBehaviour):
                 async def run(self):
                     msg = Message()
@@ -366,6 +409,11 @@ class BDITroop(AbstractAgent, BDIAgent):
             Ammo service.
             """
 
+            if self.subscribe_services:
+                self.set_service_belief(Service.AMMO)
+                yield
+                return
+
             class GetFieldopsBehaviour(OneShotBehaviour):
                 async def run(self):
                     msg = Message()
@@ -403,6 +451,11 @@ class BDITroop(AbstractAgent, BDIAgent):
             Backup service.
             """
 
+            if self.subscribe_services:
+                self.set_service_belief(Service.BACKUP)
+                yield
+                return
+
             class GetBackupBehaviour(OneShotBehaviour):
                 async def run(self):
                     msg = Message()
@@ -456,16 +509,8 @@ class BDITroop(AbstractAgent, BDIAgent):
 
             self.movement.heading = Vector3D(x=look_at_x, y=0, z=look_at_z)
             self.movement.heading.normalize()
-            self.bdi.set_belief(
-                Belief.HEADING,
-                tuple(
-                    (
-                        self.movement.heading.x,
-                        self.movement.heading.y,
-                        self.movement.heading.z,
-                    )
-                ),
-            )
+            self.buffer_belief(Belief.HEADING, self.movement.heading)
+            self.flush_beliefs()
             yield
 
         @actions.add(".turn", 1)
@@ -483,23 +528,15 @@ class BDITroop(AbstractAgent, BDIAgent):
             z = self.movement.heading.z
             x = self.movement.heading.x
             if z == 0 and x == 0:
-                self.movement.heading.z = random.random()
-                self.movement.heading.x = random.random()
+                self.movement.heading.z = self.random.random()
+                self.movement.heading.x = self.random.random()
             atan_angle = arctan2(z, x)
             atan_angle += angle
             norm = self.movement.heading.length()
             self.movement.heading.x = norm * cos(atan_angle)
             self.movement.heading.z = norm * sin(atan_angle)
-            self.bdi.set_belief(
-                Belief.HEADING,
-                tuple(
-                    (
-                        self.movement.heading.x,
-                        self.movement.heading.y,
-                        self.movement.heading.z,
-                    )
-                ),
-            )
+            self.buffer_belief(Belief.HEADING, self.movement.heading)
+            self.flush_beliefs()
             yield
 
         @actions.add(".stop", 0)
@@ -528,6 +565,25 @@ class BDITroop(AbstractAgent, BDIAgent):
 
         super().add_custom_actions(actions)
 
+    def _load_asl(self):
+        # Same as BDIAgent._load_asl, but the ASL file is compiled only once
+        # for all the troops of the same class sharing it.
+        self.pause_bdi()
+        try:
+            program = compile_asl(self.asl_file, self.bdi_actions, kind=type(self))
+        except FileNotFoundError:
+            logger.info(
+                "Warning: ASL specified for {} does not exist. Disabling BDI.".format(
+                    self.jid
+                )
+            )
+            self.asl_file = None
+            self.pause_bdi()
+            return
+        self.bdi_agent = program.instantiate(self.bdi_env, self.bdi_actions)
+        self.bdi_agent.name = self.jid
+        self.resume_bdi()
+
     async def start(self, auto_register=True):
         self.health = MAX_HEALTH
         self.protection = 25
@@ -558,25 +614,58 @@ class BDITroop(AbstractAgent, BDIAgent):
         self.add_behaviour(self.ShootResponderBehaviour(period=0), t)
 
         # Behaviour to inform manager our position, status, and so on
-        t = Template()
-        t.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DATA))
-        self.add_behaviour(self.DataFromTroopBehaviour(period=INTERVAL_TO_MOVE), t)
+        self.add_data_behaviours()
+
+        if self.subscribe_services:
+            t = Template()
+            t.set_metadata(str(Performative.PERFORMATIVE), str(Performative.SERVICES))
+            self.add_behaviour(self.ServiceUpdateBehaviour(), t)
 
         # Behaviour to increment inner variables (Power, Stamina and Health Bars)
         # self.agent.Launch_BarsAddOn_InnerBehaviour()
-        self.add_behaviour(self.RestoreBehaviour(period=1))
+        self.add_behaviour(self.RestoreBehaviour(period=self.clock.period(1)))
 
         await super().start(auto_register)
 
+    def add_data_behaviours(self):
+        """
+        Adds the behaviours exchanging DATA with the manager: a request and
+        reply loop, or in pipelined mode, a sender of the changes and a
+        receiver of the FOV pushed by the manager.
+        """
+        t = Template()
+        t.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DATA))
+        if self.pipelined:
+            self.data_behaviour = self.PipelinedDataBehaviour(period=self.clock.period(INTERVAL_TO_MOVE))
+            self.add_behaviour(self.data_behaviour)
+            self.add_behaviour(self.DataResponderBehaviour(), t)
+        else:
+            self.data_behaviour = self.DataFromTroopBehaviour(period=self.clock.period(INTERVAL_TO_MOVE))
+            self.add_behaviour(self.data_behaviour, t)
+
+    def use_pipelined_data(self):
+        """Switches to pipelined mode, e.g. when the manager broadcasts the world."""
+        if self.pipelined:
+            return
+        self.pipelined = True
+        if self.data_behaviour is not None:
+            self.remove_behaviour(self.data_behaviour)
+        self.add_data_behaviours()
+
+    def get_services_to_register(self):
+        services = super().get_services_to_register()
+        services += [str(service) for service in self.service_types or []]
+        services.append("allied" if self.team == TEAM_ALLIED else "axis")
+        return services
+
     class CreateBasicTroopBehaviour(OneShotBehaviour):
         async def run(self):
-            if self.agent.service_types is not None:
-                for service in self.agent.service_types:
-                    self.agent.register_service(str(service))
-            if self.agent.team == TEAM_ALLIED:
-                self.agent.register_service("allied")
-            else:
-                self.agent.register_service("axis")
+            if self.agent.subscribe_services:
+                for service in SUBSCRIBED_SERVICES:
+                    msg = Message(to=self.agent.service_jid)
+                    msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.SUBSCRIBE))
+                    msg.body = json.dumps({Belief.NAME: service, Belief.TEAM: self.agent.team})
+                    await self.send(msg)
 
             msg = Message(to=self.agent.manager)
             msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.INIT))
@@ -585,6 +674,7 @@ class BDITroop(AbstractAgent, BDIAgent):
                     Belief.NAME: self.agent.name,
                     Action.TYPE: str(self.agent.eclass),
                     Belief.TEAM: str(self.agent.team),
+                    Action.PIPELINED: self.agent.pipelined,
                 }
             )
             logger.trace(f"Sending init message: {msg}")
@@ -602,15 +692,8 @@ class BDITroop(AbstractAgent, BDIAgent):
                 if (absx < PRECISION_X) and (absz < PRECISION_Z):
                     x, z = self.agent.destinations.popleft()
                     self.agent.movement.position = Vector3D(x=x, y=0, z=z)
-                    self.agent.bdi.set_belief(
-                        Belief.POSITION,
-                        tuple(
-                            (
-                                self.agent.movement.position.x,
-                                self.agent.movement.position.y,
-                                self.agent.movement.position.z,
-                            )
-                        ),
+                    self.agent.buffer_belief(
+                        Belief.POSITION, self.agent.movement.position, force=True
                     )
 
                     if len(self.agent.destinations) == 0:
@@ -631,13 +714,21 @@ class BDITroop(AbstractAgent, BDIAgent):
                     move_result = self.agent.move(INTERVAL_TO_MOVE)
                     if move_result == MV_CANNOT_GET_POSITION:
                         self.agent.escape_barrier()
+                        self.agent.settle_position()
+            else:
+                self.agent.settle_position()
+            self.agent.flush_beliefs()
 
     class InitResponderBehaviour(CyclicBehaviour):
         async def run(self):
             msg = await self.receive(timeout=LONG_RECEIVE_WAIT)
             if msg:
-                map_name = json.loads(msg.body)[Action.MAP]
+                content = json.loads(msg.body)
+                map_name = content[Action.MAP]
                 logger.info("[" + self.agent.name + "]: Beginning to fight")
+                if content.get(Action.PIPELINED, False):
+                    # The manager pushes the FOV instead of replying to DATA
+                    self.agent.use_pipelined_data()
                 self.agent.map = TerrainMap()
                 config = Config(self.agent.map_path)
                 self.agent.map.load_map(map_name, config)
@@ -655,7 +746,7 @@ class BDITroop(AbstractAgent, BDIAgent):
                 t = Template()
                 t.set_metadata(str(Performative.PERFORMATIVE), str(Performative.MOVE))
                 self.agent.add_behaviour(
-                    self.agent.MoveBehaviour(period=INTERVAL_TO_MOVE), t
+                    self.agent.MoveBehaviour(period=self.agent.clock.period(INTERVAL_TO_MOVE)), t
                 )
 
                 self.kill()
@@ -717,16 +808,10 @@ class BDITroop(AbstractAgent, BDIAgent):
                     self.agent.bdi.set_belief(Belief.TEAM, self.agent.team)
                     self.agent.bdi.set_belief(Belief.CLASS, self.agent.eclass)
                     self.agent.bdi.set_belief(Belief.BASE, tuple((x, y, z)))
-                    self.agent.bdi.set_belief(
-                        Belief.POSITION,
-                        tuple(
-                            (
-                                self.agent.movement.position.x,
-                                self.agent.movement.position.y,
-                                self.agent.movement.position.z,
-                            )
-                        ),
+                    self.agent.buffer_belief(
+                        Belief.POSITION, self.agent.movement.position, force=True
                     )
+                    self.agent.flush_beliefs()
                     self.agent.bdi.set_belief(Belief.HEALTH, self.agent.health)
                     self.agent.bdi.set_belief(Belief.AMMO, self.agent.ammo)
                     self.agent.bdi.set_belief(
@@ -788,23 +873,9 @@ class BDITroop(AbstractAgent, BDIAgent):
             try:
                 if not self.agent.movement:
                     return
-                content = {
-                    Belief.NAME: self.agent.name,
-                    Action.X: self.agent.movement.position.x,
-                    Action.Y: self.agent.movement.position.y,
-                    Action.Z: self.agent.movement.position.z,
-                    Action.VEL_X: self.agent.movement.velocity.x,
-                    Action.VEL_Y: self.agent.movement.velocity.y,
-                    Action.VEL_Z: self.agent.movement.velocity.z,
-                    Action.HEAD_X: self.agent.movement.heading.x,
-                    Action.HEAD_Y: self.agent.movement.heading.y,
-                    Action.HEAD_Z: self.agent.movement.heading.z,
-                    Belief.HEALTH: self.agent.health,
-                    Belief.AMMO: self.agent.ammo,
-                }
                 msg = Message(to=self.agent.manager)
                 msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DATA))
-                msg.body = json.dumps(content)
+                msg.body = json.dumps(self.agent.get_data_content())
 
                 if self.agent.is_alive():
                     await self.send(msg)
@@ -812,66 +883,50 @@ class BDITroop(AbstractAgent, BDIAgent):
                 info = await self.receive(LONG_RECEIVE_WAIT)
                 if info is None:
                     return
-                info = json.loads(info.body)
-
-                packs = info[Action.PACKS] if info[Action.PACKS] is not None else []
-                for pack in packs:
-                    pack = json.loads(pack)
-                    quantity = pack[Action.QTY]
-                    type_ = pack[Action.TYPE]
-                    self.agent.pack_taken(pack_type=type_, quantity=quantity)
-
-                self.agent.fov_objects = []
-                fovs = info[Action.FOV] if info[Action.FOV] is not None else []
-                if len(fovs) <= 0:
-                    self.agent.aimed_agent = None
-                else:
-                    for idx, obj in enumerate(fovs):
-                        s = Sight()
-                        s.sight_id = idx
-                        s.team = int(obj[Belief.TEAM])
-                        s.type = int(obj[Action.TYPE])
-                        s.angle = float(obj[Action.ANGLE])
-                        s.distance = float(obj[Action.DISTANCE])
-                        s.health = int(obj[Belief.HEALTH])
-                        s.position.x = float(obj[Action.X])
-                        s.position.y = float(obj[Action.Y])
-                        s.position.z = float(obj[Action.Z])
-                        self.agent.fov_objects.append(s)
-                        if s.team == TEAM_NONE:
-                            self.agent.bdi.set_belief(
-                                Belief.PACKS_IN_FOV,
-                                idx,
-                                int(obj[Action.TYPE]),
-                                float(obj[Action.ANGLE]),
-                                float(obj[Action.DISTANCE]),
-                                int(obj[Belief.HEALTH]),
-                                tuple((float(obj[Action.X]), float(obj[Action.Y]), float(obj[Action.Z]))),
-                            )
-                        elif s.team == self.agent.team:
-                            self.agent.bdi.set_belief(
-                                Belief.FRIENDS_IN_FOV,
-                                idx,
-                                int(obj[Action.TYPE]),
-                                float(obj[Action.ANGLE]),
-                                float(obj[Action.DISTANCE]),
-                                int(obj[Belief.HEALTH]),
-                                tuple((float(obj[Action.X]), float(obj[Action.Y]), float(obj[Action.Z]))),
-                            )
-                        else:
-                            self.agent.bdi.set_belief(
-                                Belief.ENEMIES_IN_FOV,
-                                idx,
-                                int(obj[Action.TYPE]),
-                                float(obj[Action.ANGLE]),
-                                float(obj[Action.DISTANCE]),
-                                int(obj[Belief.HEALTH]),
-                                tuple((float(obj[Action.X]), float(obj[Action.Y]), float(obj[Action.Z]))),
-                            )
+                self.agent.process_data_reply(json.loads(info.body))
 
             except ZeroDivisionError:
                 pass
 
+    # Pipelined mode: inform the manager only when our state changes
+    class PipelinedDataBehaviour(PeriodicBehaviour):
+        async def on_start(self):
+            self.last_content = None
+            self.last_sent = 0
+
+        async def run(self):
+            if not self.agent.movement:
+                return
+            content = self.agent.get_data_content()
+            now = self.agent.clock.time()
+            if content == self.last_content and now - self.last_sent < DATA_HEARTBEAT:
+                return
+
+            msg = Message(to=self.agent.manager)
+            msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DATA))
+            msg.body = json.dumps(content)
+            if self.agent.is_alive():
+                await self.send(msg)
+            self.last_content = content
+            self.last_sent = now
+
+    # Pipelined mode: FOV and packs pushed by the manager
+    class DataResponderBehaviour(CyclicBehaviour):
+        async def run(self):
+            info = await self.receive(timeout=LONG_RECEIVE_WAIT)
+            if info:
+                try:
+                    self.agent.process_data_reply(json.loads(info.body))
+                except ZeroDivisionError:
+                    pass
+
+    # Behaviour to apply the changes of the providers of the subscribed services
+    class ServiceUpdateBehaviour(CyclicBehaviour):
+        async def run(self):
+            msg = await self.receive(timeout=LONG_RECEIVE_WAIT)
+            if msg:
+                self.agent.update_service_members(json.loads(msg.body))
+
     # Behaviour to increment inner variables (Power, Stamina and Health Bars)
     class RestoreBehaviour(PeriodicBehaviour):
         async def run(self):
@@ -885,6 +940,138 @@ class BDITroop(AbstractAgent, BDIAgent):
                 if self.agent.health < MAX_HEALTH:
                     self.agent.health = self.agent.health + 1
 
+    def update_service_members(self, content):
+        members = self.service_members.setdefault(content[Belief.NAME], {})
+        for jid in content[Action.REMOVED]:
+            members.pop(jid, None)
+        for jid in content[Action.ADDED]:
+            members[jid] = None
+
+    def set_service_belief(self, service, belief=None):
+        """
+        Sets the belief with the providers of a subscribed service, without
+        asking the service agent.
+
+        :param service: the service
+        :param belief: the belief to set (the one of SUBSCRIBED_SERVICES by default)
+        """
+        default_belief, counter = SUBSCRIBED_SERVICES[service]
+        members = tuple(self.service_members.get(service, ()))
+        setattr(self, counter, len(members))
+        self.bdi.set_belief(belief if belief is not None else default_belief, members)
+
+    def get_data_content(self):
+        """
+        Builds the DATA content with the current state of the troop.
+
+        :returns dict with name, position, velocity, heading, health and ammo
+        """
+        return {
+            Belief.NAME: self.name,
+            Action.X: self.movement.position.x,
+            Action.Y: self.movement.position.y,
+            Action.Z: self.movement.position.z,
+            Action.VEL_X: self.movement.velocity.x,
+            Action.VEL_Y: self.movement.velocity.y,
+            Action.VEL_Z: self.movement.velocity.z,
+            Action.HEAD_X: self.movement.heading.x,
+            Action.HEAD_Y: self.movement.heading.y,
+            Action.HEAD_Z: self.movement.heading.z,
+            Belief.HEALTH: self.health,
+            Belief.AMMO: self.ammo,
+        }
+
+    def process_data_reply(self, info):
+        """
+        Updates the packs taken and the objects in the field of view
+        with the DATA sent by the manager.
+
+        :param info: dict with the packs taken and the FOV objects
+        """
+        if Action.SNAPSHOT in info:
+            info = self.extract_snapshot(info[Action.SNAPSHOT])
+
+        packs = info[Action.PACKS] if info[Action.PACKS] is not None else []
+        for pack in packs:
+            pack = json.loads(pack)
+            quantity = pack[Action.QTY]
+            type_ = pack[Action.TYPE]
+            self.pack_taken(pack_type=type_, quantity=quantity)
+
+        self.fov_objects = []
+        fovs = info[Action.FOV] if info[Action.FOV] is not None else []
+        if len(fovs) <= 0:
+            self.aimed_agent = None
+        else:
+            for idx, obj in enumerate(fovs):
+                s = Sight()
+                s.sight_id = idx
+                s.team = int(obj[Belief.TEAM])
+                s.type = int(obj[Action.TYPE])
+                s.angle = float(obj[Action.ANGLE])
+                s.distance = float(obj[Action.DISTANCE])
+                s.health = int(obj[Belief.HEALTH])
+                s.position.x = float(obj[Action.X])
+                s.position.y = float(obj[Action.Y])
+                s.position.z = float(obj[Action.Z])
+                self.fov_objects.append(s)
+                if s.team == TEAM_NONE:
+                    belief = Belief.PACKS_IN_FOV
+                elif s.team == self.team:
+                    belief = Belief.FRIENDS_IN_FOV
+                else:
+                    belief = Belief.ENEMIES_IN_FOV
+                self.bdi.set_belief(
+                    belief,
+                    idx,
+                    int(obj[Action.TYPE]),
+                    float(obj[Action.ANGLE]),
+                    float(obj[Action.DISTANCE]),
+                    int(obj[Belief.HEALTH]),
+                    tuple((float(obj[Action.X]), float(obj[Action.Y]), float(obj[Action.Z]))),
+                )
+
+    def extract_snapshot(self, snapshot):
+        """
+        Extracts the packs taken and the FOV objects of this troop from a
+        team snapshot broadcasted by the manager. Angle and distance of every
+        object are calculated locally from our position and heading.
+
+        :param snapshot: dict with the entries, FOV bitsets and packs taken
+        :returns dict with the packs taken and the FOV objects
+        """
+        bits = snapshot[Action.FOV].get(self.name, 0)
+        position = self.movement.position
+        heading = self.movement.heading
+        fovs = []
+        for idx, entry in enumerate(snapshot[Action.ENTRIES]):
+            if not (bits >> idx) & 1:
+                continue
+            team, type_, health, x, y, z = entry
+            v = Vector3D(x=x - position.x, y=y - position.y, z=z - position.z)
+            distance = v.length()
+            try:
+                angle = heading.dot(v) / (heading.length() * distance)
+            except ZeroDivisionError:
+                angle = 0
+            angle = math.acos(max(-1, min(1, angle)))
+            fovs.append(
+                {
+                    Belief.TEAM: team,
+                    Action.TYPE: type_,
+                    Action.ANGLE: angle,
+                    Action.DISTANCE: distance,
+                    Belief.HEALTH: health,
+                    Action.X: x,
+                    Action.Y: y,
+                    Action.Z: z,
+                }
+            )
+        return {
+            Action.PACKS: snapshot[Action.PACKS].get(self.name, []),
+            Action.FOV: fovs,
+        }
+
     def generate_spawn_position(self):
         if self.team == TEAM_ALLIED:
             w = self.map.allied_base.end.x - self.map.allied_base.init.x
@@ -898,8 +1085,8 @@ class BDITroop(AbstractAgent, BDIAgent):
             offset_x = self.map.axis_base.init.x
             offset_z = self.map.axis_base.init.z
 
-        x = int((random.random() * w) + offset_x)
-        z = int((random.random() * h) + offset_z)
+        x = int((self.random.random() * w) + offset_x)
+        z = int((self.random.random() * h) + offset_z)
 
         logger.info("Spawn position for agent {} is ({}, {})".format(self.name, x, z))
 
@@ -920,16 +1107,7 @@ class BDITroop(AbstractAgent, BDIAgent):
         else:
             if self.movement.position != new_position:
                 self.movement.position = Vector3D(new_position)
-                self.bdi.set_belief(
-                    Belief.POSITION,
-                    tuple(
-                        (
-                            self.movement.position.x,
-                            self.movement.position.y,
-                            self.movement.position.z,
-                        )
-                    ),
-                )
+                self.buffer_belief(Belief.POSITION, self.movement.position)
             x, z = self.destinations[0]
             self.compare_orientation(x, z)
             return MV_OK
@@ -939,27 +1117,57 @@ class BDITroop(AbstractAgent, BDIAgent):
         last_heading = Vector3D(self.movement.heading)
         self.movement.calculate_new_orientation(Vector3D(x=x, y=0, z=z))
         if last_velocity != self.movement.velocity:
-            self.bdi.set_belief(
-                Belief.VELOCITY,
-                tuple(
-                    (
-                        self.movement.velocity.x,
-                        self.movement.velocity.y,
-                        self.movement.velocity.z,
-                    )
-                ),
-            )
+            self.buffer_belief(Belief.VELOCITY, self.movement.velocity)
         if last_heading != self.movement.heading:
-            self.bdi.set_belief(
-                Belief.HEADING,
-                tuple(
-                    (
-                        self.movement.heading.x,
-                        self.movement.heading.y,
-                        self.movement.heading.z,
-                    )
-                ),
-            )
+            self.buffer_belief(Belief.HEADING, self.movement.heading)
+
+    def buffer_belief(self, belief, vector, force=False):
+        """
+        Stores a kinematic belief (position, velocity or heading) to be written
+        to the BDI engine in the next call to flush_beliefs. Only the last value
+        buffered for each belief during a tick is written. Kinematic beliefs
+        must always be written through this buffer, since it keeps track of
+        the values already known by the BDI engine.
+
+        :param belief: one of Belief.POSITION, Belief.VELOCITY or Belief.HEADING
+        :param vector: the Vector3D with the new value
+        :param force: write the belief even if it is under the position epsilon
+        """
+        self.pending_beliefs[belief] = ((vector.x, vector.y, vector.z), force)
+
+    def settle_position(self):
+        """
+        Forces the current position to be written if it differs from the
+        last written one, so a troop stopping within position_epsilon of
+        its last position belief does not keep a stale one.
+        """
+        position = self.movement.position
+        if self.flushed_beliefs.get(Belief.POSITION) != (position.x, position.y, position.z):
+            self.buffer_belief(Belief.POSITION, position, force=True)
+
+    def flush_beliefs(self):
+        """
+        Writes the buffered kinematic beliefs to the BDI engine, once per belief.
+
+        Values equal to the last written ones, and position changes shorter
+        than position_epsilon (measured from the last written position), are
+        dropped unless they were buffered with force.
+        """
+        if not self.pending_beliefs:
+            return
+        pending, self.pending_beliefs = self.pending_beliefs, {}
+        for belief in KINEMATIC_BELIEFS:
+            if belief not in pending:
+                continue
+            value, force = pending[belief]
+            last = self.flushed_beliefs.get(belief)
+            if not force and last is not None:
+                if last == value:
+                    continue
+                if belief == Belief.POSITION and math.dist(last, value) < self.position_epsilon:
+                    continue
+            self.flushed_beliefs[belief] = value
+            self.bdi.set_belief(belief, value)
 
     def pack_taken(self, pack_type, quantity):
         if pack_type == PACK_MEDICPACK:
@@ -1149,7 +1357,7 @@ class BDITroop(AbstractAgent, BDIAgent):
 
         while True:
             self.movement.calculate_new_destination(
-                radius_x=ESCAPE_RADIUS, radius_y=ESCAPE_RADIUS
+                radius_x=ESCAPE_RADIUS, radius_y=ESCAPE_RADIUS, rng=self.random
             )
             if self.check_static_position(
                 self.movement.destination.x, self.movement.destination.z
@@ -1174,10 +1382,10 @@ class BDITroop(AbstractAgent, BDIAgent):
             self.movement.velocity.z = 0.0
             self.movement.velocity.x = float(1 * sign(self.movement.velocity.x))
         """
-        gx, gz = random.gauss(0, 0.1), random.gauss(0, 0.1)
+        gx, gz = self.random.gauss(0, 0.1), self.random.gauss(0, 0.1)
         self.movement.velocity.x += gx
         self.movement.velocity.z += gz
-        if random.randint(0, 1) == 0:
+        if self.random.randint(0, 1) == 0:
             self.movement.velocity.x *= -1
         else:
             self.movement.velocity.z *= -1
@@ -3,26 +3,45 @@ import json
 from loguru import logger
 from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour
+from spade.message import Message
 from spade.template import Template
 
 from pygomas.agents.agent import LONG_RECEIVE_WAIT
 from pygomas.config import TEAM_NONE, TEAM_ALLIED, TEAM_AXIS
-from pygomas.ontology import Performative, Service, Belief
+from pygomas.ontology import Action, Performative, Service, Belief
 
 
-class ServiceAgent(Agent):
-    def __init__(self, jid="cservice@localhost", password="secret"):
+class ServiceDirectory:
+    """
+    Registry of the services offered by the troops of each team. It is run
+    by the ServiceAgent or embedded in another agent (see add_behaviours).
+    """
+
+    def __init__(self):
+        # name -> team -> providers. Dicts are used as insertion-ordered sets.
         self.services = {}
-        super().__init__(jid=jid, password=password)
+        # jid -> set of (name, team) registered by the agent
+        self.agent_services = {}
+        # (name, team) -> questioner -> serialized reply
+        self.replies = {}
+        # (name, team) -> subscribers, and jid -> set of (name, team) subscribed
+        self.subscribers = {}
+        self.agent_subscriptions = {}
+        # (name, team) -> (added, removed) providers not pushed to the subscribers yet
+        self.updates = {}
 
     def register_service(self, service_descriptor, jid):
         name = service_descriptor[Belief.NAME]
         team = service_descriptor[Belief.TEAM]
 
         if name not in self.services.keys():
-            self.services[name] = {TEAM_AXIS: [], TEAM_ALLIED: [], TEAM_NONE: []}
+            self.services[name] = {TEAM_AXIS: {}, TEAM_ALLIED: {}, TEAM_NONE: {}}
 
-        self.services[name][team].append(jid)
+        if jid not in self.services[name][team]:
+            self.services[name][team][jid] = None
+            self._add_update(name, team, jid, added=True)
+        self.agent_services.setdefault(jid, set()).add((name, team))
+        self.replies.pop((name, team), None)
         logger.info("Service {} of team {} registered for {}".format(name, team, jid))
 
     def deregister_service(self, service_descriptor, jid):
@@ -30,20 +49,72 @@ class ServiceAgent(Agent):
         team = service_descriptor[Belief.TEAM]
 
         if name in self.services.keys() and jid in self.services[name][team]:
-            self.services[name][team].remove(jid)
+            self._remove(name, team, jid)
+            self.agent_services[jid].discard((name, team))
         logger.info("Service {} of team {} deregistered for {}".format(name, team, jid))
 
     def deregister_agent(self, jid):
         logger.info("Deregistering all services of agent {}".format(jid))
-        for name in self.services.keys():
-            for team in [TEAM_ALLIED, TEAM_AXIS]:
-                if jid in self.services[name][team]:
-                    self.services[name][team].remove(jid)
-                    logger.info(
-                        "Service {} of team {} deregistered for {}".format(
-                            name, team, jid
-                        )
-                    )
+        for key in self.agent_subscriptions.pop(jid, ()):
+            del self.subscribers[key][jid]
+        for name, team in self.agent_services.pop(jid, ()):
+            self._remove(name, team, jid)
+            logger.info(
+                "Service {} of team {} deregistered for {}".format(name, team, jid)
+            )
+
+    def _remove(self, name, team, jid):
+        del self.services[name][team][jid]
+        self.replies.pop((name, team), None)
+        self._add_update(name, team, jid, added=False)
+
+    def _add_update(self, name, team, jid, added):
+        if not self.subscribers.get((name, team)):
+            return
+        added_jids, removed_jids = self.updates.setdefault((name, team), ({}, {}))
+        if added:
+            removed_jids.pop(jid, None)
+            added_jids[jid] = None
+        else:
+            added_jids.pop(jid, None)
+            removed_jids[jid] = None
+
+    def subscribe(self, service_descriptor, jid):
+        """
+        Subscribes an agent to the changes of the providers of a service
+        :return: the current providers of the service
+        """
+        key = (service_descriptor[Belief.NAME], service_descriptor[Belief.TEAM])
+        self.subscribers.setdefault(key, {})[jid] = None
+        self.agent_subscriptions.setdefault(jid, set()).add(key)
+        logger.info("Agent {} subscribed to service {} of team {}".format(jid, *key))
+        return self.get_service(service_descriptor, jid)
+
+    def pop_updates(self):
+        """
+        :return: list of (subscriber, content) with the changes of the providers
+                 of the services each subscriber has to be notified of
+        """
+        notifications = []
+        for (name, team), (added, removed) in self.updates.items():
+            for subscriber in self.subscribers.get((name, team), ()):
+                content = {
+                    Belief.NAME: name,
+                    Belief.TEAM: team,
+                    Action.ADDED: [jid for jid in added if jid != subscriber],
+                    Action.REMOVED: [jid for jid in removed if jid != subscriber],
+                }
+                if content[Action.ADDED] or content[Action.REMOVED]:
+                    notifications.append((subscriber, content))
+        self.updates = {}
+        return notifications
+
+    async def push_updates(self, behaviour):
+        for subscriber, content in self.pop_updates():
+            msg = Message(to=subscriber)
+            msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.SERVICES))
+            msg.body = json.dumps(content)
+            await behaviour.send(msg)
 
     def get_service(self, service_descriptor, questioner):
         logger.debug("get service: {}".format(service_descriptor))
@@ -52,69 +123,108 @@ class ServiceAgent(Agent):
 
         if name in self.services.keys():
             logger.debug("I got service")
-            request = self.services[name][team][:]
-            if questioner in request:
-                request.remove(questioner)
-            return request
+            return [jid for jid in self.services[name][team] if jid != questioner]
         else:
             logger.debug("No service")
             return []
 
-    async def setup(self):
+    def get_service_reply(self, service_descriptor, questioner):
+        """
+        Same as get_service, but serialized. Replies are cached until the
+        providers of the service change.
+        """
+        key = (service_descriptor[Belief.NAME], service_descriptor[Belief.TEAM])
+        replies = self.replies.setdefault(key, {})
+        # Everybody but the providers gets the same reply
+        if key[0] not in self.services or questioner not in self.services[key[0]][key[1]]:
+            questioner = None
+        if questioner not in replies:
+            replies[questioner] = json.dumps(self.get_service(service_descriptor, questioner))
+        return replies[questioner]
+
+    def add_behaviours(self, agent):
+        """
+        Adds to agent the behaviours serving the messages of the directory
+        """
         template1 = Template()
         template1.set_metadata(str(Performative.PERFORMATIVE), str(Performative.REGISTER_SERVICE))
-        self.add_behaviour(RegisterServiceBehaviour(), template1)
+        agent.add_behaviour(RegisterServiceBehaviour(self), template1)
 
         template2 = Template()
         template2.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DEREGISTER_SERVICE))
-        self.add_behaviour(DeregisterServiceBehaviour(), template2)
+        agent.add_behaviour(DeregisterServiceBehaviour(self), template2)
 
         template3 = Template()
         template3.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DEREGISTER_AGENT))
-        self.add_behaviour(DeregisterAgentBehaviour(), template3)
+        agent.add_behaviour(DeregisterAgentBehaviour(self), template3)
 
         template4 = Template()
         template4.set_metadata(str(Performative.PERFORMATIVE), str(Performative.GET))
-        self.add_behaviour(GetServiceBehaviour(), template4)
+        agent.add_behaviour(GetServiceBehaviour(self), template4)
+
+        template5 = Template()
+        template5.set_metadata(str(Performative.PERFORMATIVE), str(Performative.SUBSCRIBE))
+        agent.add_behaviour(SubscribeBehaviour(self), template5)
+
+
+class ServiceAgent(ServiceDirectory, Agent):
+    def __init__(self, jid="cservice@localhost", password="secret"):
+        ServiceDirectory.__init__(self)
+        Agent.__init__(self, jid=jid, password=password)
+
+    async def setup(self):
+        self.add_behaviours(self)
 
 
-class RegisterServiceBehaviour(CyclicBehaviour):
+class DirectoryBehaviour(CyclicBehaviour):
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+
+
+class RegisterServiceBehaviour(DirectoryBehaviour):
     async def run(self):
         msg = await self.receive(timeout=LONG_RECEIVE_WAIT)
         if msg:
             logger.info(
                 "Register Service {} for {}.".format(msg.body, msg.sender.bare())
             )
-            self.agent.register_service(json.loads(msg.body), str(msg.sender.bare()))
+            content = json.loads(msg.body)
+            # A troop may register all its services at once
+            descriptors = content if isinstance(content, list) else [content]
+            for service_descriptor in descriptors:
+                self.directory.register_service(service_descriptor, str(msg.sender.bare()))
+            await self.directory.push_updates(self)
 
 
-class DeregisterServiceBehaviour(CyclicBehaviour):
+class DeregisterServiceBehaviour(DirectoryBehaviour):
     async def run(self):
         msg = await self.receive(timeout=LONG_RECEIVE_WAIT)
         if msg:
             logger.info(
                 "Deregister Service {} for {}.".format(msg.body, msg.sender.bare())
             )
-            self.agent.deregister_service(json.loads(msg.body), str(msg.sender.bare()))
+            self.directory.deregister_service(json.loads(msg.body), str(msg.sender.bare()))
+            await self.directory.push_updates(self)
 
 
-class DeregisterAgentBehaviour(CyclicBehaviour):
+class DeregisterAgentBehaviour(DirectoryBehaviour):
     async def run(self):
         msg = await self.receive(timeout=LONG_RECEIVE_WAIT)
         if msg:
-            self.agent.deregister_agent(str(msg.sender.bare()))
+            self.directory.deregister_agent(str(msg.sender.bare()))
             logger.info("Agent {} deregistered".format(msg.sender.bare()))
+            await self.directory.push_updates(self)
 
 
-class GetServiceBehaviour(CyclicBehaviour):
+class GetServiceBehaviour(DirectoryBehaviour):
     async def run(self):
         msg = await self.receive(timeout=LONG_RECEIVE_WAIT)
         if msg:
             logger.info("Requesting service {}".format(msg.body))
             body = json.loads(msg.body)
-            names = self.agent.get_service(body, str(msg.sender).split("/")[0])
             reply = msg.make_reply()
-            reply.body = json.dumps(names)
+            reply.body = self.directory.get_service_reply(body, str(msg.sender).split("/")[0])
             if body[Belief.NAME] == Service.AMMO:
                 reply.set_metadata(str(Performative.PERFORMATIVE), str(Performative.CFA))
             elif body[Belief.NAME] == Service.MEDIC:
@@ -125,3 +235,22 @@ class GetServiceBehaviour(CyclicBehaviour):
                 reply.set_metadata(str(Performative.PERFORMATIVE), str(body[Belief.NAME]))
             await self.send(reply)
             logger.info("Services sent: {}".format(reply.body))
+
+
+class SubscribeBehaviour(DirectoryBehaviour):
+    async def run(self):
+        msg = await self.receive(timeout=LONG_RECEIVE_WAIT)
+        if msg:
+            body = json.loads(msg.body)
+            names = self.directory.subscribe(body, str(msg.sender.bare()))
+            reply = Message(to=str(msg.sender.bare()))
+            reply.set_metadata(str(Performative.PERFORMATIVE), str(Performative.SERVICES))
+            reply.body = json.dumps(
+                {
+                    Belief.NAME: body[Belief.NAME],
+                    Belief.TEAM: body[Belief.TEAM],
+                    Action.ADDED: names,
+                    Action.REMOVED: [],
+                }
+            )
+            await self.send(reply)
@@ -2,9 +2,11 @@
 
 """Console script for pygomas."""
 import logging
+import multiprocessing
 import os
 import random
 import string
+import time
 
 os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "hide"
 import asyncio
@@ -18,11 +20,26 @@ import click
 import spade
 
 from pygomas.render import renderlite
-from .config import TEAM_ALLIED, TEAM_AXIS
+from .config import TEAM_ALLIED, TEAM_AXIS, MIN_HEALTH
 from pygomas.agents.bdifieldop import BDIFieldOp
 from pygomas.agents.bdimedic import BDIMedic
 from pygomas.agents.bdisoldier import BDISoldier
+from pygomas.agents.bditroop import DEFAULT_POSITION_EPSILON
+from .loadgen import FakeTroop, LoadStats, PATTERNS, run_loadgen
 from .manager import Manager
+from .profiling import Profiler
+from .utils.rng import create_rng
+
+DEFAULT_STARTUP_CONCURRENCY: int = 16
+
+# Log format of the troops run by worker processes
+WORKER_LOG_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "worker {worker} | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+)
+
+# Profile of the troops, with the number of the worker (if any)
+PROFILE_FILE = "pygomas_troops_profile{}.txt"
 
 help_config = json.dumps(
     {
@@ -138,6 +155,58 @@ def cli():
     help="Port to connect with renders (default=8001).",
     type=int,
 )
+@click.option(
+    "--broadcast",
+    is_flag=True,
+    help="Send one world snapshot per team and frame instead of replying to every DATA. "
+         "Troops switch to the pipelined data loop (as with run --pipelined) when the match begins. "
+         "The snapshot is serialized once per team, but still sent as one message per troop.",
+)
+@click.option(
+    "--batch-shots",
+    is_flag=True,
+    help="Resolve all the shots received in a frame together.",
+)
+@click.option(
+    "--prioritize",
+    is_flag=True,
+    help="Serve shots, packs and data from one queue by priority, keeping only the latest data of each troop.",
+)
+@click.option(
+    "--workers",
+    default=0,
+    help="Number of worker processes computing the fields of view of the DATA replies of every tick, the pushes and the broadcasts (default=0, no workers). With --prioritize, DATA is replied one troop at a time, so only pushes and broadcasts use them.",
+    type=int,
+)
+@click.option(
+    "--embedded-services",
+    is_flag=True,
+    help="Serve the service directory from the manager instead of a separate service agent.",
+)
+@click.option(
+    "--seed",
+    default=None,
+    help="Seed of the random streams of the agents, to replay the same match.",
+    type=int,
+)
+@click.option(
+    "--speed",
+    default=1.0,
+    help="Game seconds per real second, e.g. to run headless matches faster than real time. "
+         "The manager and the troops must use the same speed (default=1).",
+    type=float,
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Measure the latency of the behaviours and write it to pygomas_profile.txt at the end of the game.",
+)
+@click.option(
+    "--profile-port",
+    default=None,
+    help="Serve the profile live at http://<host>:<port>/profile (implies --profile).",
+    type=int,
+)
 @click.option(
     "-v",
     "--verbose",
@@ -155,6 +224,15 @@ def manager(
     match_time,
     fps,
     port,
+    broadcast,
+    batch_shots,
+    prioritize,
+    workers,
+    embedded_services,
+    seed,
+    speed,
+    profile,
+    profile_port,
     verbose,
 ):
     """Run the manager which controls the game."""
@@ -173,6 +251,15 @@ def manager(
         match_time=match_time,
         fps=fps,
         port=port,
+        broadcast=broadcast,
+        batch_shots=batch_shots,
+        prioritize=prioritize,
+        workers=workers,
+        embedded_services=embedded_services,
+        seed=seed,
+        speed=speed,
+        profiler=Profiler() if profile or profile_port is not None else None,
+        profile_port=profile_port,
     )
 
     async def main(agent):
@@ -197,13 +284,81 @@ def manager(
     default=None,
     help="The path to your custom maps directory.",
 )
+@click.option(
+    "--pipelined",
+    is_flag=True,
+    help="Troops send DATA only on changes and the manager pushes FOV updates.",
+)
+@click.option(
+    "--subscribe-services",
+    is_flag=True,
+    help="Troops subscribe to medics, fieldops and backups instead of asking the service agent.",
+)
+@click.option(
+    "--embedded-services",
+    is_flag=True,
+    help="Use the service directory embedded in the manager (run it with --embedded-services).",
+)
+@click.option(
+    "--startup-concurrency",
+    default=DEFAULT_STARTUP_CONCURRENCY,
+    help="Max number of troops logging in at the same time (default={}).".format(
+        DEFAULT_STARTUP_CONCURRENCY
+    ),
+    type=int,
+)
+@click.option(
+    "--workers",
+    default=1,
+    help="Number of processes running the troops (default=1).",
+    type=int,
+)
+@click.option(
+    "--seed",
+    default=None,
+    help="Seed of the random streams of the agents, to replay the same match.",
+    type=int,
+)
+@click.option(
+    "--speed",
+    default=1.0,
+    help="Game seconds per real second, e.g. to run headless matches faster than real time. "
+         "The manager and the troops must use the same speed (default=1).",
+    type=float,
+)
+@click.option(
+    "--position-epsilon",
+    default=DEFAULT_POSITION_EPSILON,
+    help="Min distance a troop must walk before its position belief is updated, other than at "
+         "waypoints (default={}).".format(DEFAULT_POSITION_EPSILON),
+    type=float,
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Measure the latency of the behaviours and actions of the troops and write it to "
+         "pygomas_troops_profile.txt when they finish.",
+)
 @click.option(
     "-v",
     "--verbose",
     count=True,
     help="Show verbose debug level: -v level 1, -vv level 2, -vvv level 3, -vvvv level 4",
 )
-def run(game, map_path, verbose):
+def run(
+    game,
+    map_path,
+    pipelined,
+    subscribe_services,
+    embedded_services,
+    startup_concurrency,
+    workers,
+    seed,
+    speed,
+    position_epsilon,
+    profile,
+    verbose,
+):
     """Run a JSON game file with the player's definition."""
 
     set_verbosity(verbose)
@@ -233,26 +388,182 @@ def run(game, map_path, verbose):
     host = config["host"]
     manager_jid = "{}@{}".format(config["manager"], host)
     service_jid = "{}@{}".format(config["service"], host)
+    if embedded_services:
+        service_jid = manager_jid
+
+    options = {
+        "host": host,
+        "manager_jid": manager_jid,
+        "service_jid": service_jid,
+        "map_path": map_path,
+        "pipelined": pipelined,
+        "subscribe_services": subscribe_services,
+        "startup_concurrency": startup_concurrency,
+        "seed": seed,
+        "speed": speed,
+        "position_epsilon": position_epsilon,
+        "profile": profile,
+    }
+    jobs = get_troop_jobs(config, rng=create_rng(seed, "names"))
 
-    troops = list()
+    if workers > 1:
+        return run_workers(jobs, options, workers, verbose)
 
-    for troop in config["axis"]:
-        new_troops = create_troops(
-            troop, host, manager_jid, service_jid, map_path, team=TEAM_AXIS
+    troops = list()
+    profiler = Profiler() if profile else None
+    build_start = time.perf_counter()
+
+    for team, troop, index in jobs:
+        troops += create_troops(
+            troop, host, manager_jid, service_jid, map_path, team=team,
+            pipelined=pipelined, subscribe_services=subscribe_services, seed=seed, speed=speed,
+            indices=[index], position_epsilon=position_epsilon, profiler=profiler,
         )
-        troops += new_troops
 
-    for troop in config["allied"]:
-        new_troops = create_troops(
-            troop, host, manager_jid, service_jid, map_path, team=TEAM_ALLIED
+    build_time = time.perf_counter() - build_start
+
+    async def main():
+        login_time = await run_agents(troops, concurrency=startup_concurrency)
+        click.echo(
+            "Started {} troops: build {:.2f}s, login {:.2f}s".format(
+                len(troops), build_time, login_time
+            )
         )
-        troops += new_troops
+        if profiler is not None:
+            await spade.wait_until_finished(troops)
+            profiler.dump(PROFILE_FILE.format(""))
 
-    spade.run(run_agents(troops))
+    spade.run(main())
     return 0
 
 
-def create_troops(troop, host, manager_jid, service_jid, map_path, team):
+def get_troop_jobs(config, rng=random):
+    """
+    Expands the troops of a game config into one job per agent.
+
+    :return: list of (team, troop, index) tuples, where troop is the
+             troop entry of the config and index is the agent's number
+    """
+    jobs = list()
+    for team, key in ((TEAM_AXIS, "axis"), (TEAM_ALLIED, "allied")):
+        for troop in config[key]:
+            if "name" not in troop:
+                # Every process must use the same name
+                troop = dict(troop, name="".join(rng.choice(string.ascii_lowercase) for _ in range(10)))
+            amount = troop["amount"] if "amount" in troop else 1
+            jobs += [(team, troop, index) for index in range(amount)]
+    return jobs
+
+
+def partition_troops(jobs, workers):
+    """
+    Splits the jobs among the workers dealing the troops of every rank in
+    turns, so all the processes get a similar load of each rank.
+
+    :return: list with the jobs of every worker (without empty ones)
+    """
+    by_rank = dict()
+    for job in jobs:
+        by_rank.setdefault(job[1]["rank"], []).append(job)
+
+    partitions = [list() for _ in range(workers)]
+    turn = 0
+    for rank_jobs in by_rank.values():
+        for job in rank_jobs:
+            partitions[turn % workers].append(job)
+            turn += 1
+    return [partition for partition in partitions if partition]
+
+
+def run_workers(jobs, options, workers, verbose):
+    partitions = partition_troops(jobs, workers)
+    click.echo("Running {} troops in {} processes".format(len(jobs), len(partitions)))
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(len(partitions)) as pool:
+        outcomes = pool.starmap(
+            run_worker,
+            [(worker, partition, options, verbose) for worker, partition in enumerate(partitions)],
+        )
+
+    survivors = {"allied": 0, "axis": 0}
+    for outcome in outcomes:
+        if outcome["error"]:
+            click.secho(
+                "Worker {} failed: {}".format(outcome["worker"], outcome["error"]), fg="red", err=True
+            )
+            continue
+        click.echo(
+            "Worker {}: {} troops, build {:.2f}s, login {:.2f}s".format(
+                outcome["worker"], outcome["troops"], outcome["build"], outcome["login"]
+            )
+        )
+        for team, count in outcome["survivors"].items():
+            survivors[team] += count
+    click.echo("Survivors: {} allied, {} axis".format(survivors["allied"], survivors["axis"]))
+    return 0 if all(not outcome["error"] for outcome in outcomes) else -1
+
+
+def run_worker(worker, jobs, options, verbose):
+    """
+    Runs a batch of troops in its own process until all of them finish.
+
+    :return: dict with the outcome of the process
+    """
+    set_verbosity(verbose, log_format=WORKER_LOG_FORMAT.replace("{worker}", str(worker)))
+    outcome = {"worker": worker, "troops": len(jobs), "error": None}
+    profiler = Profiler() if options["profile"] else None
+
+    try:
+        build_start = time.perf_counter()
+        troops = list()
+        for team, troop, index in jobs:
+            troops += create_troops(
+                troop,
+                options["host"],
+                options["manager_jid"],
+                options["service_jid"],
+                options["map_path"],
+                team=team,
+                pipelined=options["pipelined"],
+                subscribe_services=options["subscribe_services"],
+                seed=options["seed"],
+                speed=options["speed"],
+                indices=[index],
+                position_epsilon=options["position_epsilon"],
+                profiler=profiler,
+            )
+        outcome["build"] = time.perf_counter() - build_start
+
+        async def main():
+            try:
+                outcome["login"] = await run_agents(
+                    troops, concurrency=options["startup_concurrency"]
+                )
+            except Exception as e:
+                outcome["error"] = "could not start the troops: {}".format(e)
+                return
+            await spade.wait_until_finished(troops)
+            if profiler is not None:
+                profiler.dump(PROFILE_FILE.format("_{}".format(worker)))
+
+        spade.run(main())
+    except Exception as e:
+        outcome["error"] = str(e)
+    if outcome["error"]:
+        return outcome
+
+    outcome["survivors"] = {
+        name: sum(1 for troop in troops if troop.team == team and troop.health > MIN_HEALTH)
+        for team, name in ((TEAM_ALLIED, "allied"), (TEAM_AXIS, "axis"))
+    }
+    return outcome
+
+
+def create_troops(
+        troop, host, manager_jid, service_jid, map_path, team, pipelined=False, subscribe_services=False,
+        seed=None, speed=1.0, indices=None, position_epsilon=DEFAULT_POSITION_EPSILON, profiler=None,
+):
     this_dir, _ = os.path.split(__file__)
     asl_path = f"{this_dir}{os.sep}ASL{os.sep}"
     asl = {
@@ -272,7 +583,7 @@ def create_troops(troop, host, manager_jid, service_jid, map_path, team):
     amount = troop["amount"] if "amount" in troop else 1
     new_troops = list()
     _class = load_class(troop["rank"])
-    for i in range(amount):
+    for i in indices if indices is not None else range(amount):
         jid = "{}_{}@{}".format(name, i, host)
         try:
             agent_asl = troop["asl"] if "asl" in troop else asl[troop["rank"]]
@@ -290,11 +601,148 @@ def create_troops(troop, host, manager_jid, service_jid, map_path, team):
             map_path=map_path,
             manager_jid=manager_jid,
             service_jid=service_jid,
+            pipelined=pipelined,
+            subscribe_services=subscribe_services,
+            seed=seed,
+            speed=speed,
+            position_epsilon=position_epsilon,
+            profiler=profiler,
         )
         new_troops.append(new_troop)
     return new_troops
 
 
+@cli.command()
+@click.option(
+    "-n",
+    "--num-troops",
+    help="Number of fake troops (required). Run the manager with the same number of players.",
+    required=True,
+    type=int,
+)
+@click.option(
+    "--host", default="127.0.0.1", help="XMPP server of the troops (default=127.0.0.1)."
+)
+@click.option(
+    "-j",
+    "--manager-jid",
+    default="cmanager@127.0.0.1",
+    help="XMPP manager's JID (default=cmanager@127.0.0.1).",
+)
+@click.option(
+    "-p", "--password", default="secret", help="Troops' password (default=secret)."
+)
+@click.option(
+    "--pattern",
+    default="circle",
+    help="Movement of the troops around their base (default=circle).",
+    type=click.Choice(PATTERNS),
+)
+@click.option(
+    "--data-rate",
+    default=20.0,
+    help="DATA messages per second sent by every troop (default=20).",
+    type=float,
+)
+@click.option(
+    "--shoot-rate",
+    default=0.0,
+    help="SHOOT messages per second sent by every troop (default=0).",
+    type=float,
+)
+@click.option(
+    "--pack-rate",
+    default=0.0,
+    help="Ammo packs per second created by every troop (default=0). The manager keeps one pack per troop, which the troop picks up at its next DATA.",
+    type=float,
+)
+@click.option(
+    "-d",
+    "--duration",
+    default=30,
+    help="Seconds to load the manager once the match begins (default=30).",
+    type=float,
+)
+@click.option(
+    "-mp",
+    "--map-path",
+    "map_path",
+    default=None,
+    help="The path to your custom maps directory.",
+)
+@click.option(
+    "--seed",
+    default=None,
+    help="Seed of the movements and shots of the troops.",
+    type=int,
+)
+@click.option(
+    "--startup-concurrency",
+    default=DEFAULT_STARTUP_CONCURRENCY,
+    help="Max number of troops logging in at the same time (default={}).".format(
+        DEFAULT_STARTUP_CONCURRENCY
+    ),
+    type=int,
+)
+@click.option(
+    "-v",
+    "--verbose",
+    count=True,
+    help="Show verbose debug level: -v level 1, -vv level 2, -vvv level 3, -vvvv level 4",
+)
+def loadgen(
+    num_troops,
+    host,
+    manager_jid,
+    password,
+    pattern,
+    data_rate,
+    shoot_rate,
+    pack_rate,
+    duration,
+    map_path,
+    seed,
+    startup_concurrency,
+    verbose,
+):
+    """Load a manager with fake troops and report its DATA reply latency."""
+    set_verbosity(verbose)
+
+    stats = LoadStats()
+    troops = [
+        FakeTroop(
+            jid="loadgen_{}@{}".format(i, host),
+            password=password,
+            manager_jid=manager_jid,
+            stats=stats,
+            team=TEAM_ALLIED if i % 2 else TEAM_AXIS,
+            pattern=pattern,
+            data_rate=data_rate,
+            shoot_rate=shoot_rate,
+            pack_rate=pack_rate,
+            map_path=map_path,
+            seed=seed,
+        )
+        for i in range(num_troops)
+    ]
+
+    async def main():
+        summary = await run_loadgen(troops, stats, duration, concurrency=startup_concurrency)
+        click.echo(json.dumps(summary, indent=4))
+        if not summary["data_replies"]:
+            click.secho("No DATA replies: is the manager running with --broadcast?", fg="yellow")
+        elif summary["reply_rate"] < 0.9 * summary["offered_rate"]:
+            click.secho(
+                "Manager saturated: {:.0f} replies/s for {:.0f} DATA/s offered".format(
+                    summary["reply_rate"], summary["offered_rate"]
+                ),
+                fg="red",
+            )
+
+    spade.run(main())
+    return 0
+
+
 @cli.command()
 @click.option(
     "--ip",
@@ -374,9 +822,22 @@ def help(ctx, subcommand):
         click.echo(subcommand_obj.get_help(ctx))
 
 
-async def run_agents(troops):
-    coros = [agent.start(auto_register=True) for agent in troops]
-    await asyncio.gather(*coros)
+async def run_agents(troops, concurrency=DEFAULT_STARTUP_CONCURRENCY):
+    """
+    Starts the troops, with at most concurrency logins in flight so the
+    XMPP server is not flooded.
+
+    :return: the time in seconds spent starting the troops
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def start(agent):
+        async with semaphore:
+            await agent.start(auto_register=True)
+
+    login_start = time.perf_counter()
+    await asyncio.gather(*[start(agent) for agent in troops])
+    return time.perf_counter() - login_start
 
 
 def load_class(class_path):
@@ -398,14 +859,15 @@ def load_class(class_path):
         return getattr(mod, class_name)
 
 
-def set_verbosity(verbose):
+def set_verbosity(verbose, log_format=None):
     logger.remove()
+    options = {"format": log_format} if log_format else {}
     if verbose == 0:
-        logger.add(sys.stderr, level="SUCCESS")
+        logger.add(sys.stderr, level="SUCCESS", **options)
     elif verbose == 1:
-        logger.add(sys.stderr, level="INFO")
+        logger.add(sys.stderr, level="INFO", **options)
     else:
-        logger.add(sys.stderr, level="TRACE")
+        logger.add(sys.stderr, level="TRACE", **options)
 
     logging.getLogger("aiohttp").setLevel(logging.WARNING)
     logging.getLogger("aioopenssl").setLevel(logging.WARNING)
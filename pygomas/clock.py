@@ -0,0 +1,35 @@
+import asyncio
+import datetime
+import time
+
+
+class Clock:
+    """
+    Game clock running speed times faster than the wall clock.
+
+    Every period, timeout and timestamp of the game is expressed in game
+    seconds and converted to real time by the clock, so a match keeps the
+    same behaviour at any speed. The game time is derived from the wall
+    clock, so all the agents of a match (even in different processes)
+    agree on it as long as they use the same speed.
+    """
+
+    def __init__(self, speed=1.0):
+        if speed <= 0:
+            raise ValueError("The speed of the clock must be positive: {}".format(speed))
+        self.speed = speed
+
+    def time(self):
+        """:return: the current game time in seconds"""
+        return time.time() * self.speed
+
+    def period(self, seconds):
+        """:return: the real seconds lasting the given game seconds"""
+        return seconds / self.speed
+
+    def after(self, seconds):
+        """:return: the real datetime at which the given game seconds will have passed"""
+        return datetime.datetime.now() + datetime.timedelta(seconds=self.period(seconds))
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(self.period(seconds))
@@ -0,0 +1,345 @@
+import asyncio
+import json
+import math
+import time
+
+import numpy as np
+from loguru import logger
+from spade.agent import Agent
+from spade.behaviour import CyclicBehaviour, OneShotBehaviour, PeriodicBehaviour
+from spade.message import Message
+from spade.template import Template
+
+from pygomas.agents.agent import LONG_RECEIVE_WAIT
+from pygomas.agents.bditroop import CLASS_SOLDIER
+from pygomas.config import Config, MAX_AMMO, MAX_HEALTH, TEAM_ALLIED
+from pygomas.map import TerrainMap
+from pygomas.ontology import Action, Belief, Performative
+from pygomas.packs.pack import PACK_AMMOPACK
+from pygomas.utils.rng import create_rng
+
+PATTERNS = ("static", "circle", "patrol", "random")
+PERCENTILES = (50, 90, 99, 99.9)
+PATROL_RADIUS: float = 10.0
+FAKE_VELOCITY: float = 3.0
+# Max DATA messages of a troop waiting for a reply (e.g. with a broadcast manager)
+MAX_PENDING = 100
+# Below MAX_AMMO, so the fake troops pick up the ammo packs they create
+FAKE_AMMO = MAX_AMMO // 2
+
+# map name -> TerrainMap, shared by all the fake troops of the process
+_maps = {}
+
+
+def load_map(map_name, config):
+    if map_name not in _maps:
+        terrain_map = TerrainMap()
+        terrain_map.load_map(map_name, config)
+        _maps[map_name] = terrain_map
+    return _maps[map_name]
+
+
+class LoadStats:
+    """
+    Counters and DATA reply latencies of all the fake troops of a run.
+    """
+
+    def __init__(self):
+        self.started = None
+        self.data_sent = 0
+        self.shots_sent = 0
+        self.packs_sent = 0
+        self.packs_taken = 0
+        # DATA messages coalesced by the manager or never answered
+        self.data_unanswered = 0
+        self.latencies = []
+
+    def start(self):
+        if self.started is None:
+            self.started = time.perf_counter()
+
+    def get_summary(self, offered_rate):
+        """
+        :param offered_rate: DATA messages per second sent by all the troops
+        :return: dict with the throughput and latency percentiles (in ms) of the DATA replies
+        """
+        elapsed = time.perf_counter() - self.started if self.started is not None else 0.0
+        replies = len(self.latencies)
+        summary = {
+            "elapsed": elapsed,
+            "data_sent": self.data_sent,
+            "data_replies": replies,
+            "data_unanswered": self.data_unanswered,
+            "shots_sent": self.shots_sent,
+            "packs_sent": self.packs_sent,
+            "packs_taken": self.packs_taken,
+            "offered_rate": offered_rate,
+            "reply_rate": replies / elapsed if elapsed else 0.0,
+        }
+        if replies:
+            latencies = np.array(self.latencies) * 1000
+            for p in PERCENTILES:
+                summary["p{}".format(p)] = float(np.percentile(latencies, p))
+            summary["max"] = float(latencies.max())
+        return summary
+
+
+class FakeTroop(Agent):
+    """
+    Troop without BDI reasoning speaking the INIT/DATA/SHOOT/PACK ontology of
+    the manager. It moves around its base following a scripted pattern and
+    keeps a constant health and ammo, so the load is steady.
+
+    The manager keys the packs by the JID of the sender, so every troop has
+    at most one pack in the map: the ammo packs it creates replace each other
+    until the troop, short of ammo, picks them up at its next DATA.
+    """
+
+    def __init__(
+        self,
+        jid,
+        password,
+        manager_jid,
+        stats,
+        team=TEAM_ALLIED,
+        pattern="circle",
+        data_rate=20.0,
+        shoot_rate=0.0,
+        pack_rate=0.0,
+        map_path=None,
+        seed=None,
+    ):
+        super().__init__(jid, password)
+        self.manager = manager_jid
+        self.stats = stats
+        self.team = team
+        self.pattern = pattern
+        self.data_rate = data_rate
+        self.shoot_rate = shoot_rate
+        self.pack_rate = pack_rate
+        self.config = Config(data_path=map_path)
+        self.random = create_rng(seed, jid)
+        self.map = None
+        self.origin = (0.0, 0.0)
+        self.position = (0.0, 0.0)
+        self.velocity = (0.0, 0.0)
+        self.phase = self.random.uniform(0, 2 * math.pi)
+        self.match_start = None
+        # Sequence number of the last DATA message
+        self.sequence = 0
+        # sequence -> send time of the DATA messages waiting for a reply, in sending order
+        self.pending = {}
+
+    async def setup(self):
+        self.add_behaviour(self.InitBehaviour())
+
+        t = Template()
+        t.set_metadata(str(Performative.PERFORMATIVE), str(Performative.INIT))
+        self.add_behaviour(self.StartBehaviour(), t)
+
+        t = Template()
+        t.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DATA))
+        self.add_behaviour(self.DataReplyBehaviour(), t)
+
+        t = Template()
+        t.set_metadata(str(Performative.PERFORMATIVE), str(Belief.PACK_TAKEN))
+        self.add_behaviour(self.PackTakenBehaviour(), t)
+
+        t = Template()
+        t.set_metadata(str(Performative.PERFORMATIVE), str(Performative.GAME))
+        self.add_behaviour(self.GameFinishedBehaviour(), t)
+
+    def move(self, now):
+        """Sets the position of the troop at time now following its pattern."""
+        ox, oz = self.origin
+        t = now - self.match_start
+        if self.pattern == "circle":
+            angle = self.phase + t * FAKE_VELOCITY / PATROL_RADIUS
+            position = (ox + PATROL_RADIUS * math.cos(angle), oz + PATROL_RADIUS * math.sin(angle))
+        elif self.pattern == "patrol":
+            offset = (t * FAKE_VELOCITY + self.phase * PATROL_RADIUS) % (4 * PATROL_RADIUS)
+            position = (ox - PATROL_RADIUS + abs(offset - 2 * PATROL_RADIUS), oz)
+        elif self.pattern == "random":
+            x, z = self.position
+            angle = self.random.uniform(0, 2 * math.pi)
+            step = FAKE_VELOCITY / self.data_rate
+            x = min(max(x + step * math.cos(angle), ox - PATROL_RADIUS), ox + PATROL_RADIUS)
+            z = min(max(z + step * math.sin(angle), oz - PATROL_RADIUS), oz + PATROL_RADIUS)
+            position = (x, z)
+        else:
+            position = self.origin
+        self.velocity = (position[0] - self.position[0], position[1] - self.position[1])
+        self.position = position
+
+    def data_sent(self, now):
+        """:return: the sequence number of a new DATA message sent at time now"""
+        self.sequence += 1
+        self.pending[self.sequence] = now
+        if len(self.pending) > MAX_PENDING:
+            del self.pending[next(iter(self.pending))]
+            self.stats.data_unanswered += 1
+        self.stats.data_sent += 1
+        return self.sequence
+
+    def data_replied(self, sequence, now):
+        """
+        Records the latency of the DATA message answered by a reply received
+        at time now. The manager serves the latest DATA of a troop, so older
+        messages still waiting will never be answered.
+        """
+        sent = self.pending.pop(sequence, None)
+        if sent is None:
+            return
+        for older in [s for s in self.pending if s < sequence]:
+            del self.pending[older]
+            self.stats.data_unanswered += 1
+        self.stats.latencies.append(now - sent)
+
+    def get_data_content(self):
+        vx, vz = self.velocity
+        norm = math.hypot(vx, vz)
+        hx, hz = (vx / norm, vz / norm) if norm else (1.0, 0.0)
+        return {
+            Belief.NAME: str(self.jid),
+            Action.X: self.position[0],
+            Action.Y: 0.0,
+            Action.Z: self.position[1],
+            Action.VEL_X: vx,
+            Action.VEL_Y: 0.0,
+            Action.VEL_Z: vz,
+            Action.HEAD_X: hx,
+            Action.HEAD_Y: 0.0,
+            Action.HEAD_Z: hz,
+            Belief.HEALTH: MAX_HEALTH,
+            Belief.AMMO: FAKE_AMMO,
+        }
+
+    def get_pack_content(self):
+        x, z = self.position
+        return {
+            Belief.NAME: str(self.jid),
+            Belief.TEAM: self.team,
+            Action.ACTION: Action.CREATE,
+            Action.TYPE: PACK_AMMOPACK,
+            Action.X: x,
+            Action.Y: 0.0,
+            Action.Z: z,
+        }
+
+    def start_match(self, map_name):
+        self.map = load_map(map_name, self.config)
+        base = self.map.allied_base if self.team == TEAM_ALLIED else self.map.axis_base
+        self.origin = ((base.init.x + base.end.x) / 2, (base.init.z + base.end.z) / 2)
+        self.position = self.origin
+        self.match_start = time.perf_counter()
+        self.stats.start()
+
+        self.add_behaviour(self.DataBehaviour(period=1 / self.data_rate))
+        if self.shoot_rate > 0:
+            self.add_behaviour(self.ShootBehaviour(period=1 / self.shoot_rate))
+        if self.pack_rate > 0:
+            self.add_behaviour(self.PackBehaviour(period=1 / self.pack_rate))
+
+    class InitBehaviour(OneShotBehaviour):
+        async def run(self):
+            msg = Message(to=self.agent.manager)
+            msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.INIT))
+            msg.body = json.dumps(
+                {
+                    Belief.NAME: str(self.agent.jid),
+                    Action.TYPE: str(CLASS_SOLDIER),
+                    Belief.TEAM: str(self.agent.team),
+                }
+            )
+            await self.send(msg)
+
+    class StartBehaviour(CyclicBehaviour):
+        async def run(self):
+            msg = await self.receive(timeout=LONG_RECEIVE_WAIT)
+            if msg:
+                self.agent.start_match(json.loads(msg.body)[Action.MAP])
+                self.kill()
+
+    class DataBehaviour(PeriodicBehaviour):
+        async def run(self):
+            now = time.perf_counter()
+            self.agent.move(now)
+            msg = Message(to=self.agent.manager)
+            msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DATA))
+            content = self.agent.get_data_content()
+            content[Action.SEQUENCE] = self.agent.data_sent(now)
+            msg.body = json.dumps(content)
+            await self.send(msg)
+
+    class DataReplyBehaviour(CyclicBehaviour):
+        async def run(self):
+            msg = await self.receive(timeout=LONG_RECEIVE_WAIT)
+            if msg:
+                sequence = json.loads(msg.body).get(Action.SEQUENCE)
+                self.agent.data_replied(sequence, time.perf_counter())
+
+    class ShootBehaviour(PeriodicBehaviour):
+        async def run(self):
+            angle = self.agent.random.uniform(0, 2 * math.pi)
+            x, z = self.agent.position
+            msg = Message(to=self.agent.manager)
+            msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.SHOOT))
+            msg.body = json.dumps(
+                {
+                    Belief.NAME: str(self.agent.jid),
+                    Action.AIM: 1,
+                    Action.SHOTS: 1,
+                    Action.X: x + PATROL_RADIUS * math.cos(angle),
+                    Action.Y: 0.0,
+                    Action.Z: z + PATROL_RADIUS * math.sin(angle),
+                }
+            )
+            self.agent.stats.shots_sent += 1
+            await self.send(msg)
+
+    class PackBehaviour(PeriodicBehaviour):
+        async def run(self):
+            msg = Message(to=self.agent.manager)
+            msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.PACK))
+            msg.body = json.dumps(self.agent.get_pack_content())
+            self.agent.stats.packs_sent += 1
+            await self.send(msg)
+
+    class PackTakenBehaviour(CyclicBehaviour):
+        async def run(self):
+            msg = await self.receive(timeout=LONG_RECEIVE_WAIT)
+            if msg:
+                self.agent.stats.packs_taken += 1
+
+    class GameFinishedBehaviour(CyclicBehaviour):
+        async def run(self):
+            msg = await self.receive(timeout=LONG_RECEIVE_WAIT)
+            if msg:
+                logger.info("[{}]: Game finished".format(self.agent.jid))
+                await self.agent.stop()
+
+
+async def run_loadgen(troops, stats, duration, concurrency=16):
+    """
+    Starts the fake troops and lets them load the manager for duration
+    seconds after the match begins.
+
+    :return: the summary of the run (see LoadStats.get_summary)
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def start(troop):
+        async with semaphore:
+            await troop.start(auto_register=True)
+
+    await asyncio.gather(*[start(troop) for troop in troops])
+    logger.success("{} fake troops ready, waiting for the match".format(len(troops)))
+
+    while stats.started is None or time.perf_counter() - stats.started < duration:
+        if not any(troop.is_alive() for troop in troops):
+            break
+        await asyncio.sleep(0.1)
+
+    summary = stats.get_summary(sum(troop.data_rate for troop in troops))
+    await asyncio.gather(*[troop.stop() for troop in troops if troop.is_alive()])
+    return summary
@@ -1,11 +1,9 @@
 import asyncio
-import datetime
 import json
-import math
-import random
 import time
 import traceback
 
+import numpy as np
 import spade
 from loguru import logger
 from spade.agent import Agent
@@ -20,13 +18,14 @@ from spade.template import Template
 
 from pygomas.agents.agent import AbstractAgent, LONG_RECEIVE_WAIT
 from pygomas.agents.bditroop import CLASS_SOLDIER
-from pygomas.agents.service import ServiceAgent
+from pygomas.agents.service import ServiceAgent, ServiceDirectory
 from pygomas.packs.objpack import ObjectivePack
 from pygomas.packs.pack import PACK_NAME, PACK_NONE, PACK_OBJPACK, PACK_MEDICPACK, PACK_AMMOPACK
-from pygomas.utils.mobile import Mobile
-from pygomas.utils.sight import Sight
+from pygomas.utils.rng import create_rng
+from pygomas.utils.sight import Sight, field_of_view, intersect_with_walls
 from pygomas.utils.vector import Vector3D
 from . import __version__
+from .clock import Clock
 from .config import (
     Config,
     MIN_HEALTH,
@@ -39,6 +38,9 @@ from .map import TerrainMap
 from .ontology import Action, Belief, Performative, Service as ServiceOnto
 from .server import Server, TCP, Msg
 from .stats import GameStatistic
+from .scheduler import DataIntake, MessageScheduler
+from .workers import WorkerPool
+from .world import WorldStore, MobileView
 
 MILLISECONDS_IN_A_SECOND: int = 1000
 
@@ -52,18 +54,75 @@ ARG_MAP_PATH: int = 4
 
 WIDTH: int = 3
 
+# Squared radius of the circle an agent can be hit in
+SHOT_RADIUS_SQ: int = 4
+
+# Real seconds between reports of the render clients
+RENDER_STATS_PERIOD: float = 10.0
+# Seconds a render client can lag behind before it is reported as slow
+MAX_RENDER_LAG: float = 1.0
+
 
 class MicroAgent:
-    def __init__(self):
-        self.jid = ""
-        self.team = TEAM_NONE
-        self.locate = Mobile()
+    """
+    Manager-side view of a troop. Its kinematic state, health, ammo, team
+    and type are stored in a slot of the manager's WorldStore.
+    """
+
+    def __init__(self, world=None, jid=""):
+        if world is None:
+            world = WorldStore(capacity=1)
+        self.world = world
+        self.slot = world.add(jid)
+        self._jid = jid
+        self.locate = MobileView(world, self.slot)
         self.is_carrying_objective = False
         self.is_shooting = False
-        self.health = 0
-        self.ammo = 0
-        self.type = 0
         self.is_updated = False
+        self.is_pipelined = False
+        self.last_fov = None
+
+    @property
+    def jid(self):
+        return self._jid
+
+    @jid.setter
+    def jid(self, value):
+        self._jid = value
+        self.world.set_jid(self.slot, value)
+
+    @property
+    def health(self):
+        return int(self.world.health[self.slot])
+
+    @health.setter
+    def health(self, value):
+        self.world.health[self.slot] = value
+        self.world.alive[self.slot] = value > 0
+
+    @property
+    def ammo(self):
+        return int(self.world.ammo[self.slot])
+
+    @ammo.setter
+    def ammo(self, value):
+        self.world.ammo[self.slot] = value
+
+    @property
+    def team(self):
+        return int(self.world.team[self.slot])
+
+    @team.setter
+    def team(self, value):
+        self.world.team[self.slot] = value
+
+    @property
+    def type(self):
+        return int(self.world.type[self.slot])
+
+    @type.setter
+    def type(self, value):
+        self.world.type[self.slot] = value
 
     def __str__(self):
         return "<{} Team({}) Health({}) Ammo({}) Obj({})>".format(
@@ -97,6 +156,15 @@ class Manager(AbstractAgent, Agent):
             service_jid="cservice@localhost",
             service_passwd="secret",
             port=8001,
+            broadcast=False,
+            batch_shots=False,
+            prioritize=False,
+            workers=0,
+            embedded_services=False,
+            seed=None,
+            speed=1.0,
+            profiler=None,
+            profile_port=None,
     ):
 
         AbstractAgent.__init__(self, name, service_jid=service_jid)
@@ -106,26 +174,96 @@ class Manager(AbstractAgent, Agent):
         self.max_total_agents = players
         self.fps = 1 / fps
         self.match_time = match_time
+        # fps and match_time are measured in game time
+        self.clock = Clock(speed)
         self.map_name = str(map_name)
         self.port = port
         self.config = Config(data_path=map_path)
         self.number_of_agents = 0
         self.agents = {}
+        # Columnar state of all the agents, shared by their MicroAgent views
+        # (and with the worker processes, if any)
+        self.world = WorldStore(capacity=players, shared=workers > 0)
+        self.workers = workers
+        self.worker_pool = None
         self.match_init = 0
         self.domain = name.split("@")[1]
         self.objective_agent = None
-        self.service_agent = ServiceAgent(jid=self.service_jid, password=service_passwd)
+        if embedded_services:
+            # Troops reach the service directory at the manager's jid
+            self.service_jid = name
+            self.service_directory = ServiceDirectory()
+            self.service_agent = None
+        else:
+            self.service_directory = None
+            self.service_agent = ServiceAgent(jid=self.service_jid, password=service_passwd)
         self.render_server = Server(map_name=self.map_name, port=self.port)
         self.din_objects = dict()
         self.map = TerrainMap()
+        # Incremented whenever agents or packs change, to push FOV updates lazily
+        self.world_version = 0
+        # Send one world snapshot per team and frame instead of DATA replies
+        self.broadcast = broadcast
+        # Drain and resolve all the pending shots once per frame
+        self.batch_shots = batch_shots
+        self.shoot_queue_depth = 0
+        self.max_shoot_queue_depth = 0
+        # Serve DATA, SHOOT and PACK from one queue, by priority
+        self.prioritize = prioritize
+        self.scheduler = MessageScheduler()
+        self.data_intake = DataIntake()
+        # Seed of the match and random stream of the shots of each troop
+        self.seed = seed
+        self.shot_randoms = {}
+        # Latencies of the behaviours (see pygomas.profiling), served live at
+        # http://<host>:<profile_port>/profile if profile_port is set
+        self.profiler = profiler
+        self.profile_port = profile_port
+        if self.profiler is not None:
+            self.profiler.instrument_agent(self)
+            if self.service_agent is not None:
+                self.profiler.instrument_agent(self.service_agent)
+
+    def get_shot_random(self, shooter_agent_id):
+        if shooter_agent_id not in self.shot_randoms:
+            self.shot_randoms[shooter_agent_id] = create_rng(self.seed, "shots:{}".format(shooter_agent_id))
+        return self.shot_randoms[shooter_agent_id]
+
+    def register_agent(self, name, type_, team, is_pipelined=False):
+        """
+        Adds a troop to the match. A troop sending INIT again keeps its
+        MicroAgent (and its slot of the world), with its state reset.
+
+        :return: True if the troop was not in the match yet
+        """
+        is_new = name not in self.agents
+        if is_new:
+            self.agents[name] = MicroAgent(self.world, name)
+        agent = self.agents[name]
+        agent.type = type_
+        agent.team = team
+        agent.health = 100
+        agent.is_pipelined = is_pipelined
+        agent.is_carrying_objective = False
+        agent.is_shooting = False
+        agent.is_updated = False
+        agent.last_fov = None
+        return is_new
+
+    async def get_profile(self, request):
+        return self.profiler.as_dict()
 
     async def stop(self):
         del self.render_server
         self.render_server = None
-        coro1 = self.objective_agent.stop()
-        coro2 = self.service_agent.stop()
-        coro3 = super().stop()
-        await asyncio.gather(coro1, coro2, coro3)
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown()
+            self.worker_pool = None
+        self.world.close()
+        coros = [self.objective_agent.stop(), super().stop()]
+        if self.service_agent is not None:
+            coros.append(self.service_agent.stop())
+        await asyncio.gather(*coros)
 
     async def setup(self):
         class InitBehaviour(OneShotBehaviour):
@@ -141,17 +279,18 @@ class Manager(AbstractAgent, Agent):
                         content = json.loads(msg.body)
 
                         name = content[Belief.NAME]
-                        type_ = content[Action.TYPE]
-                        team = content[Belief.TEAM]
-
-                        self.agent.agents[name] = MicroAgent()
-                        self.agent.agents[name].jid = name
-                        self.agent.agents[name].type = int(type_)
-                        self.agent.agents[name].team = int(team)
-                        self.agent.agents[name].health = 100
+                        is_new = self.agent.register_agent(
+                            name,
+                            int(content[Action.TYPE]),
+                            int(content[Belief.TEAM]),
+                            bool(content.get(Action.PIPELINED, False)),
+                        )
 
-                        logger.success("Manager: [" + name + "] is Ready!")
-                        self.agent.number_of_agents += 1
+                        if is_new:
+                            logger.success("Manager: [" + name + "] is Ready!")
+                            self.agent.number_of_agents += 1
+                        else:
+                            logger.warning("Manager: [" + name + "] sent INIT again")
                     else:
                         logger.warning("Manager: Still waiting for agents...")
                 logger.success(
@@ -161,20 +300,30 @@ class Manager(AbstractAgent, Agent):
                     msg = Message()
                     msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.INIT))
                     msg.to = agent.jid
-                    msg.body = json.dumps({Action.MAP: self.agent.map_name})
+                    # Broadcast mode only works with pipelined troops
+                    msg.body = json.dumps(
+                        {Action.MAP: self.agent.map_name, Action.PIPELINED: self.agent.broadcast}
+                    )
                     await self.send(msg)
                     logger.success(
                         "Manager: Sending notification to fight to: " + agent.jid
                     )
 
                 await self.agent.inform_objectives(self)
-                self.agent.match_init = time.time()
+                self.agent.match_init = self.agent.clock.time()
 
                 # Behaviour to check if all alied troops are alive
                 self.agent.launch_check_allied_health()
 
                 # Behaviour to refresh all render engines connected
                 self.agent.launch_render_engine_inform_behaviour()
+                self.agent.launch_render_stats_behaviour()
+
+                # Behaviour to push FOV and packs to pipelined troops
+                if self.agent.broadcast:
+                    self.agent.launch_broadcast_world_behaviour()
+                elif any(a.is_pipelined for a in self.agent.agents.values()):
+                    self.agent.launch_push_data_behaviour()
 
         logger.success(
             "pygomas {} (c) VRAIN 2005-{} (VRAIN/UPV)".format(
@@ -187,20 +336,35 @@ class Manager(AbstractAgent, Agent):
         template.set_metadata(str(Performative.PERFORMATIVE), str(Performative.INIT))
         self.add_behaviour(InitBehaviour(), template)
 
-        await self.service_agent.start(auto_register=True)
-        self.register_service(ServiceOnto.MANAGEMENT)
+        if self.service_agent is not None:
+            await self.service_agent.start(auto_register=True)
+            self.register_service(ServiceOnto.MANAGEMENT)
+        else:
+            self.service_directory.add_behaviours(self)
+            self.service_directory.register_service(
+                {Belief.NAME: ServiceOnto.MANAGEMENT, Belief.TEAM: self.team}, str(self.jid)
+            )
 
         await self.render_server.start()
+        if self.profiler is not None and self.profile_port is not None:
+            self.web.add_get("/profile", self.get_profile, None)
+            self.web.start(port=self.profile_port)
         self.map.load_map(self.map_name, self.config)
+        if self.workers > 0:
+            self.worker_pool = WorkerPool(self.workers, self.map_name, self.config.data_path)
 
-        # Behaviour to listen to data (position, health?, and so on) from troop agents
-        self.launch_data_from_troop_listener_behaviour()
+        if self.prioritize:
+            # Behaviour to serve data, shot and pack messages by priority
+            self.launch_scheduled_responder_behaviour()
+        else:
+            # Behaviour to listen to data (position, health?, and so on) from troop agents
+            self.launch_data_from_troop_listener_behaviour()
 
-        # Behaviour to handle Shot messages
-        self.launch_shoot_responder_behaviour()
+            # Behaviour to handle Shot messages
+            self.launch_shoot_responder_behaviour()
 
-        # Behaviour to handle Pack Management: Creation and Destruction
-        self.launch_pack_management_responder_behaviour()
+            # Behaviour to handle Pack Management: Creation and Destruction
+            self.launch_pack_management_responder_behaviour()
 
         # Behaviour to inform all agents that game has finished by time
         self.launch_game_timeout_inform_behaviour()
@@ -221,7 +385,7 @@ class Manager(AbstractAgent, Agent):
             async def run(self):
                 if (
                         self.agent.render_server
-                        and len(self.agent.render_server.get_connections()) != 0
+                        and self.agent.render_server.has_ready_clients()
                         and all([[a.is_updated for a in self.agent.agents.values()]])
                         and len(self.agent.agents) == self.agent.number_of_agents
                 ):
@@ -268,78 +432,273 @@ class Manager(AbstractAgent, Agent):
                         ],
                     }
 
-                    for task in self.agent.render_server.get_connections():
-                        if self.agent.render_server.is_ready(task):
-                            self.agent.render_server.send_msg_to_render_engine(
-                                task, TCP.AGL, msg
-                            )
+                    self.agent.render_server.send_agl_to_ready_render_engines(msg)
 
-        self.add_behaviour(InformRenderEngineBehaviour(self.fps))
+        self.add_behaviour(InformRenderEngineBehaviour(self.clock.period(self.fps)))
         logger.debug("InformRenderEngineBehaviour started.")
 
+    # Behaviour to report the queues of the render clients while they are connected
+    def launch_render_stats_behaviour(self):
+        class RenderStatsBehaviour(PeriodicBehaviour):
+            async def on_start(self):
+                self.dropped = {}
+
+            async def run(self):
+                if not self.agent.render_server:
+                    return
+                for stats in self.agent.render_server.get_client_stats():
+                    new_drops = stats["dropped"] - self.dropped.get(stats["peer"], 0)
+                    self.dropped[stats["peer"]] = stats["dropped"]
+                    if new_drops or stats["lag"] > MAX_RENDER_LAG:
+                        logger.warning("Slow render client: {}".format(stats))
+                    else:
+                        logger.info("Render client: {}".format(stats))
+
+        self.add_behaviour(RenderStatsBehaviour(RENDER_STATS_PERIOD))
+
     # Behaviour to listen to data (position, health?, and so on) from troop agents
     def launch_data_from_troop_listener_behaviour(self):
         class DataFromTroopBehaviour(CyclicBehaviour):
             async def run(self):
+                intake = self.agent.data_intake
                 msg = await self.receive(timeout=LONG_RECEIVE_WAIT)
                 if self.mailbox_size() > self.agent.max_total_agents + 1:
-                    logger.error("TOO MUCH PENDING MSG: {}".format(self.mailbox_size()))
+                    logger.warning(
+                        "Manager: catching up {} pending DATA messages".format(self.mailbox_size())
+                    )
+                # Only the latest pending update of each troop is processed
+                while msg:
+                    try:
+                        intake.put(json.loads(msg.body))
+                    except Exception as e:
+                        logger.warning("Exception at DataFromTroopBehaviour: {}".format(e))
+                    msg = await self.receive()
+
                 try:
-                    if msg:
-                        content = json.loads(msg.body)
-                        id_agent = content[Belief.NAME]
+                    await self.agent.handle_data_batch(self, intake.drain())
+                except Exception as e:
+                    logger.warning("Exception at DataFromTroopBehaviour: {}".format(e))
+                    logger.warning(traceback.format_exc())
 
-                        self.agent.agents[id_agent].locate.position.x = int(content[Action.X])
-                        self.agent.agents[id_agent].locate.position.y = int(content[Action.Y])
-                        self.agent.agents[id_agent].locate.position.z = int(content[Action.Z])
-                        self.agent.agents[id_agent].is_updated = True
+        template = Template()
+        template.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DATA))
 
-                        self.agent.agents[id_agent].locate.velocity.x = float(
-                            content[Action.VEL_X]
-                        )
-                        self.agent.agents[id_agent].locate.velocity.y = float(
-                            content[Action.VEL_Y]
-                        )
-                        self.agent.agents[id_agent].locate.velocity.z = float(
-                            content[Action.VEL_Z]
-                        )
+        self.add_behaviour(DataFromTroopBehaviour(), template)
 
-                        self.agent.agents[id_agent].locate.heading.x = float(
-                            content[Action.HEAD_X]
-                        )
-                        self.agent.agents[id_agent].locate.heading.y = float(
-                            content[Action.HEAD_Y]
-                        )
-                        self.agent.agents[id_agent].locate.heading.z = float(
-                            content[Action.HEAD_Z]
-                        )
+    async def handle_data(self, behaviour, content):
+        """
+        Updates the state of a troop from its DATA message and, unless the
+        troop is served by PushDataBehaviour or BroadcastWorldBehaviour,
+        replies with its packs and FOV
+        :param behaviour: behaviour used to send the messages
+        :param content: content of the DATA message
+        """
+        await self.handle_data_batch(behaviour, [content])
 
-                        self.agent.agents[id_agent].health = int(content[Belief.HEALTH])
-                        self.agent.agents[id_agent].ammo = int(content[Belief.AMMO])
+    async def handle_data_batch(self, behaviour, contents):
+        """
+        Same as handle_data for several DATA messages. All the troops are
+        updated first, and the fields of view of the replies are computed
+        together (in the worker processes, if the manager has any).
+        :param behaviour: behaviour used to send the messages
+        :param contents: contents of the DATA messages (one per troop)
+        """
+        updated = []
+        for content in contents:
+            try:
+                self.update_agent(content)
+                updated.append(content)
+            except Exception as e:
+                logger.warning("Exception updating agent from DATA: {}".format(e))
+
+        # Pipelined troops get their FOV from PushDataBehaviour and, in
+        # broadcast mode, every troop gets it from BroadcastWorldBehaviour
+        replies = [] if self.broadcast else [
+            content for content in updated if not self.agents[content[Belief.NAME]].is_pipelined
+        ]
+        packs = {}
+        for content in replies:
+            packs[content[Belief.NAME]] = await self.check_objects_at_step(
+                content[Belief.NAME], behaviour=behaviour
+            )
+        sights = await self.fields_of_view([content[Belief.NAME] for content in replies])
+
+        for content in replies:
+            id_agent = content[Belief.NAME]
+            reply = {Action.PACKS: packs[id_agent], Action.FOV: self.fov_content(sights[id_agent])}
+            if Action.SEQUENCE in content:
+                # Lets the troop match the reply with the DATA message served
+                reply[Action.SEQUENCE] = content[Action.SEQUENCE]
+            msg = Message(to=id_agent)
+            msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DATA))
+            msg.body = json.dumps(reply)
+            await behaviour.send(msg)
 
-                        packs = await self.agent.check_objects_at_step(
-                            id_agent, behaviour=self
-                        )
-                        fov_objects = self.agent.look(id_agent)
-                        content = {Action.PACKS: packs, Action.FOV: fov_objects}
-                        msg = Message(to=id_agent)
-                        msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DATA))
-                        msg.body = json.dumps(content)
+        for content in updated:
+            if self.check_game_finished(content[Belief.NAME]):
+                await self.inform_game_finished("ALLIED", behaviour)
+                logger.success(
+                    "\n\nManager:  GAME FINISHED!! Winner Team: ALLIED! (Target Returned)\n"
+                )
+                break
 
-                        await self.send(msg)
-                        if self.agent.check_game_finished(id_agent):
-                            await self.agent.inform_game_finished("ALLIED", self)
-                            logger.success(
-                                "\n\nManager:  GAME FINISHED!! Winner Team: ALLIED! (Target Returned)\n"
-                            )
+    def update_agent(self, content):
+        """Updates the state of a troop from the content of its DATA message."""
+        agent = self.agents[content[Belief.NAME]]
+
+        agent.locate.position.x = int(content[Action.X])
+        agent.locate.position.y = int(content[Action.Y])
+        agent.locate.position.z = int(content[Action.Z])
+        agent.is_updated = True
+
+        agent.locate.velocity.x = float(content[Action.VEL_X])
+        agent.locate.velocity.y = float(content[Action.VEL_Y])
+        agent.locate.velocity.z = float(content[Action.VEL_Z])
+
+        agent.locate.heading.x = float(content[Action.HEAD_X])
+        agent.locate.heading.y = float(content[Action.HEAD_Y])
+        agent.locate.heading.z = float(content[Action.HEAD_Z])
+
+        agent.health = int(content[Belief.HEALTH])
+        agent.ammo = int(content[Belief.AMMO])
+        self.world_version += 1
+
+    # Behaviour to serve DATA, SHOOT and PACK messages from a single prioritized queue
+    def launch_scheduled_responder_behaviour(self):
+        class ScheduledResponderBehaviour(CyclicBehaviour):
+            async def run(self):
+                scheduler = self.agent.scheduler
+                timeout = None if len(scheduler) else LONG_RECEIVE_WAIT
+                msg = await self.receive(timeout=timeout)
+                while msg:
+                    scheduler.put(msg)
+                    msg = await self.receive()
+
+                if len(scheduler) > self.agent.max_total_agents + 1:
+                    logger.warning("Manager overloaded: {}".format(scheduler.get_stats()))
+
+                try:
+                    if self.agent.batch_shots and scheduler.depth(Performative.SHOOT):
+                        # Then serve one of the other messages, so they are not starved
+                        shots = scheduler.pop_all(Performative.SHOOT)
+                        await self.agent.resolve_shots(self, [json.loads(m.body) for m in shots])
+
+                    performative, msg = scheduler.pop()
+                    if performative == Performative.SHOOT:
+                        await self.agent.resolve_shots(self, [json.loads(msg.body)])
+                    elif performative == Performative.PACK:
+                        self.agent.handle_pack(msg)
+                    elif performative == Performative.DATA:
+                        await self.agent.handle_data(self, json.loads(msg.body))
                 except Exception as e:
-                    logger.warning("Exception at DataFromTroopBehaviour: {}".format(e))
+                    logger.warning("Exception at ScheduledResponderBehaviour: {}".format(e))
                     logger.warning(traceback.format_exc())
 
         template = Template()
         template.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DATA))
+        for performative in (Performative.SHOOT, Performative.PACK):
+            other = Template()
+            other.set_metadata(str(Performative.PERFORMATIVE), str(performative))
+            template = template | other
+        self.add_behaviour(ScheduledResponderBehaviour(), template)
 
-        self.add_behaviour(DataFromTroopBehaviour(), template)
+    def get_queue_stats(self):
+        """
+        :return: metrics of the queues of messages served by priority
+        """
+        return self.scheduler.get_stats()
+
+    # Behaviour to push FOV and packs to troops working in pipelined mode
+    def launch_push_data_behaviour(self):
+        class PushDataBehaviour(PeriodicBehaviour):
+            async def on_start(self):
+                self.last_version = -1
+
+            async def run(self):
+                if self.agent.world_version == self.last_version:
+                    return
+                self.last_version = self.agent.world_version
+
+                agents = [
+                    a for a in self.agent.agents.values() if a.is_pipelined and a.is_updated
+                ]
+                taken = {}
+                for agent in agents:
+                    try:
+                        taken[agent.jid] = await self.agent.check_objects_at_step(
+                            agent.jid, behaviour=self
+                        )
+                    except Exception as e:
+                        logger.warning("Exception at PushDataBehaviour: {}".format(e))
+                try:
+                    sights = await self.agent.fields_of_view([a.jid for a in agents])
+                except Exception as e:
+                    logger.warning("Exception at PushDataBehaviour: {}".format(e))
+                    return
+
+                for agent in agents:
+                    try:
+                        packs = taken.get(agent.jid, [])
+                        fov_objects = self.agent.fov_content(sights[agent.jid])
+                        if not packs and fov_objects == agent.last_fov:
+                            continue
+                        agent.last_fov = fov_objects
+
+                        msg = Message(to=agent.jid)
+                        msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DATA))
+                        msg.body = json.dumps({Action.PACKS: packs, Action.FOV: fov_objects})
+                        await self.send(msg)
+                    except Exception as e:
+                        logger.warning("Exception at PushDataBehaviour: {}".format(e))
+
+        self.add_behaviour(PushDataBehaviour(self.clock.period(self.fps)))
+        logger.debug("PushDataBehaviour started.")
+
+    # Behaviour to send a world snapshot to every team once per frame
+    def launch_broadcast_world_behaviour(self):
+        class BroadcastWorldBehaviour(PeriodicBehaviour):
+            async def on_start(self):
+                self.last_version = -1
+
+            async def run(self):
+                if self.agent.world_version == self.last_version:
+                    return
+                self.last_version = self.agent.world_version
+
+                try:
+                    taken = {}
+                    for agent in list(self.agent.agents.values()):
+                        if agent.is_updated and agent.health > 0:
+                            packs = await self.agent.check_objects_at_step(
+                                agent.jid, behaviour=self
+                            )
+                            if packs:
+                                taken[agent.jid] = packs
+
+                    sights = await self.agent.fields_of_view(
+                        [a.jid for a in self.agent.agents.values() if a.is_updated and a.health > 0]
+                    )
+                    for team in (TEAM_ALLIED, TEAM_AXIS):
+                        members = [
+                            a.jid for a in self.agent.agents.values()
+                            if a.team == team and a.is_updated and a.health > 0
+                        ]
+                        if not members:
+                            continue
+                        body = json.dumps(
+                            {Action.SNAPSHOT: self.agent.build_team_snapshot(team, taken, sights)}
+                        )
+                        for jid in members:
+                            msg = Message(to=jid)
+                            msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.DATA))
+                            msg.body = body
+                            await self.send(msg)
+                except Exception as e:
+                    logger.warning("Exception at BroadcastWorldBehaviour: {}".format(e))
+                    logger.warning(traceback.format_exc())
+
+        self.add_behaviour(BroadcastWorldBehaviour(self.clock.period(self.fps)))
+        logger.debug("BroadcastWorldBehaviour started.")
 
     # Behaviour to handle Shot messages
     def launch_shoot_responder_behaviour(self):
@@ -349,8 +708,6 @@ class Manager(AbstractAgent, Agent):
                 if msg:
                     content = json.loads(msg.body)
                     shooter_id = content[Belief.NAME]
-                    aim = int(content[Action.AIM])
-                    shots = int(content[Action.SHOTS])
                     victim_pos = Vector3D(x=content[Action.X], y=content[Action.Y], z=content[Action.Z])
                     try:
                         shooter = self.agent.agents[shooter_id]
@@ -363,112 +720,183 @@ class Manager(AbstractAgent, Agent):
                     if victim is None:
                         return
 
-                    damage = 2 if shooter.type == CLASS_SOLDIER else 1
-                    damage *= max(0, shots)
-                    victim.health -= damage
-                    logger.info("Victim hit: {}".format(victim))
+                    damage = self.agent.get_shot_damage(shooter, content)
+                    await self.agent.hit_agent(self, victim, damage)
 
-                    if victim.health <= 0:
-                        victim.health = 0
-                        logger.info("Agent {} died.".format(victim.jid))
-
-                        if victim.is_carrying_objective:
-                            victim.is_carrying_objective = False
-                            logger.info(
-                                "Agent {} lost the ObjectivePack.".format(victim.jid)
-                            )
+        class BatchShootResponderBehaviour(PeriodicBehaviour):
+            async def run(self):
+                shots = []
+                msg = await self.receive()
+                while msg:
+                    shots.append(json.loads(msg.body))
+                    msg = await self.receive()
+
+                self.agent.shoot_queue_depth = len(shots)
+                self.agent.max_shoot_queue_depth = max(
+                    self.agent.max_shoot_queue_depth, len(shots)
+                )
+                if not shots:
+                    return
+                logger.debug("Manager: resolving {} shots".format(len(shots)))
 
-                            for din_object in self.agent.din_objects.values():
-
-                                if din_object.type == PACK_OBJPACK:
-                                    din_object.is_taken = False
-                                    din_object.owner = 0
-                                    msg_pack = Message(to=str(din_object.jid))
-                                    msg_pack.set_metadata(
-                                        Performative.PERFORMATIVE, Performative.PACK_LOST
-                                    )
-                                    din_object.position.x = victim.locate.position.x
-                                    din_object.position.y = victim.locate.position.y
-                                    din_object.position.z = victim.locate.position.z
-                                    msg_pack.body = json.dumps(
-                                        {
-                                            Action.X: victim.locate.position.x,
-                                            Action.Y: victim.locate.position.y,
-                                            Action.Z: victim.locate.position.z,
-                                        }
-                                    )
-                                    await self.send(msg_pack)
-
-                                    # Statistics
-                                    self.agent.game_statistic.objective_lost(
-                                        victim.team
-                                    )
-                                    break
-
-                    msg_shot = Message(to=victim.jid)
-                    msg_shot.set_metadata(str(Performative.PERFORMATIVE), str(Performative.SHOOT))
-                    msg_shot.body = json.dumps({Action.DEC_HEALTH: damage})
-                    await self.send(msg_shot)
+                await self.agent.resolve_shots(self, shots)
 
         template = Template()
         template.set_metadata(str(Performative.PERFORMATIVE), str(Performative.SHOOT))
-        self.add_behaviour(ShootResponderBehaviour(), template)
+        if self.batch_shots:
+            self.add_behaviour(BatchShootResponderBehaviour(self.clock.period(self.fps)), template)
+        else:
+            self.add_behaviour(ShootResponderBehaviour(), template)
+
+    async def resolve_shots(self, behaviour, shots):
+        """
+        Resolves several SHOOT messages together, merging the damage per victim
+        :param behaviour: behaviour used to send the messages
+        :param shots: list with the contents of the SHOOT messages
+        """
+        shooters, rays = [], []
+        for content in shots:
+            shooter = self.agents.get(content[Belief.NAME])
+            if shooter is None:
+                continue
+            shooters.append((shooter, content))
+            rays.append(
+                (
+                    content[Belief.NAME],
+                    Vector3D(x=content[Action.X], y=content[Action.Y], z=content[Action.Z]),
+                )
+            )
+
+        damages = {}
+        victims = self.shoot_batch(
+            rays, [self.get_shot_damage(shooter, content) for shooter, content in shooters]
+        )
+        for (shooter, content), victim in zip(shooters, victims):
+            self.game_statistic.shoot(victim, shooter.team)
+            if victim is not None:
+                damages[victim] = damages.get(victim, 0) + self.get_shot_damage(shooter, content)
+
+        # One notification (and at most one objective drop) per victim
+        for victim, damage in damages.items():
+            await self.hit_agent(behaviour, victim, damage)
+
+    @staticmethod
+    def get_shot_damage(shooter, content):
+        damage = 2 if shooter.type == CLASS_SOLDIER else 1
+        return damage * max(0, int(content[Action.SHOTS]))
+
+    async def hit_agent(self, behaviour, victim, damage):
+        """
+        Applies the damage of a shot to an agent and notifies it
+        :param behaviour: behaviour used to send the messages
+        :param victim: agent that was shot
+        :param damage: health points to decrease
+        """
+        victim.health -= damage
+        self.world_version += 1
+        logger.info("Victim hit: {}".format(victim))
+
+        if victim.health <= 0:
+            victim.health = 0
+            logger.info("Agent {} died.".format(victim.jid))
+
+            if victim.is_carrying_objective:
+                victim.is_carrying_objective = False
+                logger.info("Agent {} lost the ObjectivePack.".format(victim.jid))
+
+                for din_object in self.din_objects.values():
+
+                    if din_object.type == PACK_OBJPACK:
+                        din_object.is_taken = False
+                        din_object.owner = 0
+                        msg_pack = Message(to=str(din_object.jid))
+                        msg_pack.set_metadata(
+                            Performative.PERFORMATIVE, Performative.PACK_LOST
+                        )
+                        din_object.position.x = victim.locate.position.x
+                        din_object.position.y = victim.locate.position.y
+                        din_object.position.z = victim.locate.position.z
+                        msg_pack.body = json.dumps(
+                            {
+                                Action.X: victim.locate.position.x,
+                                Action.Y: victim.locate.position.y,
+                                Action.Z: victim.locate.position.z,
+                            }
+                        )
+                        await behaviour.send(msg_pack)
+
+                        # Statistics
+                        self.game_statistic.objective_lost(victim.team)
+                        break
+
+        msg_shot = Message(to=victim.jid)
+        msg_shot.set_metadata(str(Performative.PERFORMATIVE), str(Performative.SHOOT))
+        msg_shot.body = json.dumps({Action.DEC_HEALTH: damage})
+        await behaviour.send(msg_shot)
 
-    # Behaviour to handle Pack Management: Creation and Destruction
     def launch_pack_management_responder_behaviour(self):
         class PackManagementResponderBehaviour(CyclicBehaviour):
             async def run(self):
                 msg = await self.receive(LONG_RECEIVE_WAIT)
                 if msg:
-                    content = json.loads(msg.body)
+                    self.agent.handle_pack(msg)
 
-                    id_ = content[Belief.NAME]
-                    action = content[Action.ACTION]
+        template = Template()
+        template.set_metadata(str(Performative.PERFORMATIVE), str(Performative.PACK))
+        self.add_behaviour(PackManagementResponderBehaviour(), template)
 
-                    if action == Action.DESTROY:
-                        self.agent.game_statistic.pack_destroyed(
-                            self.agent.din_objects[id_]
-                        )
+    def handle_pack(self, msg):
+        """
+        Creates or destroys the DinObject of a pack
+        :param msg: the PACK message
+        """
+        content = json.loads(msg.body)
 
-                        try:
-                            del self.agent.din_objects[id_]
-                            logger.info("Pack removed")
-                        except KeyError:
-                            logger.info("Pack {} cannot be erased".format(id_))
-                        return
+        id_ = content[Belief.NAME]
+        action = content[Action.ACTION]
 
-                    if action == Action.CREATE:
-                        type_ = int(content[Action.TYPE])
-                        team = int(content[Belief.TEAM])
+        if action == Action.DESTROY:
+            self.game_statistic.pack_destroyed(
+                self.din_objects[id_]
+            )
 
-                        x = float(content[Action.X])
-                        y = float(content[Action.Y])
-                        z = float(content[Action.Z])
+            try:
+                del self.din_objects[id_]
+                self.world_version += 1
+                logger.info("Pack removed")
+            except KeyError:
+                logger.info("Pack {} cannot be erased".format(id_))
+            return
 
-                        din_object = DinObject()
-                        din_object.jid = msg.sender
-                        din_object.type = type_
-                        if din_object.type == PACK_OBJPACK:
-                            din_object.render_id = 1
-                        else:
-                            din_object.render_id = abs(hash(din_object.jid)) % 1024
-                        din_object.team = team
-                        din_object.position.x = x
-                        din_object.position.y = y
-                        din_object.position.z = z
+        if action == Action.CREATE:
+            type_ = int(content[Action.TYPE])
+            team = int(content[Belief.TEAM])
 
-                        self.agent.din_objects[din_object.jid] = din_object
-                        logger.info("Added DinObject {}".format(din_object))
+            x = float(content[Action.X])
+            y = float(content[Action.Y])
+            z = float(content[Action.Z])
 
-                        self.agent.game_statistic.pack_created(din_object, team)
+            din_object = DinObject()
+            din_object.jid = msg.sender
+            din_object.type = type_
+            if din_object.type == PACK_OBJPACK:
+                din_object.render_id = 1
+            else:
+                din_object.render_id = abs(hash(din_object.jid)) % 1024
+            din_object.team = team
+            din_object.position.x = x
+            din_object.position.y = y
+            din_object.position.z = z
 
-                    else:
-                        logger.warning("Action not identified: {}".format(action))
-                        return
+            self.din_objects[din_object.jid] = din_object
+            self.world_version += 1
+            logger.info("Added DinObject {}".format(din_object))
 
-        template = Template()
-        template.set_metadata(str(Performative.PERFORMATIVE), str(Performative.PACK))
-        self.add_behaviour(PackManagementResponderBehaviour(), template)
+            self.game_statistic.pack_created(din_object, team)
+
+        else:
+            logger.warning("Action not identified: {}".format(action))
+            return
 
     # Behaviour to inform all agents that game has finished by time
     def launch_game_timeout_inform_behaviour(self):
@@ -479,25 +907,17 @@ class Manager(AbstractAgent, Agent):
                 )
                 await self.agent.inform_game_finished("AXIS!", self)
 
-        timeout = datetime.datetime.now() + datetime.timedelta(seconds=self.match_time)
-        self.add_behaviour(GameTimeoutInformBehaviour(start_at=timeout))
+        self.add_behaviour(GameTimeoutInformBehaviour(start_at=self.clock.after(self.match_time)))
 
     # Behaviour to inform all agents that game has finished because all allied troops died
     def launch_check_allied_health(self):
         class CheckAlliedHealthBehaviour(PeriodicBehaviour):
             async def run(self):
-                allied_alive = False
-                for agent in self.agent.agents.values():
-                    if agent.team == TEAM_AXIS:
-                        continue
-                    if agent.health > 0:
-                        allied_alive = True
-                        break
-                if not allied_alive:
+                if not self.agent.world.is_team_alive(TEAM_ALLIED):
                     logger.success("\n\nManager:  GAME FINISHED!! Winner Team: AXIS!\n")
                     await self.agent.inform_game_finished("AXIS!", self)
 
-        self.add_behaviour(CheckAlliedHealthBehaviour(20 * self.fps))
+        self.add_behaviour(CheckAlliedHealthBehaviour(self.clock.period(20 * self.fps)))
 
     async def check_objects_at_step(self, id_agent, behaviour):
 
@@ -604,6 +1024,7 @@ class Manager(AbstractAgent, Agent):
 
                 # // Send a destroy/taken msg to pack and an inform msg to agent
                 if content:
+                    self.world_version += 1
                     content = json.dumps(content)
                     msg = Message(to=owner)
                     msg.set_metadata(str(Performative.PERFORMATIVE), str(Belief.PACK_TAKEN))
@@ -613,7 +1034,10 @@ class Manager(AbstractAgent, Agent):
         return packs
 
     def look(self, name):
-        fov_objects = self.get_objects_in_field_of_view(name)
+        return self.fov_content(self.get_objects_in_field_of_view(name))
+
+    @staticmethod
+    def fov_content(fov_objects):
         content = []
         for fov_object in fov_objects:
             obj = {
@@ -629,104 +1053,111 @@ class Manager(AbstractAgent, Agent):
             content.append(obj)
         return content
 
-    def get_objects_in_field_of_view(self, id_agent):
-        objects_in_sight = list()
-        agent = None
-
-        # for k, a in self.agents.items():
-        #    if a.jid == id_agent:
-        #        agent = a
-        #        break
-        agent = self.agents[id_agent]
-
-        if agent is None or agent.locate.heading.length() == 0:
-            return objects_in_sight
+    async def fields_of_view(self, names):
+        """
+        Computes the field of view of several agents, in the worker
+        processes if the manager has any
+        :param names: jids of the viewers
+        :return: dict with the list of Sight objects of every viewer
+        """
+        if self.worker_pool is None or len(names) < 2:
+            return {name: self.get_objects_in_field_of_view(name) for name in names}
+
+        # Contiguous ranges of slots go to the same worker
+        viewers = sorted((self.agents[name] for name in names), key=lambda a: a.slot)
+        din_objects = list(self.din_objects.values())
+        results = await self.worker_pool.fields_of_view(
+            self.world,
+            [(a.slot, a.locate.view_radius, float(a.locate.angle)) for a in viewers],
+            [d.position.to_tuple() for d in din_objects],
+        )
 
-        dot_angle = float(agent.locate.angle)
+        sights = {}
+        for viewer, in_sight in zip(viewers, results):
+            sights[viewer.jid] = [
+                self.create_sight(
+                    din_objects[-key - 1] if key < 0 else self.agents[self.world.jids[key]],
+                    distance,
+                    angle,
+                )
+                for key, distance, angle in in_sight
+            ]
+        return sights
 
-        # am I watching agents?
-        for a in self.agents.values():
-            if a.jid == id_agent:
-                continue
-            if (
-                    a.health <= MIN_HEALTH
-            ):  # WARNING, we may be interested in seeing dead agents
+    def build_team_snapshot(self, team, taken=None, sights=None):
+        """
+        Builds the world seen by a team: a list of entries (agents and packs
+        seen by any team member) and, for every member, a bitset whose bit i
+        is set if entry i is in its field of view.
+
+        :param team: TEAM_ALLIED or TEAM_AXIS
+        :param taken: dict with the packs taken in this frame by each agent
+        :param sights: dict with the Sight objects of each viewer, if already computed
+        :return: dict with the entries, the FOV bitsets and the packs taken
+        """
+        taken = taken if taken else {}
+        entries = []
+        index = {}
+        fov = {}
+        packs = {}
+        for viewer in self.agents.values():
+            if viewer.team != team or not viewer.is_updated or viewer.health <= 0:
                 continue
+            bits = 0
+            in_sight = (
+                sights[viewer.jid] if sights is not None
+                else self.get_objects_in_field_of_view(viewer.jid)
+            )
+            for s in in_sight:
+                if s.m_id not in index:
+                    index[s.m_id] = len(entries)
+                    entries.append(
+                        [s.team, s.type, s.health, s.position.x, s.position.y, s.position.z]
+                    )
+                bits |= 1 << index[s.m_id]
+            fov[viewer.jid] = bits
+            if viewer.jid in taken:
+                packs[viewer.jid] = taken[viewer.jid]
 
-            v = Vector3D(v=a.locate.position)
-            v.sub(agent.locate.position)
-
-            distance = v.length()
-
-            # check distance
-            # get distance to the closest wall
-            distance_terrain = self.intersect_with_walls(
-                agent.locate.position, v
-            )  # a.locate.heading)
-
-            # check distance
-            if distance < agent.locate.view_radius and distance < distance_terrain:
+        return {Action.ENTRIES: entries, Action.FOV: fov, Action.PACKS: packs}
 
-                # check angle
-                angle = agent.locate.heading.dot(v)
-                try:
-                    angle /= agent.locate.heading.length() * v.length()
-                except ZeroDivisionError:
-                    angle = 0
-
-                if angle >= 0:
-                    angle = min(1, angle)
-                    angle = math.acos(angle)
-                    if angle <= dot_angle:
-                        s = Sight()
-                        s.distance = distance
-                        s.m_id = a.jid
-                        s.position = a.locate.position
-                        s.team = a.team
-                        s.type = a.type
-                        s.angle = angle
-                        s.health = a.health
-                        objects_in_sight.append(s)
+    def get_objects_in_field_of_view(self, id_agent):
+        agent = self.agents[id_agent]
 
+        # WARNING, we may be interested in seeing dead agents
+        targets = [
+            (a, a.locate.position)
+            for a in self.agents.values()
+            if a.jid != id_agent and a.health > MIN_HEALTH
+        ]
         # am I watching objects?
-        if len(self.din_objects) > 0:
-
-            for din_object in self.din_objects.values():
-
-                v = Vector3D(v=din_object.position)
-                v.sub(agent.locate.position)
-
-                distance = v.length()
-
-                # check distance
-                # get distance to the closest wall
-                distance_terrain = self.intersect_with_walls(
-                    agent.locate.position, v
-                )  # a.locate.heading)
-
-                if distance < agent.locate.view_radius and distance < distance_terrain:
-
-                    angle = agent.locate.heading.dot(v)
-                    try:
-                        angle /= agent.locate.heading.length() * v.length()
-                    except ZeroDivisionError:
-                        angle = 0
-
-                    if angle >= 0:
-                        angle = min(1, angle)
-                        angle = math.acos(angle)
-                        if angle <= dot_angle:
-                            s = Sight()
-                            s.distance = distance
-                            s.m_id = din_object.jid
-                            s.position = din_object.position
-                            s.team = din_object.team
-                            s.type = din_object.type
-                            s.angle = angle
-                            s.health = -1
-                            objects_in_sight.append(s)
-
-        return objects_in_sight
+        targets += [(d, d.position) for d in self.din_objects.values()]
+
+        in_sight = field_of_view(
+            self.map,
+            agent.locate.position,
+            agent.locate.heading,
+            agent.locate.view_radius,
+            float(agent.locate.angle),
+            targets,
+        )
+        return [self.create_sight(target, distance, angle) for target, distance, angle in in_sight]
+
+    @staticmethod
+    def create_sight(target, distance, angle):
+        s = Sight()
+        s.distance = distance
+        s.angle = angle
+        s.m_id = target.jid
+        s.team = target.team
+        s.type = target.type
+        if isinstance(target, MicroAgent):
+            s.position = target.locate.position
+            s.health = target.health
+        else:
+            s.position = target.position
+            s.health = -1
+        return s
 
     def shoot(self, shooter_agent_id, victim_position):
         """
@@ -735,61 +1166,109 @@ class Manager(AbstractAgent, Agent):
         :param victim_position: the coordinates of the victim to be shot
         :return: agent shot or None
         """
-        victim = None
-        min_distance = 1e10
+        return self.shoot_batch([(shooter_agent_id, victim_position)])[0]
 
-        if random.random() <= MISSING_SHOT_PROBABILITY:
-            return None
-
-        try:
-            shooter_agent = Mobile()
-            shooter_agent.position = self.agents[shooter_agent_id].locate.position
-            shooter_agent.destination = Vector3D(victim_position)
-            shooter_agent.calculate_new_orientation(shooter_agent.destination)
-        except KeyError:
-            return None
-
-        victim, min_distance = self._check_agents_in_row(
-            shooter_agent_id, shooter_agent, victim, min_distance
-        )
-
-        if victim is not None:
-            shooter_agent.destination = victim.locate.position
-            shooter_agent.calculate_new_orientation(shooter_agent.destination)
-            distance_to_obstacle = self.intersect_with_walls(
-                shooter_agent.position, shooter_agent.heading, min_distance
-            )
-            if distance_to_obstacle != 0.0 and distance_to_obstacle < min_distance:
-                victim = None
-
-        return victim
+    def shoot_batch(self, shots, damages=None):
+        """
+        Resolves several shots together against all the alive agents
+        :param shots: list of (shooter_agent_id, victim_position) tuples
+        :param damages: damage of each shot. If given, the shots are applied in
+                        order and an agent killed by a shot of the batch is not
+                        hit again: later shots go through it.
+        :return: list with the agent shot (or None) by each shot
+        """
+        victims = [None] * len(shots)
+        rows, shooters, origins, headings = [], [], [], []
 
-    def _check_agents_in_row(
-            self, shooter_agent_id, shooter_agent, victim, min_distance
-    ):
-        for agent in self.agents.values():
-            if agent.jid == shooter_agent_id:
+        for row, (shooter_agent_id, victim_position) in enumerate(shots):
+            if self.get_shot_random(shooter_agent_id).random() <= MISSING_SHOT_PROBABILITY:
                 continue
-            if agent.health <= 0:
+            try:
+                shooter = self.agents[shooter_agent_id]
+            except KeyError:
                 continue
+            position = shooter.locate.position
+            heading = Vector3D.from_xyz(
+                victim_position.x - position.x,
+                victim_position.y - position.y,
+                victim_position.z - position.z,
+            )
+            heading.normalize()
+            rows.append(row)
+            shooters.append(shooter.slot)
+            origins.append(position.to_tuple())
+            headings.append(heading.to_tuple())
+
+        if not rows:
+            return victims
+
+        shooters, origins, headings = np.array(shooters), np.array(origins), np.array(headings)
+        # Health left to the agents hit in this batch and slots of the ones killed
+        health, killed = {}, set()
+        pending = list(range(len(rows)))
+        while pending:
+            slots, distances = self._check_agents_in_row(
+                shooters[pending], origins[pending], headings[pending], excluded=killed
+            )
+            retry, newly_killed = [], set()
+            for i, slot, min_distance in zip(pending, slots, distances):
+                if slot < 0:
+                    continue
+                victim = self.agents[self.world.jids[slot]]
+                origin = Vector3D.from_tuple(origins[i])
+                heading = Vector3D.from_xyz(0.0, 0.0, 0.0)
+                heading.set_sub(victim.locate.position, origin)
+                distance_to_obstacle = self.intersect_with_walls(
+                    origin, heading, min_distance
+                )
+                if distance_to_obstacle != 0.0 and distance_to_obstacle < min_distance:
+                    continue
+                if damages is not None:
+                    left = health.get(slot, victim.health)
+                    if left <= 0:
+                        # Killed by a previous shot of the batch
+                        retry.append(i)
+                        continue
+                    health[slot] = left - damages[rows[i]]
+                    if health[slot] <= 0:
+                        newly_killed.add(slot)
+                victims[rows[i]] = victim
+            killed |= newly_killed
+            pending = retry
 
-            shooter_position = Vector3D(shooter_agent.position)
-            shooter_position.sub(agent.locate.position)
-
-            dv = shooter_position.dot(shooter_agent.heading)
-            d2 = shooter_agent.heading.dot(shooter_agent.heading)
-            sq = (dv * dv) - ((d2 * shooter_position.dot(shooter_position)) - 4)
-
-            if sq >= 0 and d2 != 0:
-                sq = math.sqrt(sq)
-                dist1 = (-dv + sq) / d2
-                dist2 = (-dv - sq) / d2
-                distance = dist1 if dist1 < dist2 else dist2
+        return victims
 
-                if 0 < distance < min_distance:
-                    min_distance = distance
-                    victim = agent
-        return victim, min_distance
+    def _check_agents_in_row(self, shooters, origins, headings, excluded=()):
+        """
+        Intersects every shot ray with the hit circle of every alive agent
+        :param shooters: (S,) slots of the shooters
+        :param origins: (S, 3) origins of the rays
+        :param headings: (S, 3) unit directions of the rays
+        :param excluded: slots of agents that can't be hit
+        :return: slot of the closest agent hit by each ray (-1 if none) and its distance
+        """
+        world = self.world
+        positions = world.position[: world.size]
+        candidates = np.broadcast_to(world.alive_mask(), (len(shooters), world.size)).copy()
+        candidates[np.arange(len(shooters)), shooters] = False
+        if excluded:
+            candidates[:, list(excluded)] = False
+
+        d = origins[:, None, :] - positions[None, :, :]
+        dv = np.einsum("snk,sk->sn", d, headings)
+        d2 = np.einsum("sk,sk->s", headings, headings)[:, None]
+        sq = (dv * dv) - ((d2 * np.einsum("snk,snk->sn", d, d)) - SHOT_RADIUS_SQ)
+
+        candidates &= (sq >= 0) & (d2 != 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distance = (-dv - np.sqrt(np.where(candidates, sq, 0))) / d2
+        candidates &= distance > 0
+        distance = np.where(candidates, distance, np.inf)
+
+        slots = np.argmin(distance, axis=1)
+        distances = distance[np.arange(len(shooters)), slots]
+        slots = np.where(np.isfinite(distances), slots, -1)
+        return slots, distances
 
     def intersect_with_walls(self, origin, vector, distance=1e10):
         """
@@ -798,78 +1277,7 @@ class Manager(AbstractAgent, Agent):
         :param distance:
         :return: 0.0 if it does not intersect
         """
-
-        try:
-
-            if vector.length() == 0:
-                return 0.0
-
-            step = Vector3D(v=vector)
-            step.normalize()
-            inc = 0
-            sgn = 1.0
-            e = 0.0
-
-            if abs(step.x) > abs(step.z):
-
-                if step.z < 0:
-                    sgn = -1
-
-                step.x /= abs(step.x)
-                step.z /= abs(step.x)
-            else:
-
-                if step.x < 0:
-                    sgn = -1
-
-                inc = 1
-                step.x /= abs(step.z)
-                step.z /= abs(step.z)
-
-            error = Vector3D(x=0, y=0, z=0)
-            point = Vector3D(v=origin)
-
-            while True:
-
-                if inc == 0:
-
-                    if e + abs(step.z) + 0.5 >= 1:
-                        point.z += sgn
-                        e -= 1
-
-                    e += abs(step.z)
-                    point.x += step.x
-                else:
-
-                    if e + abs(step.x) + 0.5 >= 1:
-                        point.x += sgn
-                        e -= 1
-
-                    e += abs(step.x)
-                    point.z += step.z
-
-                if not self.map.can_walk(
-                        int(math.floor(point.x)), int(math.floor(point.z))
-                ):
-                    return error.length()
-
-                if point.x < 0 or point.y < 0 or point.z < 0:
-                    break
-                if point.x >= (self.map.get_size_x()) or point.z >= (
-                        self.map.get_size_z()
-                ):
-                    break
-                error.add(step)
-                if error.length() > distance:
-                    return error.length()
-        except Exception as e:
-            logger.error(
-                "INTERSECT FAILED: (origin: {}) (vector: {}): {}".format(
-                    origin, vector, e
-                )
-            )
-
-        return 0.0
+        return intersect_with_walls(self.map, origin, vector, distance)
 
     def check_game_finished(self, id_agent):
         if self.agents[id_agent].team == TEAM_AXIS:
@@ -898,6 +1306,7 @@ class Manager(AbstractAgent, Agent):
             x=self.map.get_target_x(),
             z=self.map.get_target_z(),
             team=TEAM_NONE,
+            clock=self.clock,
         )
         await self.objective_agent.start()
 
@@ -925,10 +1334,10 @@ class Manager(AbstractAgent, Agent):
             msg.body = "GAME FINISHED!! Winner Team: " + str(winner_team)
             msg.to = agent.jid
             await behaviour.send(msg)
-        for st in self.render_server.get_connections():
+        for st in list(self.render_server.get_connections()):
             try:
-                # st.send_msg_to_render_engine(TCP_COM, "FINISH " + " GAME FINISHED!! Winner Team: " + str(winner_team))
-                st.send_msg_to_render_engine(TCP.COM, Msg.QUIT)
+                # self.render_server.send_msg_to_render_engine(st, TCP.COM, "FINISH " + " GAME FINISHED!! Winner Team: " + str(winner_team))
+                self.render_server.send_msg_to_render_engine(st, TCP.COM, Msg.QUIT)
             except:
                 pass
 
@@ -943,8 +1352,14 @@ class Manager(AbstractAgent, Agent):
         allied_health = 0
         axis_health = 0
 
-        self.game_statistic.match_duration = time.time() - self.match_init
+        self.game_statistic.match_duration = self.clock.time() - self.match_init
         logger.info("Match took {} seconds".format(self.game_statistic.match_duration))
+        if self.batch_shots:
+            logger.info("Max SHOOT queue depth: {}".format(self.max_shoot_queue_depth))
+        if self.prioritize:
+            logger.info("Message queues: {}".format(self.get_queue_stats()))
+        else:
+            logger.info("DATA intake: {}".format(self.data_intake.get_stats()))
 
         for agent in self.agents.values():
             if agent.team == TEAM_ALLIED:
@@ -969,3 +1384,6 @@ class Manager(AbstractAgent, Agent):
 
         except Exception as e:
             logger.exception("COULD NOT WRITE STATISTICS TO FILE: {}".format(e))
+
+        if self.profiler is not None:
+            self.profiler.dump("pygomas_profile.txt")
@@ -3,6 +3,7 @@ from strenum import StrEnum
 
 class Action(StrEnum):
     ACTION = "ACTION"
+    ADDED = "added"
     AIM = "aim"
     ANGLE = "angle"
     CREATE = "CREATE"
@@ -10,14 +11,19 @@ class Action(StrEnum):
     DEC_HEALTH = "dec_health"
     DESTROY = "DESTROY"
     DISTANCE = "distance"
+    ENTRIES = "entries"
     FOV = "fov"
     HEAD_X = "headx"
     HEAD_Y = "heady"
     HEAD_Z = "headz"
     MAP = "map"
     PACKS = "PACKS"
+    PIPELINED = "pipelined"
     QTY = "qty"
+    REMOVED = "removed"
+    SEQUENCE = "seq"
     SHOTS = "shots"
+    SNAPSHOT = "snapshot"
     VEL_X = "xvel"
     TYPE = "type"
     VEL_Y = "yvel"
@@ -48,6 +54,7 @@ class Performative(StrEnum):
     REGISTER_SERVICE = "register"
     SERVICES = "services"
     SIGHT = "sight"
+    SUBSCRIBE = "subscribe"
     SHOOT = "shot"
 
 
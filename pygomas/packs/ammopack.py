@@ -1,6 +1,4 @@
-import asyncio
 import json
-from datetime import datetime, timedelta
 
 from spade.behaviour import TimeoutBehaviour
 from spade.message import Message
@@ -8,13 +6,11 @@ from spade.message import Message
 from pygomas.ontology import Action, Performative, Belief
 from .pack import Pack, PACK_AMMOPACK, PACK_AUTODESTROY_TIMEOUT
 
-now = datetime.now
-
 
 class AmmoPack(Pack):
     async def setup(self):
         self.type = PACK_AMMOPACK
-        timeout = now() + timedelta(seconds=PACK_AUTODESTROY_TIMEOUT)
+        timeout = self.clock.after(PACK_AUTODESTROY_TIMEOUT)
         self.add_behaviour(self.AutoDestroyBehaviour(start_at=timeout))
         await super().setup()
 
@@ -29,5 +25,5 @@ class AmmoPack(Pack):
             msg.body = json.dumps(content)
             if self.agent.is_alive():
                 await self.send(msg)
-            await asyncio.sleep(1)
+            await self.agent.clock.sleep(1)
             await self.agent.stop()
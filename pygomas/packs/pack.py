@@ -7,6 +7,7 @@ from spade.message import Message
 from spade.template import Template
 
 from pygomas.agents.agent import AbstractAgent, LONG_RECEIVE_WAIT
+from pygomas.clock import Clock
 from pygomas.ontology import Action, Performative, Belief
 from pygomas.utils.vector import Vector3D
 
@@ -30,13 +31,14 @@ class Pack(AbstractAgent, Agent):
         return "P(" + str(PACK_NAME[self.type]) + "," + str(self.position) + ")"
 
     def __init__(
-        self, name, passwd="secret", manager_jid="cmanager@localhost", x=0, z=0, team=0
+        self, name, passwd="secret", manager_jid="cmanager@localhost", x=0, z=0, team=0, clock=None
     ):
         Agent.__init__(self, name, passwd)
         AbstractAgent.__init__(self, name, team)
 
         self.type = PACK_NONE
         self.manager = manager_jid
+        self.clock = clock if clock is not None else Clock()
 
         self.position = Vector3D()
         self.position.x = x
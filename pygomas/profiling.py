@@ -0,0 +1,203 @@
+import functools
+import time
+
+from loguru import logger
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Histogram:
+    """
+    HDR-style histogram of non-negative integers. Values below
+    2 ** SUB_BUCKET_BITS are counted exactly and bigger ones in logarithmic
+    buckets with a relative error below 2 ** -(SUB_BUCKET_BITS - 1), so the
+    memory needed does not depend on the number of values recorded.
+    """
+
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @classmethod
+    def get_index(cls, value):
+        if value < 1 << cls.SUB_BUCKET_BITS:
+            return value
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS
+        return (shift << (cls.SUB_BUCKET_BITS - 1)) + (value >> shift)
+
+    @classmethod
+    def get_highest_value(cls, index):
+        """:return: the highest value counted in the bucket index"""
+        if index < 1 << cls.SUB_BUCKET_BITS:
+            return index
+        shift = (index >> (cls.SUB_BUCKET_BITS - 1)) - 1
+        mantissa = index - (shift << (cls.SUB_BUCKET_BITS - 1))
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(0, int(value))
+        index = self.get_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def get_percentile(self, percentile):
+        if not self.count:
+            return 0
+        threshold = percentile / 100 * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= threshold:
+                return min(self.get_highest_value(index), self.max)
+        return self.max
+
+    def as_dict(self):
+        summary = {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0,
+            "min": self.min or 0,
+            "max": self.max,
+        }
+        for p in PERCENTILES:
+            summary["p{}".format(p)] = self.get_percentile(p)
+        return summary
+
+
+class CallStats:
+    """Latencies (in microseconds) and mailbox depths of a behaviour or action."""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.mailbox = Histogram()
+
+    def as_dict(self):
+        return {"latency_us": self.latency.as_dict(), "mailbox": self.mailbox.as_dict()}
+
+
+class Profiler:
+    """
+    Records how long every behaviour run() and custom ASL action takes, and
+    the mailbox depth of the behaviours, aggregated by agent class.
+
+    The time a behaviour spends waiting in receive() is not counted, so the
+    latencies are the time the behaviour keeps the event loop busy.
+    """
+
+    def __init__(self):
+        # "AgentClass.BehaviourClass" or "AgentClass .action/arity" -> CallStats
+        self.stats = {}
+
+    def get_stats(self, key):
+        if key not in self.stats:
+            self.stats[key] = CallStats()
+        return self.stats[key]
+
+    def instrument_agent(self, agent):
+        """Instruments the behaviours of the agent, including the ones added later."""
+        for behaviour in agent.behaviours:
+            self.instrument_behaviour(agent, behaviour)
+
+        add_behaviour = agent.add_behaviour
+
+        @functools.wraps(add_behaviour)
+        def instrumented_add_behaviour(behaviour, template=None):
+            self.instrument_behaviour(agent, behaviour)
+            return add_behaviour(behaviour, template)
+
+        agent.add_behaviour = instrumented_add_behaviour
+
+    def instrument_behaviour(self, agent, behaviour):
+        if getattr(behaviour, "is_instrumented", False):
+            return
+        behaviour.is_instrumented = True
+        stats = self.get_stats("{}.{}".format(type(agent).__name__, type(behaviour).__name__))
+        run, receive = behaviour.run, behaviour.receive
+        waiting = [0.0]
+
+        async def instrumented_receive(timeout=None):
+            start = time.perf_counter()
+            try:
+                return await receive(timeout=timeout)
+            finally:
+                waiting[0] += time.perf_counter() - start
+
+        async def instrumented_run():
+            stats.mailbox.record(behaviour.mailbox_size())
+            waiting[0] = 0.0
+            start = time.perf_counter()
+            try:
+                return await run()
+            finally:
+                stats.latency.record((time.perf_counter() - start - waiting[0]) * 1e6)
+
+        behaviour.receive = instrumented_receive
+        behaviour.run = instrumented_run
+
+    def instrument_actions(self, actions, agent_class):
+        """Instruments the actions defined in actions (not in its parents)."""
+        for (functor, arity), action in list(actions.actions.items()):
+            key = "{} {}/{}".format(agent_class, functor, arity)
+            actions.actions[(functor, arity)] = self.instrument_action(action, key)
+        for functor, action in list(actions.variadic_actions.items()):
+            key = "{} {}/*".format(agent_class, functor)
+            actions.variadic_actions[functor] = self.instrument_action(action, key)
+
+    def instrument_action(self, action, key):
+        stats = self.get_stats(key)
+
+        @functools.wraps(action)
+        def instrumented_action(agent, term, intention):
+            # Only the time until the action succeeds (or fails) is counted
+            start = time.perf_counter()
+            results = iter(action(agent, term, intention))
+            try:
+                result = next(results)
+            except StopIteration:
+                stats.latency.record((time.perf_counter() - start) * 1e6)
+                return
+            stats.latency.record((time.perf_counter() - start) * 1e6)
+            yield result
+            yield from results
+
+        return instrumented_action
+
+    def as_dict(self):
+        return {key: stats.as_dict() for key, stats in sorted(self.stats.items())}
+
+    def dumps(self):
+        lines = [
+            "{:<60} {:>9} {:>10} {:>10} {:>10} {:>10} {:>10} {:>8}".format(
+                "Behaviour / action", "calls", "mean(us)", "p50(us)", "p99(us)", "p99.9(us)", "max(us)", "mailbox"
+            )
+        ]
+        by_total = sorted(self.stats.items(), key=lambda item: item[1].latency.total, reverse=True)
+        for key, stats in by_total:
+            latency = stats.latency.as_dict()
+            lines.append(
+                "{:<60} {:>9} {:>10.1f} {:>10} {:>10} {:>10} {:>10} {:>8}".format(
+                    key,
+                    latency["count"],
+                    latency["mean"],
+                    latency["p50"],
+                    latency["p99"],
+                    latency["p99.9"],
+                    latency["max"],
+                    stats.mailbox.max,
+                )
+            )
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        try:
+            with open(path, "w") as f:
+                f.write(self.dumps())
+        except Exception as e:
+            logger.exception("COULD NOT WRITE PROFILE TO FILE: {}".format(e))
@@ -22,7 +22,7 @@ from pygame.rect import Rect
 from pygomas.agents.bditroop import CLASS_NONE, CLASS_SOLDIER, CLASS_MEDIC, CLASS_ENGINEER, CLASS_FIELDOPS
 from pygomas.config import TEAM_AXIS, TEAM_ALLIED, TEAM_NONE
 from pygomas.packs.pack import PACK_MEDICPACK, PACK_AMMOPACK, PACK_OBJPACK
-from pygomas.server import TCP, Msg
+from pygomas.server import TCP, Msg, PROTOCOL_DELTA, DeltaDecoder
 
 draw_rect = False
 
@@ -76,6 +76,7 @@ class Render(object):
         self.graph = {}
         self.agents = {}
         self.dins = {}
+        self.delta_decoder = DeltaDecoder()
         self.factor = 2
 
         self.iteration = 0
@@ -235,7 +236,11 @@ class Render(object):
                     if data[int(Msg.BODY)] == Msg.WELCOME:
                         if not self.replay:
                             msg_to_send = msgpack.packb(
-                                {Msg.TYPE: TCP.COM, Msg.BODY: Msg.READY},
+                                {
+                                    Msg.TYPE: TCP.COM,
+                                    Msg.BODY: Msg.READY,
+                                    Msg.PROTOCOL: PROTOCOL_DELTA,
+                                },
                                 use_bin_type=True,
                             )
                             size_of_package = len(msg_to_send)
@@ -259,11 +264,11 @@ class Render(object):
                         if not self.text:
                             self.init_sprites()
 
-                elif data[Msg.TYPE] == TCP.AGL:
+                elif data[Msg.TYPE] in (TCP.AGL, TCP.AGL_KEYFRAME, TCP.AGL_DELTA):
                     if self.dump:
                         self.dump_data(data)
                     else:
-                        self.agl_parse(data[Msg.BODY])
+                        self.agl_parse(data[Msg.BODY], data[Msg.TYPE])
                         self.fps.append(1 / (time.time() - start_time))
 
                 elif data[Msg.TYPE] == TCP.TIME:
@@ -316,7 +321,13 @@ class Render(object):
         self.file.write(json.dumps(data))
         self.file.write("\nSEP\n")
 
-    def agl_parse(self, data):
+    def agl_parse(self, data, msg_type=TCP.AGL):
+        if msg_type != TCP.AGL:
+            if self.delta_decoder.decode(msg_type, data):
+                self.agents.update(self.delta_decoder.agents)
+                self.dins = dict(self.delta_decoder.packs)
+            return
+
         self.dins = {}
 
         for agent in data[Msg.AGENTS]:
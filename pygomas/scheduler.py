@@ -0,0 +1,143 @@
+from collections import deque
+
+from pygomas.ontology import Belief, Performative
+
+# Lower values are served first
+PRIORITIES = {
+    Performative.SHOOT: 0,
+    Performative.PACK: 1,
+    Performative.DATA: 2,
+}
+
+# Times a waiting queue can be passed over before it is served anyway
+DEFAULT_MAX_SKIPS = 4
+
+
+class QueueStats:
+    def __init__(self):
+        self.received = 0
+        self.processed = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    def as_dict(self):
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "coalesced": self.coalesced,
+            "max_depth": self.max_depth,
+        }
+
+
+class MessageScheduler:
+    """
+    Per-performative queues of the messages received by the manager.
+    Messages are served by priority (see PRIORITIES), but a queue passed
+    over max_skips times in a row is served next, so lower priorities are
+    not starved under sustained load. A DATA message replaces any DATA
+    message of the same troop still waiting, so only its latest state is
+    processed.
+    """
+
+    def __init__(self, priorities=None, max_skips=DEFAULT_MAX_SKIPS):
+        self.priorities = priorities if priorities is not None else PRIORITIES
+        self.order = sorted(self.priorities, key=self.priorities.get)
+        self.queues = {performative: deque() for performative in self.order}
+        self.stats = {performative: QueueStats() for performative in self.order}
+        self.max_skips = max_skips
+        # performative -> times its queue was passed over while waiting
+        self.skips = {performative: 0 for performative in self.order}
+        # sender -> latest DATA message waiting in the DATA queue
+        self.pending_data = {}
+
+    def put(self, msg):
+        performative = msg.get_metadata(str(Performative.PERFORMATIVE))
+        stats = self.stats[performative]
+        stats.received += 1
+
+        if performative == Performative.DATA:
+            sender = str(msg.sender)
+            if sender in self.pending_data:
+                # Keep the queue position, replace the stale state
+                self.pending_data[sender][0] = msg
+                stats.coalesced += 1
+                return
+            entry = [msg]
+            self.pending_data[sender] = entry
+            self.queues[performative].append(entry)
+        else:
+            self.queues[performative].append(msg)
+
+        stats.max_depth = max(stats.max_depth, len(self.queues[performative]))
+
+    def pop(self):
+        """
+        :return: the performative and the next message to serve, or (None, None)
+        """
+        waiting = [performative for performative in self.order if self.queues[performative]]
+        if not waiting:
+            return None, None
+        starved = [p for p in waiting if self.skips[p] >= self.max_skips]
+        performative = starved[0] if starved else waiting[0]
+        for other in waiting:
+            self.skips[other] = 0 if other == performative else self.skips[other] + 1
+
+        msg = self.queues[performative].popleft()
+        if performative == Performative.DATA:
+            msg = msg[0]
+            del self.pending_data[str(msg.sender)]
+        self.stats[performative].processed += 1
+        return performative, msg
+
+    def pop_all(self, performative):
+        """Pops all the queued messages of a performative (not coalesced DATA)."""
+        queue = self.queues[performative]
+        msgs = list(queue)
+        queue.clear()
+        self.stats[performative].processed += len(msgs)
+        return msgs
+
+    def depth(self, performative=None):
+        if performative is not None:
+            return len(self.queues[performative])
+        return sum(len(queue) for queue in self.queues.values())
+
+    def __len__(self):
+        return self.depth()
+
+    def get_stats(self):
+        return {
+            str(performative): dict(self.stats[performative].as_dict(), depth=len(self.queues[performative]))
+            for performative in self.order
+        }
+
+
+class DataIntake:
+    """
+    Latest pending DATA content of each troop, keyed by Belief.NAME.
+    A new update of a troop supersedes the one still waiting, keeping
+    its arrival order, so no work is done for stale states.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.received = 0
+        self.superseded = 0
+
+    def put(self, content):
+        self.received += 1
+        name = content[Belief.NAME]
+        if name in self.pending:
+            self.superseded += 1
+        self.pending[name] = content
+
+    def drain(self):
+        contents = list(self.pending.values())
+        self.pending.clear()
+        return contents
+
+    def __len__(self):
+        return len(self.pending)
+
+    def get_stats(self):
+        return {"received": self.received, "superseded": self.superseded}
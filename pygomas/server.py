@@ -1,5 +1,7 @@
 import asyncio
 import struct
+import time
+from collections import deque
 from enum import IntEnum
 
 import msgpack
@@ -12,6 +14,8 @@ class TCP(IntEnum):
     MAP = 2  # MAP: NAME, CHANGES, etc.
     TIME = 3  # TIME: LEFT TIME
     ERR = 4  # ERROR
+    AGL_KEYFRAME = 5  # AGENT LIST: DELTA PROTOCOL KEYFRAME
+    AGL_DELTA = 6  # AGENT LIST: DELTA PROTOCOL CHANGES
 
 
 class Msg(IntEnum):
@@ -21,6 +25,8 @@ class Msg(IntEnum):
     READY = 504
     QUIT = 505
     ACCEPT = 506
+    PROTOCOL = 507
+    FRAME = 508
     AGENTS = 1001
     PACKS = 1002
     CONTENT_NAME = 1003
@@ -32,13 +38,103 @@ class Msg(IntEnum):
     CONTENT_VELOCITY = 1009
     CONTENT_HEADING = 1010
     CONTENT_CARRYINGFLAG = 1011
+    AGENTS_INFO = 1012
+
+
+# Render protocols negotiated in the READY message
+PROTOCOL_AGL: int = 1
+PROTOCOL_DELTA: int = 2
+
+# Frames between two keyframes
+KEYFRAME_INTERVAL: int = 30
+
+# Quantization of positions (1/16 map units) and unit vectors
+POSITION_SCALE: int = 16
+VECTOR_SCALE: int = 1000
+
+INT16_MIN: int = -32768
+INT16_MAX: int = 32767
+
+# Fields of an agent record: index, health, ammo, flag, position, velocity, heading
+RECORD_SIZE: int = 13
+
+# Max frames waiting to be written to a render client
+MAX_CLIENT_QUEUE = 8
+
+
+class Client(object):
+    """
+    A render connection. Messages are queued and written by an independent
+    task which waits for the transport to drain, so a slow client never grows
+    the manager's buffers: when the queue is full the oldest AGL frame is
+    dropped.
+    """
+
+    def __init__(self, reader, writer, max_queue=MAX_CLIENT_QUEUE):
+        self.reader = reader
+        self.writer = writer
+        self.is_ready = False
+        self.protocol = PROTOCOL_AGL
+        self.needs_keyframe = True
+        self.max_queue = max_queue
+        self.queue = deque()
+        self.pending = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.writer_task = None
+
+    def put(self, data, droppable=False):
+        if len(self.queue) >= self.max_queue:
+            for i, (_, _, is_droppable) in enumerate(self.queue):
+                if is_droppable:
+                    del self.queue[i]
+                    self.dropped += 1
+                    self.needs_keyframe = True
+                    break
+            else:
+                if droppable:
+                    self.dropped += 1
+                    self.needs_keyframe = True
+                    return
+        self.queue.append((time.time(), data, droppable))
+        self.pending.set()
+
+    async def write_loop(self):
+        try:
+            while True:
+                await self.pending.wait()
+                self.pending.clear()
+                while self.queue:
+                    _, data, _ = self.queue.popleft()
+                    self.writer.write(data)
+                    await self.writer.drain()
+                    self.sent += 1
+        except ConnectionError as e:
+            logger.info("Render connection lost: {}".format(e))
+
+    def get_lag(self):
+        """Seconds the oldest queued message has been waiting."""
+        if not self.queue:
+            return 0.0
+        return time.time() - self.queue[0][0]
+
+    def get_stats(self):
+        return {
+            "peer": self.writer.get_extra_info("peername"),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "pending": len(self.queue),
+            "lag": self.get_lag(),
+        }
 
 
 class Server(object):
-    def __init__(self, map_name, port=8001):
+    def __init__(self, map_name, port=8001, max_client_queue=MAX_CLIENT_QUEUE):
         self.clients = {}
         self.map_name = map_name
         self.port = port
+        self.max_client_queue = max_client_queue
+        self.delta_encoder = DeltaEncoder()
         self.server = None
 
     def get_connections(self):
@@ -49,105 +145,301 @@ class Server(object):
         logger.info("Render Server started: {}".format(self.server))
 
     async def stop(self):
-        await self.server.stop()
+        self.server.close()
         await self.server.wait_closed()
 
     def accept_client(self, client_reader, client_writer):
         logger.info("New render connection")
-        task = asyncio.Task(self.handle_client(client_reader, client_writer))
-        self.clients[task] = (client_reader, client_writer, False)
+        client = Client(client_reader, client_writer, self.max_client_queue)
+        task = asyncio.ensure_future(self.handle_client(client))
+        self.clients[task] = client
+        client.writer_task = asyncio.ensure_future(client.write_loop())
 
         def client_done(task_):
-            del self.clients[task_]
+            client = self.clients.pop(task_)
+            client.writer_task.cancel()
             client_writer.close()
-            logger.info("End Connection")
+            logger.info("End Connection ({})".format(client.get_stats()))
 
         task.add_done_callback(client_done)
 
     def is_ready(self, task):
-        return self.clients[task][2]
+        return self.clients[task].is_ready
+
+    def has_ready_clients(self):
+        return any(client.is_ready for client in self.clients.values())
 
-    async def handle_client(self, reader, writer):
-        task = None
-        for k, v in self.clients.items():
-            if v[0] == reader and v[1] == writer:
-                task = k
-                break
-        # + ":" + str(self.request)
-        logger.info("Preparing Connection to " + str(task))
+    def get_client_stats(self):
+        """Sent, dropped and pending messages and lag of every render client."""
+        return [client.get_stats() for client in self.clients.values()]
+
+    async def handle_client(self, client):
+        logger.info("Preparing Connection to " + str(client.writer.get_extra_info("peername")))
 
         try:
-            self.send_msg_to_render_engine(task, msg_type=TCP.COM, msg=Msg.WELCOME)
-            await writer.drain()
+            self.send_msg_to_client(client, msg_type=TCP.COM, msg=Msg.WELCOME)
             logger.info("pygomas render engine server v. 0.2.0")
         except Exception as e:
             logger.error("EXCEPTION IN WELCOME MESSAGE")
             logger.error(str(e))
 
-        while True:
-            size_of_msg = await reader.read(4)
-            if not size_of_msg:
-                continue
-            size_of_msg = struct.unpack(">I", size_of_msg)[0]
-            logger.debug("Got size " + str(size_of_msg))
-
-            data = bytes()
-            while len(data) < size_of_msg:
-                packet = await reader.read(size_of_msg - len(data))
-                if not packet:
-                    break
-                data += packet
-
-            if len(data) == 0:
-                logger.info("Received no data")
-                # exit loop and disconnect
-                return
-
-            data = msgpack.unpackb(data, raw=False, strict_map_key=False)
-
-            logger.info("Client says:" + str(data))
-            if data[Msg.TYPE] == TCP.COM:
-                if data[Msg.BODY] == Msg.READY:
-                    logger.info("Server: Connection Accepted")
-                    self.send_msg_to_render_engine(task, TCP.COM, Msg.ACCEPT)
-                    self.send_msg_to_render_engine(task, TCP.MAP, self.map_name)
-                    logger.info("Sending: NAME: " + self.map_name)
-
-                    self.clients[task] = (reader, writer, True)
-
-                elif data[Msg.BODY] == Msg.QUIT:
-                    logger.info("Server: Client quitted")
-                    self.send_msg_to_render_engine(
-                        task, TCP.COM, "Server: Connection Closed"
-                    )
-                    return
-                else:
-                    # Close connection
-                    logger.info("Socket closed, closing connection.")
+        try:
+            while True:
+                size_of_msg = await client.reader.readexactly(4)
+                size_of_msg = struct.unpack(">I", size_of_msg)[0]
+                logger.debug("Got size " + str(size_of_msg))
+
+                if size_of_msg == 0:
+                    logger.info("Received no data")
+                    # exit loop and disconnect
                     return
 
-            elif data[Msg.TYPE] == TCP.MAP:
-                logger.info("Server: Client requested mapname")
-                self.send_msg_to_render_engine(task, TCP.MAP, self.map_name)
-                self.clients[task] = (reader, writer, True)
+                data = await client.reader.readexactly(size_of_msg)
+                data = msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+                logger.info("Client says:" + str(data))
+                if data[Msg.TYPE] == TCP.COM:
+                    if data[Msg.BODY] == Msg.READY:
+                        client.protocol = min(
+                            data.get(Msg.PROTOCOL, PROTOCOL_AGL), PROTOCOL_DELTA
+                        )
+                        logger.info(
+                            "Server: Connection Accepted (protocol {})".format(client.protocol)
+                        )
+                        self.send_msg_to_client(client, TCP.COM, Msg.ACCEPT)
+                        self.send_msg_to_client(client, TCP.MAP, self.map_name)
+                        logger.info("Sending: NAME: " + self.map_name)
+
+                        client.is_ready = True
+
+                    elif data[Msg.BODY] == Msg.QUIT:
+                        logger.info("Server: Client quitted")
+                        self.send_msg_to_client(
+                            client, TCP.COM, "Server: Connection Closed"
+                        )
+                        return
+                    else:
+                        # Close connection
+                        logger.info("Socket closed, closing connection.")
+                        return
+
+                elif data[Msg.TYPE] == TCP.MAP:
+                    logger.info("Server: Client requested mapname")
+                    self.send_msg_to_client(client, TCP.MAP, self.map_name)
+                    client.is_ready = True
+        except asyncio.IncompleteReadError:
+            logger.info("Render client closed the connection.")
+        except ConnectionError as e:
+            logger.info("Render connection lost: {}".format(e))
 
     def send_msg_to_render_engine(self, task, msg_type, msg):
-        writer = None
-        for k, v in self.clients.items():
-            if k == task:
-                writer = v[1]
-                break
-        if writer is None:
+        client = self.clients.get(task)
+        if client is None:
             logger.info("Connection for {task} not found".format(task=task))
             return
+        self.send_msg_to_client(client, msg_type, msg)
 
+    def send_agl_to_ready_render_engines(self, agl):
+        """
+        Sends a TCP.AGL frame to every ready render client. Clients that
+        negotiated the delta protocol get a keyframe or a delta instead.
+        Every variant is packed only once.
+
+        :return: number of clients the frame was queued to
+        """
+        agl_clients = []
+        delta_clients = []
+        for client in self.clients.values():
+            if client.is_ready:
+                if client.protocol == PROTOCOL_DELTA:
+                    delta_clients.append(client)
+                else:
+                    agl_clients.append(client)
+
+        if agl_clients:
+            data = self.pack_msg(TCP.AGL, agl)
+            for client in agl_clients:
+                client.put(data, droppable=True)
+
+        if delta_clients:
+            if any(client.needs_keyframe for client in delta_clients):
+                self.delta_encoder.force_keyframe()
+            msg_type, body = self.delta_encoder.encode(agl)
+            data = self.pack_msg(msg_type, body)
+            for client in delta_clients:
+                if msg_type == TCP.AGL_KEYFRAME:
+                    client.needs_keyframe = False
+                elif client.needs_keyframe:
+                    continue
+                client.put(data, droppable=True)
+
+        return len(agl_clients) + len(delta_clients)
+
+    @staticmethod
+    def pack_msg(msg_type, msg):
+        """Serializes a message into a length-prefixed msgpack buffer."""
         msg_to_send = msgpack.packb(
             {Msg.TYPE: msg_type, Msg.BODY: msg}, use_bin_type=True
         )
-        size_of_package = len(msg_to_send)
+        return struct.pack(">I", len(msg_to_send)) + msg_to_send
 
+    @staticmethod
+    def send_msg_to_client(client, msg_type, msg):
         try:
-            msg = struct.pack(">I", size_of_package) + msg_to_send
-            writer.write(msg)
+            client.put(
+                Server.pack_msg(msg_type, msg),
+                droppable=msg_type in (TCP.AGL, TCP.AGL_KEYFRAME, TCP.AGL_DELTA),
+            )
         except Exception as e:
             logger.error("EXCEPTION IN SENDMSGTORE: {}".format(e))
+
+
+def _int16(value, scale):
+    return max(INT16_MIN, min(INT16_MAX, int(round(float(value) * scale))))
+
+
+def _uint8(value):
+    return max(0, min(255, int(value)))
+
+
+def quantize_agent(index, agent):
+    """Converts an agent of a TCP.AGL frame into a flat list of small ints."""
+    return (
+        [
+            index,
+            _uint8(agent[Msg.CONTENT_HEALTH]),
+            _uint8(agent[Msg.CONTENT_AMMO]),
+            1 if agent[Msg.CONTENT_CARRYINGFLAG] else 0,
+        ]
+        + [_int16(v, POSITION_SCALE) for v in agent[Msg.CONTENT_POSITION]]
+        + [_int16(v, VECTOR_SCALE) for v in agent[Msg.CONTENT_VELOCITY]]
+        + [_int16(v, VECTOR_SCALE) for v in agent[Msg.CONTENT_HEADING]]
+    )
+
+
+def quantize_pack(pack):
+    return [pack[Msg.CONTENT_NAME], pack[Msg.CONTENT_TYPE]] + [
+        _int16(v, POSITION_SCALE) for v in pack[Msg.CONTENT_POSITION]
+    ]
+
+
+class DeltaEncoder(object):
+    """
+    Encodes TCP.AGL frames as keyframes (agent table plus every agent record)
+    and deltas (only the records of agents whose quantized state changed).
+    Agents are referenced by their index in the agent table.
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.frame = 0
+        self.last_keyframe = 0
+        self.indices = {}
+        self.agents_info = []
+        self.records = {}
+        self.packs = None
+        self.keyframe_requested = True
+
+    def force_keyframe(self):
+        self.keyframe_requested = True
+
+    def encode(self, agl):
+        """
+        :param agl: the body of a TCP.AGL frame
+        :return: tuple (TCP.AGL_KEYFRAME or TCP.AGL_DELTA, body)
+        """
+        self.frame += 1
+        records = {}
+        for agent in agl[Msg.AGENTS]:
+            name = agent[Msg.CONTENT_NAME]
+            if name not in self.indices:
+                self.indices[name] = len(self.agents_info)
+                self.agents_info.append(
+                    [name, agent[Msg.CONTENT_TYPE], agent[Msg.CONTENT_TEAM]]
+                )
+                self.keyframe_requested = True
+            index = self.indices[name]
+            records[index] = quantize_agent(index, agent)
+        packs = [quantize_pack(pack) for pack in agl[Msg.PACKS]]
+
+        if (
+            self.keyframe_requested
+            or self.frame - self.last_keyframe >= self.keyframe_interval
+        ):
+            msg_type = TCP.AGL_KEYFRAME
+            body = {
+                Msg.FRAME: self.frame,
+                Msg.AGENTS_INFO: self.agents_info,
+                Msg.AGENTS: [v for record in records.values() for v in record],
+                Msg.PACKS: packs,
+            }
+            self.last_keyframe = self.frame
+            self.keyframe_requested = False
+        else:
+            msg_type = TCP.AGL_DELTA
+            body = {
+                Msg.FRAME: self.frame,
+                Msg.AGENTS: [
+                    v
+                    for index, record in records.items()
+                    if self.records.get(index) != record
+                    for v in record
+                ],
+            }
+            if packs != self.packs:
+                body[Msg.PACKS] = packs
+
+        self.records = records
+        self.packs = packs
+        return msg_type, body
+
+
+class DeltaDecoder(object):
+    """
+    Rebuilds the agents and packs of TCP.AGL frames from keyframes and deltas.
+    Deltas received out of sequence are ignored until the next keyframe.
+    """
+
+    def __init__(self):
+        self.frame = None
+        self.agents_info = []
+        self.agents = {}
+        self.packs = {}
+
+    def decode(self, msg_type, body):
+        """
+        :return: True if the frame was applied
+        """
+        if msg_type == TCP.AGL_KEYFRAME:
+            self.agents_info = body[Msg.AGENTS_INFO]
+            self.agents = {}
+        elif self.frame is None or body[Msg.FRAME] != self.frame + 1:
+            return False
+
+        self.frame = body[Msg.FRAME]
+        records = body[Msg.AGENTS]
+        for i in range(0, len(records), RECORD_SIZE):
+            self._apply_record(records[i: i + RECORD_SIZE])
+        if Msg.PACKS in body:
+            self.packs = {}
+            for pack in body[Msg.PACKS]:
+                self.packs[pack[0]] = {
+                    Msg.CONTENT_NAME: pack[0],
+                    Msg.CONTENT_TYPE: pack[1],
+                    Msg.CONTENT_POSITION: [v / POSITION_SCALE for v in pack[2:5]],
+                }
+        return True
+
+    def _apply_record(self, record):
+        name, type_, team = self.agents_info[record[0]]
+        self.agents[name] = {
+            Msg.CONTENT_NAME: name,
+            Msg.CONTENT_TYPE: type_,
+            Msg.CONTENT_TEAM: team,
+            Msg.CONTENT_HEALTH: record[1],
+            Msg.CONTENT_AMMO: record[2],
+            Msg.CONTENT_CARRYINGFLAG: bool(record[3]),
+            Msg.CONTENT_POSITION: [v / POSITION_SCALE for v in record[4:7]],
+            Msg.CONTENT_VELOCITY: [v / VECTOR_SCALE for v in record[7:10]],
+            Msg.CONTENT_HEADING: [v / VECTOR_SCALE for v in record[10:13]],
+        }
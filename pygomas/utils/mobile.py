@@ -7,6 +7,20 @@ MAP_SCALE = 1
 
 
 class Mobile(object):
+    __slots__ = (
+        "position",
+        "destination",
+        "velocity",
+        "heading",
+        "view_radius",
+        "angle",
+        "min_x",
+        "min_z",
+        "max_x",
+        "max_z",
+        "velocity_value",
+    )
+
     def __init__(self, velocity_value=2):
         self.position = Vector3D()
         self.destination = Vector3D()
@@ -24,11 +38,11 @@ class Mobile(object):
         self.max_z = (max_z * MAP_SCALE) - MAP_SCALE
 
     def calculate_position(self, dt):
-        position = Vector3D()
-        position.x = self.position.x + (self.velocity.x * dt)
-        position.y = self.position.y + (self.velocity.y * dt)  # + (0.5f * t2)
-        position.z = self.position.z + (self.velocity.z * dt)
-        return position
+        return Vector3D.from_xyz(
+            self.position.x + (self.velocity.x * dt),
+            self.position.y + (self.velocity.y * dt),  # + (0.5f * t2)
+            self.position.z + (self.velocity.z * dt),
+        )
 
     def calculate_new_orientation(self, destination):
         dx = float(destination.x - self.position.x)
@@ -54,9 +68,9 @@ class Mobile(object):
         self.velocity.y *= self.velocity_value
         self.velocity.z *= self.velocity_value
 
-    def calculate_new_destination(self, radius_x, radius_y):
-        x = self.position.x + ((random.random() * (radius_x * 2)) - radius_x)
-        z = self.position.z + ((random.random() * (radius_y * 2)) - radius_y)
+    def calculate_new_destination(self, radius_x, radius_y, rng=random):
+        x = self.position.x + ((rng.random() * (radius_x * 2)) - radius_x)
+        z = self.position.z + ((rng.random() * (radius_y * 2)) - radius_y)
 
         x = min(x, self.min_x)
         x = max(x, self.max_x)
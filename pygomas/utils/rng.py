@@ -0,0 +1,15 @@
+import random
+
+
+def create_rng(seed, name):
+    """
+    Creates the random stream of an agent.
+
+    :param seed: the seed of the match, or None for a non reproducible match
+    :param name: the name of the agent owning the stream
+    :return: a random.Random seeded with seed and name, or the
+             random module itself if seed is None
+    """
+    if seed is None:
+        return random
+    return random.Random("{}:{}".format(seed, name))
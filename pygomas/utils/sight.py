@@ -1,3 +1,7 @@
+import math
+
+from loguru import logger
+
 from .vector import Vector3D
 
 
@@ -28,3 +32,131 @@ class Sight(object):
 
     def get_position(self):
         return self.position
+
+
+def intersect_with_walls(terrain_map, origin, vector, distance=1e10):
+    """
+    Walks the line from origin along vector through the terrain map
+    :param terrain_map: the TerrainMap
+    :param origin: start of the line
+    :param vector: direction of the line
+    :param distance: stop walking after this distance
+    :return: distance to the first wall (or beyond distance), 0.0 if it does not intersect
+    """
+
+    try:
+
+        if vector.length() == 0:
+            return 0.0
+
+        step = Vector3D.from_xyz(vector.x, vector.y, vector.z)
+        step.normalize()
+        inc = 0
+        sgn = 1.0
+        e = 0.0
+
+        if abs(step.x) > abs(step.z):
+
+            if step.z < 0:
+                sgn = -1
+
+            step.x /= abs(step.x)
+            step.z /= abs(step.x)
+        else:
+
+            if step.x < 0:
+                sgn = -1
+
+            inc = 1
+            step.x /= abs(step.z)
+            step.z /= abs(step.z)
+
+        error = Vector3D.from_xyz(0.0, 0.0, 0.0)
+        point = Vector3D.from_xyz(origin.x, origin.y, origin.z)
+
+        while True:
+
+            if inc == 0:
+
+                if e + abs(step.z) + 0.5 >= 1:
+                    point.z += sgn
+                    e -= 1
+
+                e += abs(step.z)
+                point.x += step.x
+            else:
+
+                if e + abs(step.x) + 0.5 >= 1:
+                    point.x += sgn
+                    e -= 1
+
+                e += abs(step.x)
+                point.z += step.z
+
+            if not terrain_map.can_walk(
+                    int(math.floor(point.x)), int(math.floor(point.z))
+            ):
+                return error.length()
+
+            if point.x < 0 or point.y < 0 or point.z < 0:
+                break
+            if point.x >= (terrain_map.get_size_x()) or point.z >= (
+                    terrain_map.get_size_z()
+            ):
+                break
+            error.add(step)
+            if error.length() > distance:
+                return error.length()
+    except Exception as e:
+        logger.error(
+            "INTERSECT FAILED: (origin: {}) (vector: {}): {}".format(
+                origin, vector, e
+            )
+        )
+
+    return 0.0
+
+
+def field_of_view(terrain_map, position, heading, view_radius, dot_angle, targets):
+    """
+    Finds the targets in the field of view of a viewer
+    :param terrain_map: the TerrainMap
+    :param position: position of the viewer
+    :param heading: heading of the viewer
+    :param view_radius: max distance the viewer can see
+    :param dot_angle: half of the aperture (radians) of the viewer
+    :param targets: iterable of (key, position) tuples
+    :return: list of (key, distance, angle) tuples of the targets in sight
+    """
+    in_sight = []
+    if heading.length() == 0:
+        return in_sight
+
+    # Scratch vector reused for every pair
+    v = Vector3D.from_xyz(0.0, 0.0, 0.0)
+
+    for key, target_position in targets:
+        v.set_sub(target_position, position)
+
+        distance = v.length()
+
+        # check distance
+        # get distance to the closest wall
+        distance_terrain = intersect_with_walls(terrain_map, position, v)
+
+        if distance < view_radius and distance < distance_terrain:
+
+            # check angle
+            angle = heading.dot(v)
+            try:
+                angle /= heading.length() * v.length()
+            except ZeroDivisionError:
+                angle = 0
+
+            if angle >= 0:
+                angle = min(1, angle)
+                angle = math.acos(angle)
+                if angle <= dot_angle:
+                    in_sight.append((key, distance, angle))
+
+    return in_sight
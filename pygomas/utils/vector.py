@@ -1,7 +1,92 @@
 import math
 
+import numpy as np
+
 
 class Vector3D(object):
+    __slots__ = ("x", "y", "z")
+
+    # Fast constructor, skips the argument checks of __init__
+    @classmethod
+    def from_xyz(cls, x, y, z):
+        v = cls.__new__(cls)
+        v.x = x
+        v.y = y
+        v.z = z
+        return v
+
+    @classmethod
+    def from_tuple(cls, t):
+        return cls.from_xyz(t[0], t[1], t[2])
+
+    @classmethod
+    def from_array(cls, a):
+        return cls.from_xyz(float(a[0]), float(a[1]), float(a[2]))
+
+    def to_tuple(self):
+        return self.x, self.y, self.z
+
+    def to_array(self):
+        return np.array((self.x, self.y, self.z), dtype=float)
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+        yield self.z
+
+    # In-place assignment
+    def set(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+        return self
+
+    def copy_from(self, v):
+        self.x = v.x
+        self.y = v.y
+        self.z = v.z
+        return self
+
+    # In-place self = a - b
+    def set_sub(self, a, b):
+        self.x = a.x - b.x
+        self.y = a.y - b.y
+        self.z = a.z - b.z
+        return self
+
+    # In-place self += v * s
+    def add_scaled(self, v, s):
+        self.x += v.x * s
+        self.y += v.y * s
+        self.z += v.z * s
+        return self
+
+    def scale(self, s):
+        self.x *= s
+        self.y *= s
+        self.z *= s
+        return self
+
+    def distance_sq(self, v):
+        dx = self.x - v.x
+        dy = self.y - v.y
+        dz = self.z - v.z
+        return dx * dx + dy * dy + dz * dz
+
+    def distance(self, v):
+        return math.sqrt(self.distance_sq(v))
+
+    def __iadd__(self, v):
+        self.add(v)
+        return self
+
+    def __isub__(self, v):
+        self.sub(v)
+        return self
+
+    def __imul__(self, s):
+        return self.scale(s)
+
     # Vector length
     def length(self):
         return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
@@ -36,11 +121,11 @@ class Vector3D(object):
 
     # Cross product
     def cross(self, v):
-        u = Vector3D()
-        u.x = self.y * v.z - self.z * v.y
-        u.y = self.z * v.x - self.x * v.z
-        u.z = self.x * v.y - self.y * v.x
-        return u
+        return Vector3D.from_xyz(
+            self.y * v.z - self.z * v.y,
+            self.z * v.x - self.x * v.z,
+            self.x * v.y - self.y * v.x,
+        )
 
     def __eq__(self, other):
         if self.x == other.x and self.y == other.y and self.z == other.z:
@@ -58,25 +143,13 @@ class Vector3D(object):
         return "<" + str(self.x) + "," + str(self.y) + "," + str(self.z) + ">"
 
     def __init__(self, v=None, x=None, y=None, z=None):
-        if v is None and not x and not y and not z:
-            # New vector
-            self.x = self.y = self.z = 0.0
-        elif v is not None:
+        if v is not None:
             # From another vector
             self.x = v.x
             self.y = v.y
             self.z = v.z
-        elif x or y or z:
-            # By coordinates
-            if x:
-                self.x = x
-            else:
-                self.x = 0.0
-            if y:
-                self.y = y
-            else:
-                self.y = 0.0
-            if z:
-                self.z = z
-            else:
-                self.z = 0.0
+        else:
+            # By coordinates (missing or falsy coordinates become 0.0)
+            self.x = x if x else 0.0
+            self.y = y if y else 0.0
+            self.z = z if z else 0.0
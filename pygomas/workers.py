@@ -0,0 +1,113 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from pygomas.config import Config, MIN_HEALTH
+from pygomas.map import TerrainMap
+from pygomas.utils.sight import field_of_view
+from pygomas.utils.vector import Vector3D
+from pygomas.world import WorldStore
+
+# State of each worker process: the terrain map and the attached world
+_worker = {}
+
+
+def _init_worker(map_name, data_path):
+    terrain_map = TerrainMap()
+    terrain_map.load_map(map_name, Config(data_path=data_path))
+    _worker["map"] = terrain_map
+    _worker["world"] = None
+
+
+def _get_world(shm_name, capacity, size):
+    world = _worker["world"]
+    if world is None or world.shm_name != shm_name:
+        # The manager grew the store into a new block
+        if world is not None:
+            world.close(unlink=False)
+        world = WorldStore.attach(shm_name, capacity, size)
+        _worker["world"] = world
+    world.size = size
+    return world
+
+
+def field_of_view_job(shm_name, capacity, size, viewers, objects):
+    """
+    Computes the field of view of a range of agents in a worker process
+    :param shm_name: name of the shared memory block of the WorldStore
+    :param capacity: capacity of the WorldStore
+    :param size: number of used slots of the WorldStore
+    :param viewers: list of (slot, view_radius, angle) tuples
+    :param objects: list of (x, y, z) positions of the packs
+    :return: list with the (key, distance, angle) tuples seen by each viewer.
+             key is the slot of an agent or -(i + 1) for the i-th pack.
+    """
+    world = _get_world(shm_name, capacity, size)
+    positions = [Vector3D.from_array(p) for p in world.position[:size]]
+    visible = np.flatnonzero(world.health[:size] > MIN_HEALTH).tolist()
+    packs = [(-(i + 1), Vector3D.from_tuple(p)) for i, p in enumerate(objects)]
+
+    results = []
+    for slot, view_radius, angle in viewers:
+        targets = [(target, positions[target]) for target in visible if target != slot]
+        results.append(
+            field_of_view(
+                _worker["map"],
+                positions[slot],
+                Vector3D.from_array(world.heading[slot]),
+                view_radius,
+                angle,
+                targets + packs,
+            )
+        )
+    return results
+
+
+class WorkerPool:
+    """
+    Pool of processes computing the field of view of the agents in parallel.
+    The agents are read from a shared WorldStore and partitioned into one
+    contiguous range of slots per worker.
+    """
+
+    def __init__(self, workers, map_name, data_path):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(map_name, data_path),
+        )
+
+    async def fields_of_view(self, world, viewers, objects):
+        """
+        :param world: the shared WorldStore
+        :param viewers: list of (slot, view_radius, angle) tuples
+        :param objects: list of (x, y, z) positions of the packs
+        :return: list with the (key, distance, angle) tuples seen by each viewer
+        """
+        if not viewers:
+            return []
+        loop = asyncio.get_running_loop()
+        chunk = -(-len(viewers) // self.workers)
+        futures = [
+            loop.run_in_executor(
+                self.executor,
+                field_of_view_job,
+                world.shm_name,
+                world.capacity,
+                world.size,
+                viewers[i: i + chunk],
+                objects,
+            )
+            for i in range(0, len(viewers), chunk)
+        ]
+        results = []
+        for partial in await asyncio.gather(*futures):
+            results.extend(partial)
+        return results
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,188 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from pygomas.config import TEAM_NONE
+from pygomas.utils.mobile import Mobile
+from pygomas.utils.vector import Vector3D
+
+DEFAULT_CAPACITY: int = 16
+
+# name, dtype and width of every column. Wider dtypes go first so every
+# column is aligned when they share a single buffer.
+FIELDS = (
+    ("position", np.float64, 3),
+    ("velocity", np.float64, 3),
+    ("heading", np.float64, 3),
+    ("health", np.int64, 1),
+    ("ammo", np.int64, 1),
+    ("team", np.int64, 1),
+    ("type", np.int64, 1),
+    ("alive", np.bool_, 1),
+)
+
+
+def get_buffer_size(capacity):
+    return sum(np.dtype(dtype).itemsize * width * capacity for _, dtype, width in FIELDS)
+
+
+class WorldStore:
+    """
+    Struct-of-arrays storage of the state of every agent in the match.
+    Each agent owns a stable slot (row) in all the arrays, so the manager
+    can operate on all agents at once with numpy.
+
+    If shared is True the arrays live in a multiprocessing shared memory
+    block (see shm_name) that worker processes can attach to.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, shared=False):
+        self.size = 0
+        self.jids = []
+        self.slots = {}
+        self.shared = shared
+        self.shm = None
+        self._allocate(max(1, capacity))
+
+    @classmethod
+    def attach(cls, shm_name, capacity, size):
+        """
+        Attaches to the shared memory block of a WorldStore created in another process.
+        """
+        world = cls.__new__(cls)
+        world.size = size
+        world.jids = []
+        world.slots = {}
+        world.shared = True
+        world.capacity = capacity
+        world.shm = SharedMemory(name=shm_name)
+        world._bind(world.shm.buf)
+        return world
+
+    @property
+    def shm_name(self):
+        return self.shm.name if self.shm is not None else None
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        if self.shared:
+            self.shm = SharedMemory(create=True, size=get_buffer_size(capacity))
+            self._bind(self.shm.buf)
+        else:
+            self._bind(None)
+        self.team[:] = TEAM_NONE
+
+    def _bind(self, buffer):
+        offset = 0
+        for name, dtype, width in FIELDS:
+            shape = (self.capacity, width) if width > 1 else (self.capacity,)
+            if buffer is None:
+                array = np.zeros(shape, dtype=dtype)
+            else:
+                array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            offset += array.nbytes
+            setattr(self, name, array)
+
+    def _grow(self):
+        old = {name: getattr(self, name) for name, _, _ in FIELDS}
+        old_shm = self.shm
+        self._allocate(self.capacity * 2)
+        for name, array in old.items():
+            getattr(self, name)[: len(array)] = array
+        if old_shm is not None:
+            old.clear()
+            old_shm.close()
+            old_shm.unlink()
+
+    def close(self, unlink=True):
+        """
+        Releases the shared memory block (if any). The store can't be used after closing.
+        """
+        if self.shm is None:
+            return
+        for name, _, _ in FIELDS:
+            setattr(self, name, None)
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+        self.shm = None
+
+    def add(self, jid=""):
+        """
+        Reserves a new slot for an agent.
+
+        :param jid: the agent's jid
+        :return: the slot of the agent
+        """
+        if self.size == self.capacity:
+            self._grow()
+        slot = self.size
+        self.size += 1
+        self.jids.append(jid)
+        if jid:
+            self.slots[jid] = slot
+        return slot
+
+    def set_jid(self, slot, jid):
+        if self.jids[slot] in self.slots:
+            del self.slots[self.jids[slot]]
+        self.jids[slot] = jid
+        self.slots[jid] = slot
+
+    def alive_mask(self):
+        """Boolean mask of the agents (of the used slots) with health."""
+        return self.alive[: self.size]
+
+    def is_team_alive(self, team):
+        used = slice(0, self.size)
+        return bool(np.any(self.alive[used] & (self.team[used] == team)))
+
+
+class VectorView(Vector3D):
+    """A Vector3D whose coordinates live in a row of a WorldStore array."""
+
+    __slots__ = ("_world", "_field", "_slot")
+
+    def __init__(self, world, field, slot):
+        self._world = world
+        self._field = field
+        self._slot = slot
+
+    def _row(self):
+        return getattr(self._world, self._field)[self._slot]
+
+    @property
+    def x(self):
+        return float(self._row()[0])
+
+    @x.setter
+    def x(self, value):
+        self._row()[0] = value
+
+    @property
+    def y(self):
+        return float(self._row()[1])
+
+    @y.setter
+    def y(self, value):
+        self._row()[1] = value
+
+    @property
+    def z(self):
+        return float(self._row()[2])
+
+    @z.setter
+    def z(self, value):
+        self._row()[2] = value
+
+
+class MobileView(Mobile):
+    """A Mobile whose position, velocity and heading live in a WorldStore."""
+
+    __slots__ = ()
+
+    def __init__(self, world, slot):
+        super().__init__()
+        self.position = VectorView(world, "position", slot)
+        self.velocity = VectorView(world, "velocity", slot)
+        self.heading = VectorView(world, "heading", slot)
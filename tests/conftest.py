@@ -0,0 +1,14 @@
+from pygomas.manager import MicroAgent
+
+
+def create_agent(world, jid, team, x, z, heading_x=1.0, heading_z=0.0, health=100):
+    """Creates an updated MicroAgent in a slot of world, at (x, 0, z)."""
+    agent = MicroAgent(world, jid)
+    agent.team = team
+    agent.health = health
+    agent.is_updated = True
+    agent.locate.position.x = x
+    agent.locate.position.z = z
+    agent.locate.heading.x = heading_x
+    agent.locate.heading.z = heading_z
+    return agent
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from pygomas.agents.asl import compile_asl, parse_asl
+from pygomas.agents.bdisoldier import BDISoldier
+from pygomas.config import TEAM_ALLIED
+from pygomas.ontology import Service
+
+ASL_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "pygomas", "ASL", "bdisoldier.asl")
+
+PROGRAM = """
+ready.
+!start.
++!start: ready <- .register_service("sniper").
+"""
+
+
+class TestAsl(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".asl")
+        with os.fdopen(fd, "w") as f:
+            f.write(PROGRAM)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def create_soldiers(self, asl, amount=2):
+        return [
+            BDISoldier(jid="soldier{}@localhost".format(i), passwd="secret", asl=asl, team=TEAM_ALLIED)
+            for i in range(amount)
+        ]
+
+    def test_asl_is_parsed_once_per_version(self):
+        ast_agent = parse_asl(self.path)
+        self.assertIs(parse_asl(self.path), ast_agent)
+
+        os.utime(self.path, ns=(0, 0))
+        self.assertIsNot(parse_asl(self.path), ast_agent)
+        with self.assertRaises(FileNotFoundError):
+            parse_asl("missing.asl")
+
+    def test_troops_share_the_compiled_asl(self):
+        soldiers = self.create_soldiers(ASL_PATH)
+        program = compile_asl(ASL_PATH, soldiers[0].bdi_actions, kind=BDISoldier)
+        self.assertIsNot(soldiers[0].bdi_agent, soldiers[1].bdi_agent)
+        self.assertEqual(str(soldiers[0].bdi_agent.name), "soldier0@localhost")
+        for key, plans in program.prototype.plans.items():
+            self.assertEqual(soldiers[1].bdi_agent.plans[key], plans)
+        self.assertEqual(soldiers[0].get_services_to_register(), [Service.BACKUP, "allied"])
+
+    def test_shared_asl_runs_the_actions_of_each_troop(self):
+        soldiers = self.create_soldiers(self.path)
+        behaviours = [len(soldier.behaviours) for soldier in soldiers]
+
+        for _ in range(3):
+            soldiers[0].bdi_agent.step()
+
+        self.assertIn(("ready", 0), soldiers[0].bdi_agent.beliefs)
+        self.assertEqual(len(soldiers[0].behaviours), behaviours[0] + 1)
+        self.assertEqual(len(soldiers[1].behaviours), behaviours[1])
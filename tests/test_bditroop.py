@@ -0,0 +1,97 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+import agentspeak as asp
+from agentspeak.runtime import Intention
+
+from pygomas.agents.bdisoldier import BDISoldier
+from pygomas.config import TEAM_ALLIED
+from pygomas.ontology import Belief
+from pygomas.utils.vector import Vector3D
+
+ASL_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "pygomas", "ASL", "bdisoldier.asl")
+
+
+class TestBeliefBuffer(unittest.TestCase):
+    def setUp(self):
+        self.troop = BDISoldier(
+            jid="soldier@localhost", passwd="secret", asl=ASL_PATH, team=TEAM_ALLIED, position_epsilon=1.0
+        )
+        self.set_belief = mock.patch.object(self.troop.bdi, "set_belief").start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def written(self, belief):
+        return [c.args[1] for c in self.set_belief.call_args_list if c.args[0] == belief]
+
+    def test_only_last_value_of_a_tick_is_written(self):
+        self.troop.buffer_belief(Belief.POSITION, Vector3D(x=1, y=0, z=1))
+        self.troop.buffer_belief(Belief.POSITION, Vector3D(x=2, y=0, z=2))
+        self.troop.flush_beliefs()
+        self.assertEqual(self.written(Belief.POSITION), [(2, 0, 2)])
+
+    def test_small_moves_are_suppressed(self):
+        for x in (10, 10.3, 10.6, 11.2):
+            self.troop.buffer_belief(Belief.POSITION, Vector3D(x=x, y=0, z=0))
+            self.troop.flush_beliefs()
+        self.assertEqual(self.written(Belief.POSITION), [(10, 0, 0), (11.2, 0, 0)])
+
+    def test_forced_flush_is_always_written(self):
+        self.troop.buffer_belief(Belief.POSITION, Vector3D(x=10, y=0, z=0))
+        self.troop.flush_beliefs()
+        self.troop.buffer_belief(Belief.POSITION, Vector3D(x=10.1, y=0, z=0), force=True)
+        self.troop.flush_beliefs()
+        # Next moves are measured from the forced position
+        self.troop.buffer_belief(Belief.POSITION, Vector3D(x=10.9, y=0, z=0))
+        self.troop.flush_beliefs()
+        self.assertEqual(self.written(Belief.POSITION), [(10, 0, 0), (10.1, 0, 0)])
+
+    def test_unchanged_values_are_not_rewritten(self):
+        for _ in range(3):
+            self.troop.buffer_belief(Belief.VELOCITY, Vector3D(x=1, y=0, z=0))
+            self.troop.flush_beliefs()
+        self.assertEqual(self.written(Belief.VELOCITY), [(1, 0, 0)])
+
+    def test_actions_write_through_the_buffer(self):
+        self.troop.movement.heading = Vector3D(x=1, y=0, z=0)
+        turn = self.troop.bdi_actions.lookup(".turn", 1)
+        list(turn(None, asp.Literal(".turn", (0.0,)), Intention()))
+        list(turn(None, asp.Literal(".turn", (0.0,)), Intention()))
+        self.assertEqual(len(self.written(Belief.HEADING)), 1)
+        self.assertIn(Belief.HEADING, self.troop.flushed_beliefs)
+
+    def test_position_settles_when_the_troop_halts_within_epsilon(self):
+        self.troop.movement.position = Vector3D(x=10, y=0, z=0)
+        self.troop.settle_position()
+        self.troop.flush_beliefs()
+        self.troop.movement.position = Vector3D(x=10.3, y=0, z=0)
+        self.troop.buffer_belief(Belief.POSITION, self.troop.movement.position)
+        self.troop.flush_beliefs()
+        self.assertEqual(self.written(Belief.POSITION), [(10, 0, 0)])
+
+        stop = self.troop.bdi_actions.lookup(".stop", 0)
+        list(stop(None, asp.Literal(".stop"), Intention()))
+        behaviour = self.troop.MoveBehaviour(period=1)
+        behaviour.set_agent(self.troop)
+        for _ in range(2):
+            asyncio.run(behaviour.run())
+        self.assertEqual(self.written(Belief.POSITION), [(10, 0, 0), (10.3, 0, 0)])
+
+
+class TestDataBehaviours(unittest.TestCase):
+    def test_switches_to_pipelined_data(self):
+        troop = BDISoldier(jid="soldier@localhost", passwd="secret", asl=ASL_PATH, team=TEAM_ALLIED)
+        troop.add_data_behaviours()
+        self.assertIsInstance(troop.data_behaviour, BDISoldier.DataFromTroopBehaviour)
+
+        troop.use_pipelined_data()
+        troop.use_pipelined_data()
+
+        kinds = [type(b) for b in troop.behaviours]
+        self.assertTrue(troop.pipelined)
+        self.assertNotIn(BDISoldier.DataFromTroopBehaviour, kinds)
+        self.assertEqual(kinds.count(BDISoldier.PipelinedDataBehaviour), 1)
+        self.assertEqual(kinds.count(BDISoldier.DataResponderBehaviour), 1)
@@ -0,0 +1,35 @@
+import unittest
+
+from pygomas.cli import get_troop_jobs, partition_troops
+from pygomas.config import TEAM_ALLIED, TEAM_AXIS
+
+CONFIG = {
+    "axis": [
+        {"rank": "BDISoldier", "name": "soldier_axis", "password": "secret", "amount": 4},
+        {"rank": "BDIMedic", "password": "secret", "amount": 2},
+    ],
+    "allied": [
+        {"rank": "BDISoldier", "name": "soldier_allied", "password": "secret", "amount": 3},
+        {"rank": "BDIFieldOp", "name": "fieldops_allied", "password": "secret"},
+    ],
+}
+
+
+class TestRunWorkers(unittest.TestCase):
+    def test_troop_jobs(self):
+        jobs = get_troop_jobs(CONFIG)
+        self.assertEqual(len(jobs), 10)
+        self.assertEqual([job[2] for job in jobs[:4]], [0, 1, 2, 3])
+        self.assertEqual({job[0] for job in jobs[:6]}, {TEAM_AXIS})
+        self.assertEqual({job[0] for job in jobs[6:]}, {TEAM_ALLIED})
+        # Unnamed troops get the same name in all the jobs
+        self.assertEqual(jobs[4][1]["name"], jobs[5][1]["name"])
+
+    def test_partition_balances_ranks(self):
+        partitions = partition_troops(get_troop_jobs(CONFIG), 3)
+        self.assertEqual([len(partition) for partition in partitions], [4, 3, 3])
+        for partition in partitions:
+            soldiers = [job for job in partition if job[1]["rank"] == "BDISoldier"]
+            self.assertIn(len(soldiers), (2, 3))
+
+        self.assertEqual(len(partition_troops(get_troop_jobs(CONFIG), 20)), 10)
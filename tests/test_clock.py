@@ -0,0 +1,27 @@
+import asyncio
+import datetime
+import time
+import unittest
+
+from pygomas.clock import Clock
+from pygomas.manager import Manager
+
+
+class TestClock(unittest.TestCase):
+    def test_game_time_runs_faster(self):
+        clock = Clock(speed=10)
+        self.assertAlmostEqual(clock.time() / 10, time.time(), delta=1)
+        self.assertEqual(clock.period(5), 0.5)
+        self.assertLess(clock.after(60), datetime.datetime.now() + datetime.timedelta(seconds=7))
+
+        start = time.monotonic()
+        asyncio.run(clock.sleep(1))
+        self.assertLess(time.monotonic() - start, 0.5)
+
+        with self.assertRaises(ValueError):
+            Clock(speed=0)
+
+    def test_manager_uses_its_clock(self):
+        manager = Manager(speed=20)
+        self.assertEqual(manager.clock.speed, 20)
+        self.assertEqual(manager.clock.period(manager.match_time), manager.match_time / 20)
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import math
+import unittest
+from unittest import mock
+
+from pygomas.config import Config, TEAM_AXIS
+from pygomas.loadgen import MAX_PENDING, PATROL_RADIUS, PATTERNS, FakeTroop, LoadStats
+from pygomas.manager import Manager, MicroAgent
+from pygomas.ontology import Action, Belief, Performative
+from spade.message import Message
+
+
+class TestLoadgen(unittest.TestCase):
+    def create_troop(self, pattern):
+        troop = FakeTroop("loadgen_0@localhost", "secret", "cmanager@localhost", LoadStats(), pattern=pattern, seed=1)
+        troop.origin = troop.position = (100.0, 50.0)
+        troop.match_start = 0.0
+        return troop
+
+    def test_patterns_stay_around_the_base(self):
+        for pattern in PATTERNS:
+            troop = self.create_troop(pattern)
+            for step in range(100):
+                troop.move(step * 0.05)
+                distance = math.hypot(troop.position[0] - 100.0, troop.position[1] - 50.0)
+                self.assertLessEqual(distance, PATROL_RADIUS * math.sqrt(2) + 1e-9, pattern)
+
+    def test_manager_replies_to_fake_data(self):
+        manager = Manager(players=1)
+        manager.map.load_map("map_01", Config())
+        agent = MicroAgent(manager.world, "loadgen_0@localhost")
+        agent.team = TEAM_AXIS
+        manager.agents[agent.jid] = agent
+
+        troop = self.create_troop("circle")
+        troop.move(1.0)
+        behaviour = mock.Mock()
+        behaviour.send = mock.AsyncMock()
+        content = troop.get_data_content()
+        content[Action.SEQUENCE] = troop.data_sent(1.0)
+        asyncio.run(manager.handle_data(behaviour, content))
+
+        self.assertEqual(int(agent.locate.position.x), int(troop.position[0]))
+        self.assertEqual(behaviour.send.await_count, 1)
+        reply = json.loads(behaviour.send.await_args.args[0].body)
+        self.assertEqual(reply[Action.SEQUENCE], content[Action.SEQUENCE])
+
+    def test_fake_packs_are_picked_up(self):
+        manager = Manager(players=1)
+        manager.map.load_map("map_01", Config())
+        agent = MicroAgent(manager.world, "loadgen_0@localhost")
+        agent.team = TEAM_AXIS
+        manager.agents[agent.jid] = agent
+        troop = self.create_troop("static")
+        behaviour = mock.Mock()
+        behaviour.send = mock.AsyncMock()
+
+        for _ in range(2):
+            manager.handle_pack(Message(sender=str(troop.jid), body=json.dumps(troop.get_pack_content())))
+        self.assertEqual(len(manager.din_objects), 1)
+
+        asyncio.run(manager.handle_data(behaviour, troop.get_data_content()))
+        self.assertEqual(manager.din_objects, {})
+        taken = [m for (m,), _ in behaviour.send.await_args_list
+                 if m.get_metadata(str(Performative.PERFORMATIVE)) == str(Belief.PACK_TAKEN)]
+        self.assertEqual([str(m.to) for m in taken], [str(troop.jid)])
+
+    def test_replies_are_matched_by_sequence(self):
+        troop = self.create_troop("static")
+        sequences = [troop.data_sent(t) for t in (0.0, 1.0, 2.0, 3.0)]
+
+        # The first DATA is answered, the second one is coalesced with the third
+        troop.data_replied(sequences[0], 0.5)
+        troop.data_replied(sequences[2], 2.25)
+        # Unknown or late replies are ignored
+        troop.data_replied(sequences[1], 2.5)
+        troop.data_replied(None, 2.5)
+
+        self.assertEqual(troop.stats.latencies, [0.5, 0.25])
+        self.assertEqual(troop.stats.data_unanswered, 1)
+        self.assertEqual(list(troop.pending), [sequences[3]])
+
+    def test_pending_data_is_bounded(self):
+        troop = self.create_troop("static")
+        for t in range(MAX_PENDING + 10):
+            troop.data_sent(float(t))
+
+        self.assertEqual(len(troop.pending), MAX_PENDING)
+        self.assertEqual(troop.stats.data_unanswered, 10)
+        self.assertEqual(troop.stats.data_sent, MAX_PENDING + 10)
+
+    def test_summary(self):
+        stats = LoadStats()
+        stats.start()
+        stats.data_sent = 4
+        stats.latencies = [0.001, 0.002, 0.003, 0.010]
+
+        summary = stats.get_summary(offered_rate=40.0)
+        self.assertEqual(summary["data_replies"], 4)
+        self.assertAlmostEqual(summary["max"], 10.0)
+        self.assertLessEqual(summary["p50"], summary["p90"])
+        self.assertNotIn("p50", LoadStats().get_summary(offered_rate=0))
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from pygomas.config import Config, TEAM_ALLIED, TEAM_AXIS
+from pygomas.manager import Manager, MicroAgent
+from pygomas.ontology import Action, Belief, Performative
+from pygomas.utils.vector import Vector3D
+from spade.message import Message
+
+from conftest import create_agent
+
+
+class TestManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = Manager(players=3)
+        self.manager.map.load_map("map_01", Config())
+        for agent in [
+            create_agent(self.manager.world, "allied1@localhost", TEAM_ALLIED, 40, 40),
+            create_agent(self.manager.world, "allied2@localhost", TEAM_ALLIED, 40, 60, heading_x=-1.0),
+            create_agent(self.manager.world, "axis1@localhost", TEAM_AXIS, 60, 40),
+        ]:
+            self.manager.agents[agent.jid] = agent
+
+    def test_build_team_snapshot(self):
+        snapshot = self.manager.build_team_snapshot(TEAM_ALLIED)
+
+        self.assertEqual(len(snapshot[Action.ENTRIES]), 1)
+        self.assertEqual(snapshot[Action.ENTRIES][0][0], TEAM_AXIS)
+        self.assertEqual(snapshot[Action.FOV]["allied1@localhost"], 1)
+        self.assertEqual(snapshot[Action.FOV]["allied2@localhost"], 0)
+        self.assertNotIn("axis1@localhost", snapshot[Action.FOV])
+
+    def test_build_team_snapshot_skips_dead_viewers(self):
+        self.manager.agents["allied1@localhost"].health = 0
+        snapshot = self.manager.build_team_snapshot(TEAM_ALLIED)
+
+        self.assertEqual(snapshot[Action.ENTRIES], [])
+        self.assertNotIn("allied1@localhost", snapshot[Action.FOV])
+
+    def test_micro_agents_are_views_of_the_world(self):
+        world = self.manager.world
+        agent = self.manager.agents["allied2@localhost"]
+
+        self.assertEqual(world.slots["allied2@localhost"], agent.slot)
+        self.assertEqual(world.position[agent.slot].tolist(), [40.0, 0.0, 60.0])
+
+        agent.health -= 30
+        agent.locate.position.x = 75
+        self.assertEqual(world.health[agent.slot], 70)
+        self.assertEqual(world.position[agent.slot, 0], 75.0)
+
+        world.ammo[agent.slot] = 12
+        self.assertEqual(agent.ammo, 12)
+
+    def test_world_tracks_alive_teams(self):
+        world = self.manager.world
+        self.assertTrue(world.is_team_alive(TEAM_ALLIED))
+
+        self.manager.agents["allied1@localhost"].health = 0
+        self.manager.agents["allied2@localhost"].health = 0
+        self.assertFalse(world.is_team_alive(TEAM_ALLIED))
+        self.assertTrue(world.is_team_alive(TEAM_AXIS))
+
+    def test_world_grows_keeping_slots(self):
+        world = self.manager.world
+        agent = self.manager.agents["axis1@localhost"]
+        for i in range(world.capacity):
+            MicroAgent(world, "extra{}@localhost".format(i))
+
+        self.assertEqual(agent.locate.position.x, 60.0)
+        self.assertEqual(agent.health, 100)
+        self.assertEqual(world.slots["axis1@localhost"], agent.slot)
+
+    def test_render_clients_are_reported(self):
+        stats = {"peer": ("127.0.0.1", 5000), "sent": 10, "dropped": 2, "pending": 8, "lag": 3.0}
+        self.manager.render_server = mock.Mock()
+        self.manager.render_server.get_client_stats.return_value = [stats]
+        self.manager.launch_render_stats_behaviour()
+        behaviour = self.manager.behaviours[-1]
+        asyncio.run(behaviour.on_start())
+
+        with mock.patch("pygomas.manager.logger") as log:
+            asyncio.run(behaviour.run())
+            self.assertEqual(log.warning.call_count, 1)
+
+            # Caught up, without new drops
+            stats.update(lag=0.0, pending=0)
+            asyncio.run(behaviour.run())
+            self.assertEqual(log.warning.call_count, 1)
+            self.assertEqual(log.info.call_count, 1)
+
+    def test_repeated_init_reuses_the_slot(self):
+        world = self.manager.world
+        agent = self.manager.agents["axis1@localhost"]
+        agent.health = 0
+        size = world.size
+
+        self.assertFalse(self.manager.register_agent("axis1@localhost", 1, TEAM_AXIS))
+        self.assertIs(self.manager.agents["axis1@localhost"], agent)
+        self.assertEqual(world.size, size)
+        self.assertEqual(agent.health, 100)
+
+        self.assertTrue(self.manager.register_agent("axis2@localhost", 1, TEAM_AXIS))
+        self.assertEqual(world.size, size + 1)
+
+    @mock.patch("pygomas.utils.rng.random.random", return_value=1.0)
+    def test_shoot_batch(self, _):
+        victims = self.manager.shoot_batch(
+            [
+                ("allied1@localhost", Vector3D(x=60, z=40)),
+                ("axis1@localhost", Vector3D(x=40, z=40)),
+                ("allied2@localhost", Vector3D(x=40, z=90)),
+                ("unknown@localhost", Vector3D(x=40, z=40)),
+            ]
+        )
+
+        self.assertEqual(
+            [v.jid if v else None for v in victims],
+            ["axis1@localhost", "allied1@localhost", None, None],
+        )
+
+    @mock.patch("pygomas.utils.rng.random.random", return_value=1.0)
+    def test_shoot_hits_closest_alive_agent(self, _):
+        blocker = create_agent(self.manager.world, "axis2@localhost", TEAM_AXIS, 50, 40)
+        self.manager.agents[blocker.jid] = blocker
+        self.assertIs(self.manager.shoot("allied1@localhost", Vector3D(x=60, z=40)), blocker)
+
+        blocker.health = 0
+        victim = self.manager.shoot("allied1@localhost", Vector3D(x=60, z=40))
+        self.assertEqual(victim.jid, "axis1@localhost")
+
+    @mock.patch("pygomas.utils.rng.random.random", return_value=1.0)
+    def test_batch_shots_go_through_agents_killed_in_the_batch(self, _):
+        self.manager.agents["axis1@localhost"].health = 1
+        # Behind axis1 in the line of fire of allied2, not in the one of allied1
+        behind = create_agent(self.manager.world, "axis2@localhost", TEAM_AXIS, 70, 30)
+        self.manager.agents[behind.jid] = behind
+        behaviour = mock.Mock()
+        behaviour.send = mock.AsyncMock()
+        shot = {Belief.NAME: "allied1@localhost", Action.AIM: 0, Action.SHOTS: 1, Action.X: 60, Action.Y: 0, Action.Z: 40}
+        other = dict(shot, **{Belief.NAME: "allied2@localhost"})
+
+        asyncio.run(self.manager.resolve_shots(behaviour, [shot, other]))
+
+        self.assertEqual(self.manager.agents["axis1@localhost"].health, 0)
+        self.assertLess(behind.health, 100)
+        hit = [str(m.to) for (m,), _ in behaviour.send.await_args_list]
+        self.assertEqual(hit.count("axis1@localhost"), 1)
+        self.assertEqual(hit.count("axis2@localhost"), 1)
+
+    def test_seeded_shots_are_reproducible(self):
+        shots = [("allied1@localhost", Vector3D(x=60, z=40)), ("axis1@localhost", Vector3D(x=40, z=40))] * 20
+
+        results = []
+        for _ in range(2):
+            self.manager.seed = 42
+            self.manager.shot_randoms = {}
+            results.append([v.jid if v else None for v in self.manager.shoot_batch(shots)])
+
+        self.assertEqual(results[0], results[1])
+        self.assertIn(None, results[0])
+        self.assertIn("axis1@localhost", results[0])
+
+    @mock.patch("pygomas.utils.rng.random.random", return_value=1.0)
+    def test_batch_shots_merge_damage_per_victim(self, _):
+        self.manager.batch_shots = True
+        self.manager.launch_shoot_responder_behaviour()
+        behaviour = self.manager.behaviours[-1]
+        behaviour.send = mock.AsyncMock()
+
+        for shooter, x in [("allied1@localhost", 60), ("allied1@localhost", 60), ("axis1@localhost", 40)]:
+            msg = Message()
+            msg.set_metadata(str(Performative.PERFORMATIVE), str(Performative.SHOOT))
+            msg.body = json.dumps(
+                {Belief.NAME: shooter, Action.AIM: 0, Action.SHOTS: 3, Action.X: x, Action.Y: 0, Action.Z: 40}
+            )
+            behaviour.queue.put_nowait(msg)
+
+        asyncio.run(behaviour.run())
+
+        self.assertEqual(self.manager.shoot_queue_depth, 3)
+        self.assertEqual(self.manager.agents["axis1@localhost"].health, 94)
+        self.assertEqual(self.manager.agents["allied1@localhost"].health, 97)
+        sent = {str(m.to): json.loads(m.body) for (m,), _ in behaviour.send.await_args_list}
+        self.assertEqual(len(behaviour.send.await_args_list), 2)
+        self.assertEqual(sent["axis1@localhost"][Action.DEC_HEALTH], 6)
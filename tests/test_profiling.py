@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+
+import agentspeak
+from spade.agent import Agent
+from spade.behaviour import CyclicBehaviour
+
+from pygomas.manager import Manager
+from pygomas.profiling import Histogram, Profiler
+
+
+class WaitingBehaviour(CyclicBehaviour):
+    async def run(self):
+        await self.receive(timeout=0.2)
+
+
+class TestProfiling(unittest.TestCase):
+    def test_histogram_percentiles(self):
+        histogram = Histogram()
+        for value in range(1, 10001):
+            histogram.record(value)
+
+        summary = histogram.as_dict()
+        self.assertEqual(summary["count"], 10000)
+        self.assertEqual(summary["min"], 1)
+        self.assertEqual(summary["max"], 10000)
+        self.assertAlmostEqual(summary["mean"], 5000.5)
+        # Values bigger than 127 are rounded to within 1/64
+        self.assertAlmostEqual(summary["p50"], 5000, delta=5000 / 64)
+        self.assertAlmostEqual(summary["p99"], 9900, delta=9900 / 64)
+        self.assertEqual(Histogram().get_percentile(99), 0)
+
+    def test_histogram_buckets_are_monotonic(self):
+        indices = [Histogram.get_index(value) for value in range(100000)]
+        self.assertEqual(indices, sorted(indices))
+        for value in (0, 127, 128, 1000, 99999):
+            self.assertGreaterEqual(Histogram.get_highest_value(Histogram.get_index(value)), value)
+
+    def test_behaviour_latency_excludes_receive_wait(self):
+        profiler = Profiler()
+        agent = Agent("profiled@localhost", "secret")
+        profiler.instrument_agent(agent)
+        behaviour = WaitingBehaviour()
+        agent.add_behaviour(behaviour)
+
+        asyncio.get_event_loop().run_until_complete(behaviour.run())
+
+        stats = profiler.stats["Agent.WaitingBehaviour"]
+        self.assertEqual(stats.latency.count, 1)
+        self.assertLess(stats.latency.max, 100000)
+        self.assertEqual(stats.mailbox.max, 0)
+
+    def test_actions_are_counted(self):
+        profiler = Profiler()
+        actions = agentspeak.Actions()
+
+        @actions.add(".ping", 0)
+        def _ping(agent, term, intention):
+            yield
+
+        profiler.instrument_actions(actions, "BDISoldier")
+        self.assertEqual(list(actions.lookup(".ping", 0)(None, None, None)), [None])
+        self.assertEqual(profiler.stats["BDISoldier .ping/0"].latency.count, 1)
+
+    def test_manager_is_instrumented(self):
+        profiler = Profiler()
+        manager = Manager(profiler=profiler)
+        manager.add_behaviour(WaitingBehaviour())
+        self.assertIn("Manager.WaitingBehaviour", profiler.stats)
+        self.assertIn("Manager.WaitingBehaviour", profiler.dumps())
@@ -0,0 +1,81 @@
+import unittest
+
+from spade.message import Message
+
+from pygomas.ontology import Belief, Performative
+from pygomas.scheduler import DataIntake, MessageScheduler
+
+
+def create_msg(performative, sender, body=""):
+    msg = Message(sender=sender, body=body)
+    msg.set_metadata(str(Performative.PERFORMATIVE), str(performative))
+    return msg
+
+
+class TestMessageScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = MessageScheduler()
+
+    def test_serves_by_priority(self):
+        for performative in (Performative.DATA, Performative.PACK, Performative.SHOOT):
+            self.scheduler.put(create_msg(performative, "troop@localhost"))
+
+        served = [self.scheduler.pop()[0] for _ in range(3)]
+
+        self.assertEqual(served, [Performative.SHOOT, Performative.PACK, Performative.DATA])
+        self.assertEqual(self.scheduler.pop(), (None, None))
+
+    def test_coalesces_data_per_troop(self):
+        self.scheduler.put(create_msg(Performative.DATA, "a@localhost", "1"))
+        self.scheduler.put(create_msg(Performative.DATA, "b@localhost", "1"))
+        self.scheduler.put(create_msg(Performative.DATA, "a@localhost", "2"))
+
+        self.assertEqual(self.scheduler.depth(Performative.DATA), 2)
+        first, second = self.scheduler.pop()[1], self.scheduler.pop()[1]
+        self.assertEqual((str(first.sender), first.body), ("a@localhost", "2"))
+        self.assertEqual((str(second.sender), second.body), ("b@localhost", "1"))
+
+        self.scheduler.put(create_msg(Performative.DATA, "a@localhost", "3"))
+        self.assertEqual(self.scheduler.depth(), 1)
+
+    def test_stats(self):
+        for _ in range(3):
+            self.scheduler.put(create_msg(Performative.DATA, "a@localhost"))
+        self.scheduler.put(create_msg(Performative.SHOOT, "a@localhost"))
+        self.scheduler.pop_all(Performative.SHOOT)
+
+        stats = self.scheduler.get_stats()
+        self.assertEqual(stats[str(Performative.DATA)]["received"], 3)
+        self.assertEqual(stats[str(Performative.DATA)]["coalesced"], 2)
+        self.assertEqual(stats[str(Performative.DATA)]["depth"], 1)
+        self.assertEqual(stats[str(Performative.SHOOT)]["processed"], 1)
+
+    def test_data_is_served_under_sustained_fire(self):
+        served = []
+        for i in range(30):
+            self.scheduler.put(create_msg(Performative.DATA, "a@localhost", str(i)))
+            self.scheduler.put(create_msg(Performative.SHOOT, "b@localhost"))
+            self.scheduler.put(create_msg(Performative.SHOOT, "c@localhost"))
+            served.append(self.scheduler.pop()[0])
+
+        data_turns = [i for i, performative in enumerate(served) if performative == Performative.DATA]
+        self.assertEqual(data_turns[0], self.scheduler.max_skips)
+        gaps = [b - a for a, b in zip(data_turns, data_turns[1:])]
+        self.assertTrue(all(gap <= self.scheduler.max_skips + 1 for gap in gaps))
+        # Shots keep their priority the rest of the time
+        self.assertGreater(served.count(Performative.SHOOT), served.count(Performative.DATA))
+
+
+class TestDataIntake(unittest.TestCase):
+    def test_keeps_latest_update_per_troop(self):
+        intake = DataIntake()
+        intake.put({Belief.NAME: "a@localhost", Belief.HEALTH: 100})
+        intake.put({Belief.NAME: "b@localhost", Belief.HEALTH: 90})
+        intake.put({Belief.NAME: "a@localhost", Belief.HEALTH: 80})
+
+        self.assertEqual(
+            intake.drain(),
+            [{Belief.NAME: "a@localhost", Belief.HEALTH: 80}, {Belief.NAME: "b@localhost", Belief.HEALTH: 90}],
+        )
+        self.assertEqual(len(intake), 0)
+        self.assertEqual(intake.get_stats(), {"received": 3, "superseded": 1})
@@ -0,0 +1,120 @@
+import unittest
+
+import msgpack
+
+from pygomas.server import (
+    Client,
+    Server,
+    TCP,
+    Msg,
+    DeltaEncoder,
+    DeltaDecoder,
+    PROTOCOL_DELTA,
+    RECORD_SIZE,
+)
+
+
+class TestClient(unittest.TestCase):
+    def test_put_drops_oldest_frame(self):
+        client = Client(reader=None, writer=None, max_queue=2)
+        client.put(b"welcome")
+        client.put(b"frame1", droppable=True)
+        client.put(b"frame2", droppable=True)
+
+        self.assertEqual([data for _, data, _ in client.queue], [b"welcome", b"frame2"])
+        self.assertEqual(client.dropped, 1)
+
+    def test_put_keeps_control_messages(self):
+        client = Client(reader=None, writer=None, max_queue=1)
+        client.put(b"welcome")
+        client.put(b"frame1", droppable=True)
+        client.put(b"map")
+
+        self.assertEqual([data for _, data, _ in client.queue], [b"welcome", b"map"])
+        self.assertEqual(client.dropped, 1)
+
+
+class TestServer(unittest.TestCase):
+    def test_send_agl_to_ready_render_engines(self):
+        server = Server(map_name="map_01")
+        ready1 = Client(reader=None, writer=None)
+        ready1.is_ready = True
+        ready2 = Client(reader=None, writer=None)
+        ready2.is_ready = True
+        not_ready = Client(reader=None, writer=None)
+        server.clients = {"task1": ready1, "task2": ready2, "task3": not_ready}
+
+        sent = server.send_agl_to_ready_render_engines({Msg.AGENTS: []})
+
+        self.assertEqual(sent, 2)
+        self.assertIs(ready1.queue[0][1], ready2.queue[0][1])
+        self.assertEqual(len(not_ready.queue), 0)
+        self.assertEqual(ready1.queue[0][1], Server.pack_msg(TCP.AGL, {Msg.AGENTS: []}))
+
+
+def create_agl(agents, packs=()):
+    return {
+        Msg.AGENTS: [
+            {
+                Msg.CONTENT_NAME: name,
+                Msg.CONTENT_TYPE: 1,
+                Msg.CONTENT_TEAM: 100,
+                Msg.CONTENT_HEALTH: 100,
+                Msg.CONTENT_AMMO: 50,
+                Msg.CONTENT_CARRYINGFLAG: False,
+                Msg.CONTENT_POSITION: [x, 0, z],
+                Msg.CONTENT_VELOCITY: [0.0, 0.0, 0.0],
+                Msg.CONTENT_HEADING: [1.0, 0.0, 0.0],
+            }
+            for name, x, z in agents
+        ],
+        Msg.PACKS: [
+            {Msg.CONTENT_NAME: name, Msg.CONTENT_TYPE: 1001, Msg.CONTENT_POSITION: [x, 0, z]}
+            for name, x, z in packs
+        ],
+    }
+
+
+class TestDeltaProtocol(unittest.TestCase):
+    def test_keyframe_then_delta(self):
+        encoder = DeltaEncoder()
+        decoder = DeltaDecoder()
+
+        msg_type, body = encoder.encode(create_agl([("a", 10, 20), ("b", 30, 40)]))
+        self.assertEqual(msg_type, TCP.AGL_KEYFRAME)
+        self.assertTrue(decoder.decode(msg_type, body))
+
+        msg_type, body = encoder.encode(
+            create_agl([("a", 10.5, 20), ("b", 30, 40)], packs=[(7, 12, 14)])
+        )
+        self.assertEqual(msg_type, TCP.AGL_DELTA)
+        self.assertEqual(len(body[Msg.AGENTS]), RECORD_SIZE)
+        self.assertTrue(decoder.decode(msg_type, body))
+
+        self.assertEqual(decoder.agents["a"][Msg.CONTENT_POSITION], [10.5, 0, 20])
+        self.assertEqual(decoder.agents["b"][Msg.CONTENT_POSITION], [30, 0, 40])
+        self.assertEqual(decoder.packs[7][Msg.CONTENT_POSITION], [12, 0, 14])
+
+    def test_delta_out_of_sequence_is_ignored(self):
+        encoder = DeltaEncoder()
+        decoder = DeltaDecoder()
+        decoder.decode(*encoder.encode(create_agl([("a", 10, 20)])))
+        encoder.encode(create_agl([("a", 11, 20)]))
+
+        self.assertFalse(decoder.decode(*encoder.encode(create_agl([("a", 12, 20)]))))
+        self.assertEqual(decoder.agents["a"][Msg.CONTENT_POSITION], [10, 0, 20])
+
+    def test_delta_client_waits_for_keyframe(self):
+        server = Server(map_name="map_01")
+        client = Client(reader=None, writer=None)
+        client.is_ready = True
+        client.protocol = PROTOCOL_DELTA
+        server.clients = {"task": client}
+
+        server.send_agl_to_ready_render_engines(create_agl([("a", 10, 20)]))
+        server.send_agl_to_ready_render_engines(create_agl([("a", 11, 20)]))
+        client.needs_keyframe = True
+        server.send_agl_to_ready_render_engines(create_agl([("a", 12, 20)]))
+
+        types = [msgpack.unpackb(data[4:], strict_map_key=False)[Msg.TYPE] for _, data, _ in client.queue]
+        self.assertEqual(types, [TCP.AGL_KEYFRAME, TCP.AGL_DELTA, TCP.AGL_KEYFRAME])
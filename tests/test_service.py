@@ -0,0 +1,104 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from spade.message import Message
+
+from pygomas.agents.service import GetServiceBehaviour, RegisterServiceBehaviour, ServiceAgent, ServiceDirectory
+from pygomas.config import TEAM_ALLIED, TEAM_AXIS
+from pygomas.manager import Manager
+from pygomas.ontology import Action, Belief, Service
+
+
+def descriptor(name, team):
+    return {Belief.NAME: name, Belief.TEAM: team}
+
+
+class TestServiceAgent(unittest.TestCase):
+    def setUp(self):
+        self.service = ServiceAgent()
+        self.service.register_service(descriptor(Service.MEDIC, TEAM_ALLIED), "medic1@localhost")
+        self.service.register_service(descriptor(Service.MEDIC, TEAM_ALLIED), "medic2@localhost")
+        self.service.register_service(descriptor(Service.MEDIC, TEAM_AXIS), "medic3@localhost")
+        self.service.register_service(descriptor(Service.BACKUP, TEAM_ALLIED), "medic1@localhost")
+
+    def test_get_service_excludes_questioner(self):
+        medics = descriptor(Service.MEDIC, TEAM_ALLIED)
+        self.assertEqual(
+            self.service.get_service(medics, "soldier@localhost"),
+            ["medic1@localhost", "medic2@localhost"],
+        )
+        self.assertEqual(self.service.get_service(medics, "medic1@localhost"), ["medic2@localhost"])
+        self.assertEqual(self.service.get_service(descriptor("unknown", TEAM_ALLIED), "a"), [])
+
+    def test_deregister_agent_removes_all_its_services(self):
+        self.service.deregister_agent("medic1@localhost")
+
+        self.assertEqual(
+            self.service.get_service(descriptor(Service.MEDIC, TEAM_ALLIED), "x"), ["medic2@localhost"]
+        )
+        self.assertEqual(self.service.get_service(descriptor(Service.BACKUP, TEAM_ALLIED), "x"), [])
+        self.assertNotIn("medic1@localhost", self.service.agent_services)
+        self.service.deregister_agent("medic1@localhost")
+
+    def test_service_replies_are_cached_until_changed(self):
+        medics = descriptor(Service.MEDIC, TEAM_ALLIED)
+        reply = self.service.get_service_reply(medics, "soldier1@localhost")
+        self.assertIs(self.service.get_service_reply(medics, "soldier2@localhost"), reply)
+        self.assertEqual(json.loads(self.service.get_service_reply(medics, "medic2@localhost")), ["medic1@localhost"])
+
+        self.service.deregister_service(medics, "medic2@localhost")
+        self.assertEqual(json.loads(self.service.get_service_reply(medics, "soldier1@localhost")), ["medic1@localhost"])
+
+    def test_subscribers_get_membership_deltas(self):
+        medics = descriptor(Service.MEDIC, TEAM_ALLIED)
+        current = self.service.subscribe(medics, "medic1@localhost")
+        self.assertEqual(current, ["medic2@localhost"])
+        self.service.subscribe(medics, "soldier@localhost")
+
+        self.service.register_service(medics, "medic4@localhost")
+        self.service.deregister_agent("medic2@localhost")
+        self.service.register_service(descriptor(Service.MEDIC, TEAM_AXIS), "medic5@localhost")
+
+        updates = dict(self.service.pop_updates())
+        self.assertEqual(
+            updates["soldier@localhost"],
+            {
+                Belief.NAME: Service.MEDIC,
+                Belief.TEAM: TEAM_ALLIED,
+                Action.ADDED: ["medic4@localhost"],
+                Action.REMOVED: ["medic2@localhost"],
+            },
+        )
+        self.assertEqual(updates["medic1@localhost"][Action.ADDED], ["medic4@localhost"])
+        self.assertEqual(self.service.pop_updates(), [])
+
+        self.service.deregister_agent("soldier@localhost")
+        self.service.deregister_agent("medic4@localhost")
+        self.assertEqual([jid for jid, _ in self.service.pop_updates()], ["medic1@localhost"])
+
+    def test_register_several_services_at_once(self):
+        behaviour = RegisterServiceBehaviour(self.service)
+        self.service.add_behaviour(behaviour)
+        behaviour.send = mock.AsyncMock()
+        msg = Message(sender="fieldops@localhost")
+        msg.body = json.dumps([descriptor(Service.AMMO, TEAM_AXIS), descriptor("axis", TEAM_AXIS)])
+        behaviour.queue.put_nowait(msg)
+        asyncio.run(behaviour.run())
+
+        self.assertEqual(self.service.get_service(descriptor(Service.AMMO, TEAM_AXIS), "x"), ["fieldops@localhost"])
+        self.assertEqual(self.service.get_service(descriptor("axis", TEAM_AXIS), "x"), ["fieldops@localhost"])
+
+
+class TestEmbeddedServiceDirectory(unittest.TestCase):
+    def test_manager_serves_the_directory(self):
+        manager = Manager(name="cmanager@localhost", embedded_services=True)
+        self.assertIsNone(manager.service_agent)
+        self.assertIsInstance(manager.service_directory, ServiceDirectory)
+        self.assertEqual(manager.service_jid, "cmanager@localhost")
+
+        manager.service_directory.add_behaviours(manager)
+        behaviours = [b for b in manager.behaviours if isinstance(b, GetServiceBehaviour)]
+        self.assertEqual(len(behaviours), 1)
+        self.assertIs(behaviours[0].directory, manager.service_directory)
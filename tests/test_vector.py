@@ -0,0 +1,38 @@
+import unittest
+
+import numpy as np
+
+from pygomas.utils.mobile import Mobile
+from pygomas.utils.vector import Vector3D
+
+
+class TestVector3D(unittest.TestCase):
+    def test_constructors(self):
+        self.assertEqual(Vector3D().to_tuple(), (0.0, 0.0, 0.0))
+        self.assertEqual(Vector3D(x=1, z=3).to_tuple(), (1, 0.0, 3))
+        self.assertEqual(Vector3D(v=Vector3D.from_xyz(1, 2, 3)).to_tuple(), (1, 2, 3))
+        self.assertEqual(Vector3D.from_tuple((4, 5, 6)), Vector3D(x=4, y=5, z=6))
+        self.assertEqual(Vector3D.from_array(np.array([1.0, 2.0, 3.0])).to_tuple(), (1.0, 2.0, 3.0))
+
+    def test_in_place_operations(self):
+        v = Vector3D.from_xyz(1.0, 1.0, 1.0)
+        same = v
+        v.set_sub(Vector3D.from_xyz(5.0, 0.0, 4.0), Vector3D.from_xyz(2.0, 0.0, 0.0))
+        v += Vector3D.from_xyz(0.0, 1.0, 0.0)
+        v *= 2
+        v.add_scaled(Vector3D.from_xyz(1.0, 0.0, 0.0), 0.5)
+
+        self.assertIs(v, same)
+        self.assertEqual(v.to_tuple(), (6.5, 2.0, 8.0))
+        self.assertEqual(Vector3D.from_xyz(3.0, 0.0, 4.0).distance(Vector3D()), 5.0)
+
+    def test_numpy_interop(self):
+        v = Vector3D.from_xyz(1.0, 2.0, 3.0)
+        np.testing.assert_array_equal(v.to_array(), [1.0, 2.0, 3.0])
+        np.testing.assert_array_equal(np.array(tuple(v)), [1.0, 2.0, 3.0])
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            Vector3D().w = 1
+        with self.assertRaises(AttributeError):
+            Mobile().speed = 1
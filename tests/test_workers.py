@@ -0,0 +1,92 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from pygomas.config import Config, TEAM_ALLIED, TEAM_AXIS
+from pygomas.manager import DinObject, Manager, MicroAgent
+from pygomas.ontology import Action, Belief
+from pygomas.workers import WorkerPool
+from pygomas.world import WorldStore
+
+from conftest import create_agent
+
+
+class TestSharedWorldStore(unittest.TestCase):
+    def test_attach_sees_the_same_arrays(self):
+        world = WorldStore(capacity=2, shared=True)
+        agent = MicroAgent(world, "a@localhost")
+        agent.health = 42
+        agent.locate.position.x = 7
+
+        other = WorldStore.attach(world.shm_name, world.capacity, world.size)
+        self.assertEqual(other.health[0], 42)
+        self.assertEqual(other.position[0, 0], 7)
+        other.close(unlink=False)
+
+        MicroAgent(world, "b@localhost")
+        MicroAgent(world, "c@localhost")
+        self.assertEqual(agent.health, 42)
+        world.close()
+
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.manager = Manager(players=4, workers=2)
+        self.manager.map.load_map("map_01", Config())
+        world = self.manager.world
+        for agent in [
+            create_agent(world, "allied1@localhost", TEAM_ALLIED, 40, 40),
+            create_agent(world, "allied2@localhost", TEAM_ALLIED, 40, 60, heading_x=-1.0),
+            create_agent(world, "axis1@localhost", TEAM_AXIS, 60, 40, heading_x=-1.0),
+            create_agent(world, "axis2@localhost", TEAM_AXIS, 55, 45, heading_x=-1.0),
+        ]:
+            self.manager.agents[agent.jid] = agent
+        pack = DinObject()
+        pack.jid = "pack@localhost"
+        pack.type = 1001
+        pack.team = TEAM_ALLIED
+        pack.position.x = 50
+        pack.position.z = 40
+        self.manager.din_objects[pack.jid] = pack
+        self.manager.worker_pool = WorkerPool(2, "map_01", Config().data_path)
+
+    def tearDown(self):
+        self.manager.worker_pool.shutdown()
+        self.manager.world.close()
+
+    def test_fields_of_view_match_the_local_ones(self):
+        names = list(self.manager.agents)
+        sights = asyncio.run(self.manager.fields_of_view(names))
+
+        for name in names:
+            local = self.manager.look(name)
+            self.assertEqual(self.manager.fov_content(sights[name]), local)
+        self.assertTrue(any(sights.values()))
+
+    def test_data_replies_are_computed_in_the_pool(self):
+        names = ["allied1@localhost", "axis1@localhost"]
+        contents = []
+        for sequence, name in enumerate(names):
+            agent = self.manager.agents[name]
+            content = {
+                Belief.NAME: name, Belief.HEALTH: 100, Belief.AMMO: 100, Action.SEQUENCE: sequence,
+                Action.X: agent.locate.position.x, Action.Y: 0, Action.Z: agent.locate.position.z,
+                Action.VEL_X: 0, Action.VEL_Y: 0, Action.VEL_Z: 0,
+                Action.HEAD_X: agent.locate.heading.x, Action.HEAD_Y: 0, Action.HEAD_Z: agent.locate.heading.z,
+            }
+            contents.append(content)
+        expected = {name: self.manager.look(name) for name in names}
+        behaviour = mock.Mock()
+        behaviour.send = mock.AsyncMock()
+
+        with mock.patch.object(
+            self.manager.worker_pool, "fields_of_view", wraps=self.manager.worker_pool.fields_of_view
+        ) as pool:
+            asyncio.run(self.manager.handle_data_batch(behaviour, contents))
+            self.assertEqual(pool.call_count, 1)
+
+        replies = {str(m.to): json.loads(m.body) for (m,), _ in behaviour.send.await_args_list}
+        for sequence, name in enumerate(names):
+            self.assertEqual(replies[name][Action.FOV], expected[name])
+            self.assertEqual(replies[name][Action.SEQUENCE], sequence)